@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Sales Archival Script
+Moves sales older than SALES_ARCHIVE_HORIZON_DAYS (cancelled sales older
+than SALES_ARCHIVE_CANCELLED_AFTER_DAYS) into the sales_archive collection
+and refreshes the daily rollups used by the sales report.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.utils.sales_archive import archive_sales
+
+async def main():
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[settings.DB_NAME]
+    result = await archive_sales(db)
+    print(f"[OK] Archived {result['moved']} sales")
+    print(f"     Archived before: {result['archived_before']}")
+    print(f"     Rolled up before: {result['rolled_up_before']}")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
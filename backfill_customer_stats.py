@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Customer Stats Backfill Script
+Rebuilds the per-customer purchase aggregates (first/last purchase, order
+count, total spent) from all hot and archived sales that carry a customer_id.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.utils.customer_stats import backfill_customer_stats
+
+async def main():
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[settings.DB_NAME]
+    customers = await backfill_customer_stats(db)
+    print(f"[OK] Rebuilt purchase stats for {customers} customers")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
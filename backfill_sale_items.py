@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Sale Line-Item Backfill Script
+Adds the product name/category snapshot to line items of hot and archived
+sales recorded before create_sale started storing it. Safe to re-run; only
+items still without a name are touched. Items of deleted products are left
+as they are.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.utils.sale_items import backfill_item_snapshots
+
+async def main():
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[settings.DB_NAME]
+    modified = await backfill_item_snapshots(db)
+    for collection, count in modified.items():
+        print(f"[OK] {collection}: {count} line-item updates")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cold Start Benchmark
+Starts fresh uvicorn workers and measures what the first requests cost:
+  no warm-up     - DB_WARM_CONNECTIONS=0, requests sent as soon as
+                   /health/live answers
+  warm-up        - traffic held until /health/ready, read cache rebuilt
+                   from Mongo (no snapshot file)
+  warm snapshot  - as above, read cache loaded from the snapshot file a
+                   previous worker left on shutdown
+Uses the admin account created by init_db.py.
+
+Usage: python bench_cold_start.py [runs] [port]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ADMIN = {"username": "admin@example.com", "password": "Admin123!"}
+BURST = 20
+
+def request(url, data=None, cookie=None):
+    headers = {"Cookie": cookie} if cookie else {}
+    if data is not None:
+        data = urllib.parse.urlencode(data).encode()
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    began = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=30) as response:
+            response.read()
+            status, set_cookie = response.status, response.headers.get("Set-Cookie")
+    except urllib.error.HTTPError as exc:
+        status, set_cookie = exc.code, None
+    except urllib.error.URLError:
+        status, set_cookie = None, None
+    return status, (time.perf_counter() - began) * 1000, set_cookie
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        status, _, _ = request(url)
+        if status == 200:
+            return True
+        time.sleep(0.05)
+    return False
+
+def login_cookie(base):
+    status, _, set_cookie = request(f"{base}/auth/login", ADMIN)
+    if status != 200 or not set_cookie:
+        raise SystemExit("[ERROR] Login failed; run init_db.py first")
+    return set_cookie.split(";", 1)[0]
+
+def run_worker(port, warm: bool, cookie: str, snapshot_file: str):
+    env = {**os.environ, "SCHEDULER_ENABLED": "false", "READ_CACHE_SNAPSHOT_FILE": snapshot_file}
+    if not warm:
+        env["DB_WARM_CONNECTIONS"] = "0"
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        started = time.perf_counter()
+        if not wait_for(f"{base}/health/live", started + 30):
+            raise SystemExit("[ERROR] Worker did not start")
+        live_ms = (time.perf_counter() - started) * 1000
+        if warm:
+            wait_for(f"{base}/health/ready", started + 60)
+        ready_ms = (time.perf_counter() - started) * 1000
+        timings = [request(f"{base}/products/", cookie=cookie)[1] for _ in range(BURST)]
+        return live_ms, ready_ms, timings
+    finally:
+        worker.terminate()
+        worker.wait(timeout=30)
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+
+    # A throwaway worker just to obtain a session cookie
+    env = {**os.environ, "SCHEDULER_ENABLED": "false"}
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for(f"http://127.0.0.1:{port}/health/ready", time.perf_counter() + 60)
+        cookie = login_cookie(f"http://127.0.0.1:{port}")
+    finally:
+        worker.terminate()
+        worker.wait(timeout=30)
+
+    print(f"Median over {runs} fresh workers; GET /products/ x{BURST} right after start")
+    scratch = tempfile.mkdtemp()
+    shared_snapshot = os.path.join(scratch, "shared.bin")
+    # Leaves a snapshot behind on shutdown for the "warm snapshot" runs
+    run_worker(port, True, cookie, shared_snapshot)
+    modes = [
+        ("no warm-up", False, lambda run: os.path.join(scratch, f"none-{run}.bin")),
+        ("warm-up", True, lambda run: os.path.join(scratch, f"fresh-{run}.bin")),
+        ("warm snapshot", True, lambda run: shared_snapshot)
+    ]
+    median = lambda values: sorted(values)[len(values) // 2]
+    for label, warm, snapshot_file in modes:
+        results = [run_worker(port, warm, cookie, snapshot_file(run)) for run in range(runs)]
+        print(f"\n  {label}")
+        print(f"    live after        {median([r[0] for r in results]):8.1f}ms")
+        print(f"    traffic from      {median([r[1] for r in results]):8.1f}ms")
+        print(f"    first request     {median([r[2][0] for r in results]):8.1f}ms")
+        print(f"    requests 2-{BURST:<6} {median([median(r[2][1:]) for r in results]):8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Model Layer Benchmark
+Validates and serializes 10k synthetic product and sale documents (shaped
+as they come back from Mongo, ObjectId _id included) two ways:
+  per-document  - a response model built field by field for each document,
+                  then each dumped to JSON-mode dicts and json.dumps'd, as
+                  list routes did before the list adapters
+  list adapter  - one TypeAdapter validate_python + dump_json call over the
+                  whole list (what list_response does)
+No database is involved.
+
+Usage: python bench_models.py [documents] [runs]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from src.models.product import ProductResponse, PRODUCT_LIST
+from src.models.sale import SaleResponse, SALE_LIST
+
+def product_documents(n):
+    return [{
+        "_id": ObjectId(),
+        "name": f"Product {i}",
+        "description": f"Description of product {i}",
+        "price": round(random.uniform(1, 500), 2),
+        "category": f"Category {i % 20}",
+        "stock_quantity": random.randint(0, 200),
+        "low_stock_threshold": 5,
+        "store_id": f"store-{i % 10}"
+    } for i in range(n)]
+
+def sale_documents(n):
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "items": [{
+            "product_id": str(ObjectId()),
+            "quantity": random.randint(1, 5),
+            "price_at_sale": round(random.uniform(1, 500), 2),
+            "product_name": f"Product {j}",
+            "category": f"Category {j % 20}"
+        } for j in range(random.randint(1, 6))],
+        "total_amount": round(random.uniform(1, 2000), 2),
+        "employee_id": str(ObjectId()),
+        "customer_name": None,
+        "customer_id": None,
+        "store_id": f"store-{i % 10}",
+        "created_at": now - timedelta(minutes=i),
+        "status": "completed"
+    } for i in range(n)]
+
+def product_per_document(documents):
+    models = [ProductResponse(
+        id=str(p["_id"]),
+        name=p["name"],
+        description=p.get("description"),
+        price=p["price"],
+        category=p["category"],
+        stock_quantity=p["stock_quantity"],
+        low_stock_threshold=p["low_stock_threshold"],
+        store_id=p.get("store_id")
+    ) for p in documents]
+    return json.dumps([m.model_dump(mode="json") for m in models]).encode()
+
+def sale_per_document(documents):
+    models = [SaleResponse(
+        id=str(s["_id"]),
+        items=s["items"],
+        total_amount=s["total_amount"],
+        employee_id=s["employee_id"],
+        customer_name=s.get("customer_name"),
+        customer_id=s.get("customer_id"),
+        store_id=s.get("store_id"),
+        created_at=s["created_at"],
+        status=s["status"]
+    ) for s in documents]
+    return json.dumps([m.model_dump(mode="json") for m in models]).encode()
+
+def list_adapter(adapter):
+    return lambda documents: adapter.dump_json(adapter.validate_python(documents))
+
+def best_of(func, documents, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(documents)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    random.seed(42)
+    cases = [
+        ("products", product_documents(n), product_per_document, list_adapter(PRODUCT_LIST)),
+        ("sales", sale_documents(n), sale_per_document, list_adapter(SALE_LIST))
+    ]
+    print(f"Validate + serialize {n:,} documents, best of {runs}")
+    for name, documents, before, after in cases:
+        # Both paths must produce the same payload
+        assert json.loads(before(documents)) == json.loads(after(documents))
+        before_ms = best_of(before, documents, runs)
+        after_ms = best_of(after, documents, runs)
+        print(f"\n  {name}")
+        print(f"    per-document  {before_ms:8.1f}ms")
+        print(f"    list adapter  {after_ms:8.1f}ms  ({before_ms / after_ms:.1f}x)")
+
+if __name__ == "__main__":
+    main()
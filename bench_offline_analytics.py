@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Offline Analytics Benchmark
+Writes a synthetic columnar sales snapshot (10M line items by default)
+to a temporary directory and times each vectorized report over it, after
+checking the reports on a small hand-built snapshot.
+
+Usage: python bench_offline_analytics.py [line_items]
+"""
+import sys
+import tempfile
+import time
+from datetime import timedelta
+import numpy as np
+from src.utils.sales_snapshot import (
+    EPOCH, SalesSnapshot, moving_average_revenue, hour_of_week_heatmap,
+    basket_size_distribution, co_purchase_counts
+)
+
+PRODUCTS = 5000
+DAYS = 730
+EPOCH_START = 1_700_000_000
+
+def build_snapshot(path, line_items, products=PRODUCTS, days=DAYS, start=EPOCH_START):
+    rng = np.random.default_rng(42)
+    # Basket sizes of 1-6 lines until the requested number of line items
+    lines_per_sale = rng.integers(1, 7, size=line_items // 3 + 1)
+    lines_per_sale = lines_per_sale[:np.searchsorted(np.cumsum(lines_per_sale), line_items) + 1]
+    sales = len(lines_per_sale)
+    sale = np.repeat(np.arange(sales, dtype=np.int64), lines_per_sale)[:line_items]
+    sale_ts = np.sort(rng.integers(start, start + days * 86400, size=sales)).astype(np.int64)
+    # Zipf-like popularity so the top products dominate
+    product = (rng.zipf(1.3, size=len(sale)) % products).astype(np.int32)
+
+    snapshot = SalesSnapshot(path)
+    snapshot.append({
+        "sale": sale,
+        "product": product,
+        "quantity": rng.integers(1, 5, size=len(sale)).astype(np.int32),
+        "price": rng.uniform(1, 500, size=len(sale)).round(2),
+        "sale_id": np.frombuffer(rng.bytes(12 * sales), dtype="S12"),
+        "sale_ts": sale_ts,
+        "sale_status": (rng.random(sales) > 0.02).astype(np.int8)
+    }, 0, 0)
+    snapshot.manifest.update({
+        "items": len(sale),
+        "sales": sales,
+        "products": [f"{i:024x}" for i in range(products)]
+    })
+    snapshot.save_manifest()
+    return SalesSnapshot(path)
+
+def check_windowed_reports(path):
+    """Windows that leave out the highest-coded product, or every sale"""
+    snapshot = SalesSnapshot(path)
+    snapshot.append({
+        # Sale 0 buys products 0 and 1; sale 1, a day later, buys 1 and 2
+        "sale": np.array([0, 0, 1, 1], dtype=np.int64),
+        "product": np.array([0, 1, 1, 2], dtype=np.int32),
+        "quantity": np.array([1, 1, 1, 1], dtype=np.int32),
+        "price": np.array([1.0, 1.0, 1.0, 1.0]),
+        "sale_id": np.array([b"a" * 12, b"b" * 12], dtype="S12"),
+        "sale_ts": np.array([EPOCH_START, EPOCH_START + 86400], dtype=np.int64),
+        "sale_status": np.array([1, 1], dtype=np.int8)
+    }, 0, 0)
+    snapshot.manifest.update({"items": 4, "sales": 2, "products": ["p0", "p1", "p2"]})
+    snapshot.save_manifest()
+    snapshot = SalesSnapshot(path)
+    first_day = (EPOCH + timedelta(seconds=EPOCH_START), EPOCH + timedelta(seconds=EPOCH_START + 3600))
+    pairs = co_purchase_counts(snapshot, 50, 20, *first_day)
+    assert [({pair["product_a"], pair["product_b"]}, pair["count"]) for pair in pairs] == [({"p0", "p1"}, 1)]
+    assert co_purchase_counts(snapshot, 50, 20, EPOCH, EPOCH + timedelta(days=1)) == []
+
+def timed(label, fn, *args):
+    began = time.perf_counter()
+    fn(*args)
+    print(f"  {label:<22} {(time.perf_counter() - began) * 1000:10.1f}ms")
+
+def main():
+    line_items = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    with tempfile.TemporaryDirectory() as path:
+        check_windowed_reports(path)
+    with tempfile.TemporaryDirectory() as path:
+        began = time.perf_counter()
+        snapshot = build_snapshot(path, line_items)
+        print(f"Snapshot: {snapshot.manifest['items']} line items, {snapshot.manifest['sales']} sales "
+              f"(built in {time.perf_counter() - began:.1f}s)")
+        timed("moving average (7d)", moving_average_revenue, snapshot, 7)
+        timed("hour-of-week heatmap", hour_of_week_heatmap, snapshot)
+        timed("basket sizes", basket_size_distribution, snapshot)
+        timed("co-purchases (top 50)", co_purchase_counts, snapshot, 50, 20)
+
+if __name__ == "__main__":
+    main()
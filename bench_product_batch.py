@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Product Batch Fetch Benchmark
+Rehydrates a POS basket against a scratch database, once the way the
+register used to (one GET /products/{id} per item, each with its own users
+lookup from get_current_user) and once through get_products_by_ids, the
+controller behind POST /products/batch.
+
+Usage: python bench_product_batch.py [basket_size] [runs]
+"""
+import asyncio
+import random
+import sys
+import time
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.controllers.product_controller import get_product, get_products_by_ids
+
+PRODUCTS = 5000
+BENCH_USER = "bench@example.com"
+
+async def seed(db):
+    await db["users"].insert_one({"email": BENCH_USER, "role": "employee", "name": "Bench", "store_id": settings.DEFAULT_STORE_ID})
+    result = await db["products"].insert_many([
+        {
+            "name": f"Bench product {i}",
+            "price": 10.0,
+            "category": f"Category {i % 10}",
+            "stock_quantity": 100,
+            "low_stock_threshold": 5,
+            "store_id": settings.DEFAULT_STORE_ID
+        }
+        for i in range(PRODUCTS)
+    ])
+    return [str(pid) for pid in result.inserted_ids]
+
+async def per_id(db, basket):
+    for product_id in basket:
+        await db["users"].find_one({"email": BENCH_USER})
+        try:
+            await get_product(product_id, db, settings.DEFAULT_STORE_ID)
+        except HTTPException:
+            pass
+
+async def batched(db, basket):
+    await db["users"].find_one({"email": BENCH_USER})
+    await get_products_by_ids(basket, db, settings.DEFAULT_STORE_ID)
+
+async def timed(operation, runs):
+    timings = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        await operation()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+async def main():
+    basket_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[f"{settings.DB_NAME}_batch_bench"]
+    await client.drop_database(db.name)
+    await db["users"].create_index("email", unique=True)
+    product_ids = await seed(db)
+
+    def basket():
+        # A couple of items that no longer exist, as after a product delete
+        items = random.sample(product_ids, basket_size - 2)
+        return items + ["000000000000000000000000", "ffffffffffffffffffffffff"]
+
+    print(f"Median / p95 over {runs} baskets of {basket_size} items")
+    loop = await timed(lambda: per_id(db, basket()), runs)
+    batch = await timed(lambda: batched(db, basket()), runs)
+    print(f"  per-ID GET loop   {loop[0]:8.2f}ms / {loop[1]:8.2f}ms")
+    print(f"  POST /batch       {batch[0]:8.2f}ms / {batch[1]:8.2f}ms")
+    print(f"  speedup (median)  {loop[0] / batch[0]:8.1f}x")
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Reorder-Point Benchmark
+Times the vectorized velocity / reorder-point computation over a synthetic
+snapshot of 100k products x 2 years of sales (20M line items by default).
+
+Usage: python bench_reorder.py [line_items] [products]
+"""
+import sys
+import tempfile
+import time
+from datetime import datetime
+from bench_offline_analytics import build_snapshot, EPOCH_START
+from src.utils.reorder import compute_reorder_points
+
+DAYS = 730
+
+def main():
+    line_items = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000_000
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    with tempfile.TemporaryDirectory() as path:
+        began = time.perf_counter()
+        snapshot = build_snapshot(path, line_items, products=products, days=DAYS)
+        print(f"Snapshot: {snapshot.manifest['items']} line items, {products} products, {DAYS} days "
+              f"(built in {time.perf_counter() - began:.1f}s)")
+
+        now = datetime.utcfromtimestamp(EPOCH_START + DAYS * 86400)
+        for history_days in (90, 365, DAYS):
+            began = time.perf_counter()
+            sold, velocity, reorder = compute_reorder_points(snapshot, now, history_days, 7.0, 1.65)
+            elapsed = (time.perf_counter() - began) * 1000
+            print(f"  {history_days:>4}d history: {len(sold)} products with sales in {elapsed:8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Sale Group-Commit Benchmark
+Drives create_sale with many concurrent callers against a scratch database
+and reports throughput and latency with group commit off and at several
+batching windows.
+
+Usage: python bench_sale_batching.py [concurrency] [sales_per_run]
+"""
+import asyncio
+import sys
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.controllers.sale_controller import create_sale
+from src.models.sale import SaleCreate, SaleItem
+
+WINDOWS_MS = [None, 0.5, 1, 2, 5, 10]
+PRODUCTS = 20
+
+async def seed(db):
+    await db["products"].delete_many({})
+    await db["sales"].delete_many({})
+    await db["category_stats"].delete_many({})
+    result = await db["products"].insert_many([
+        {
+            "name": f"Bench product {i}",
+            "price": 10.0,
+            "category": "Bench",
+            "stock_quantity": 10_000_000,
+            "low_stock_threshold": 5,
+            "store_id": settings.DEFAULT_STORE_ID
+        }
+        for i in range(PRODUCTS)
+    ])
+    return [str(pid) for pid in result.inserted_ids]
+
+async def run(db, product_ids, concurrency, total):
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for n in counter:
+            sale = SaleCreate(items=[
+                SaleItem(product_id=product_ids[n % PRODUCTS], quantity=1, price_at_sale=10.0),
+                SaleItem(product_id=product_ids[(n * 7) % PRODUCTS], quantity=2, price_at_sale=10.0)
+            ])
+            began = time.perf_counter()
+            await create_sale(sale, "bench-employee", db)
+            latencies.append((time.perf_counter() - began) * 1000)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+    latencies.sort()
+    return total / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    client = AsyncIOMotorClient(get_database_url(), maxPoolSize=100)
+    db = client[f"{settings.DB_NAME}_bench"]
+    product_ids = await seed(db)
+
+    print(f"{concurrency} concurrent callers, {total} sales per run")
+    print(f"  {'window':>8} {'sales/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for window in WINDOWS_MS:
+        settings.SALE_GROUP_COMMIT = window is not None
+        if window is not None:
+            settings.SALE_BATCH_WINDOW_MS = window
+        throughput, p50, p99 = await run(db, product_ids, concurrency, total)
+        label = "off" if window is None else f"{window}ms"
+        print(f"  {label:>8} {throughput:10.0f} {p50:8.2f} {p99:8.2f}")
+
+    await client.drop_database(f"{settings.DB_NAME}_bench")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
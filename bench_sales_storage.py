@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Sales Storage Benchmark
+Compares the plain and time-series sales layouts on storage size and
+time-windowed query latency. Run after migrate_sales_storage.py so both
+collections hold the same data.
+
+Usage: python bench_sales_storage.py [queries_per_window]
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+
+WINDOWS = [timedelta(days=1), timedelta(days=7), timedelta(days=30), timedelta(days=365)]
+
+async def storage_stats(db, name):
+    stats = await db.command("collStats", name)
+    return {
+        "count": stats.get("count", 0),
+        "storage_mb": stats.get("storageSize", 0) / 1024 / 1024,
+        "index_mb": stats.get("totalIndexSize", 0) / 1024 / 1024
+    }
+
+async def time_range_queries(collection, status_field, bounds, window, runs):
+    earliest, latest = bounds
+    span = max((latest - earliest - window).total_seconds(), 0)
+    timings = []
+    for _ in range(runs):
+        start = earliest + timedelta(seconds=random.uniform(0, span))
+        pipeline = [
+            {"$match": {status_field: "completed", "created_at": {"$gte": start, "$lt": start + window}}},
+            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}, "count": {"$sum": 1}}}
+        ]
+        began = time.perf_counter()
+        await collection.aggregate(pipeline).to_list(1)
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+async def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[settings.DB_NAME]
+
+    layouts = [
+        ("sales", db["sales"], "status"),
+        (settings.SALES_TIMESERIES_COLLECTION, db[settings.SALES_TIMESERIES_COLLECTION], "meta.status")
+    ]
+
+    first = await db["sales"].find().sort("created_at", 1).to_list(1)
+    last = await db["sales"].find().sort("created_at", -1).to_list(1)
+    if not first:
+        print("[INFO] No sales to benchmark")
+        return
+    bounds = (first[0]["created_at"], last[0]["created_at"])
+
+    print("Storage")
+    for name, _, _ in layouts:
+        stats = await storage_stats(db, name)
+        print(f"  {name:<12} docs={stats['count']:<10} storage={stats['storage_mb']:.1f}MB indexes={stats['index_mb']:.1f}MB")
+
+    print(f"\nRange query latency (median / p95 over {runs} runs)")
+    for window in WINDOWS:
+        for name, collection, status_field in layouts:
+            median, p95 = await time_range_queries(collection, status_field, bounds, window, runs)
+            print(f"  {window.days:>4}d {name:<12} {median:8.2f}ms / {p95:8.2f}ms")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
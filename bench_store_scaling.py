@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Store Scaling Benchmark
+Seeds a scratch database with a fixed amount of data per store for a growing
+number of stores, then times the store-scoped controller queries. With the
+store-prefixed indexes the per-store latency should stay flat as the chain
+grows; the chain-wide figure is printed alongside for contrast.
+
+Usage: python bench_store_scaling.py [sales_per_store] [queries]
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.config.indexes import ensure_indexes
+from src.controllers.sale_controller import get_sales
+from src.controllers.product_controller import search_products
+from src.controllers.analytics_controller import get_revenue_by_date_range
+
+STORE_COUNTS = [10, 100, 1000]
+PRODUCTS_PER_STORE = 50
+
+async def seed(db, first_store, stores, sales_per_store):
+    """Add stores [first_store, stores) on top of what is already there"""
+    now = datetime.utcnow()
+    for number in range(first_store, stores):
+        store_id = f"store-{number}"
+        products = await db["products"].insert_many([
+            {
+                "name": f"Product {i}",
+                "price": 10.0 + i,
+                "category": f"Category {i % 5}",
+                "stock_quantity": random.randint(0, 100),
+                "low_stock_threshold": 10,
+                "store_id": store_id
+            }
+            for i in range(PRODUCTS_PER_STORE)
+        ])
+        product_ids = [str(pid) for pid in products.inserted_ids]
+        await db["sales"].insert_many([
+            {
+                "items": [{"product_id": random.choice(product_ids), "quantity": 1, "price_at_sale": 10.0}],
+                "total_amount": 10.0,
+                "employee_id": f"{store_id}-employee",
+                "store_id": store_id,
+                "created_at": now - timedelta(minutes=random.randint(0, 60 * 24 * 90)),
+                "status": "completed"
+            }
+            for _ in range(sales_per_store)
+        ])
+
+async def timed(operation, runs):
+    timings = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        await operation()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+async def main():
+    sales_per_store = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    if settings.SALES_STORAGE_MODE != "standard":
+        print("[INFO] Run with SALES_STORAGE_MODE=standard; the benchmark seeds the plain sales collection")
+        return
+
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[f"{settings.DB_NAME}_store_bench"]
+    await client.drop_database(db.name)
+    await ensure_indexes(db)
+    start_date = (datetime.utcnow() - timedelta(days=7)).isoformat()
+
+    print(f"Median / p95 over {runs} queries, {sales_per_store} sales and {PRODUCTS_PER_STORE} products per store")
+    seeded = 0
+    for stores in STORE_COUNTS:
+        await seed(db, seeded, stores, sales_per_store)
+        seeded = stores
+
+        def random_store():
+            return f"store-{random.randrange(stores)}"
+
+        results = {
+            "sales list": await timed(lambda: get_sales(db, random_store()), runs),
+            "low-stock search": await timed(
+                lambda: search_products(None, None, None, None, True, db, random_store()), runs
+            ),
+            "7d revenue": await timed(lambda: get_revenue_by_date_range(start_date, None, db, random_store()), runs),
+            "7d revenue (chain)": await timed(lambda: get_revenue_by_date_range(start_date, None, db), max(runs // 10, 1))
+        }
+        print(f"\n  {stores} stores ({stores * sales_per_store} sales)")
+        for name, (median, p95) in results.items():
+            print(f"    {name:<20} {median:8.2f}ms / {p95:8.2f}ms")
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tracing Overhead Benchmark
+Drives a small in-process FastAPI app (one dependency, one handler, a
+50-item response) through TracingMiddleware and TracedRoute, calling the
+ASGI app directly so no server or database is involved. Reports the
+per-request cost with sampling off, against the same app without tracing,
+and with every request sampled (export disabled).
+
+Usage: python bench_tracing.py [requests]
+"""
+import asyncio
+import sys
+import time
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.routing import APIRoute
+from src.config.settings import settings
+from src.middleware.tracing_middleware import TracingMiddleware, TracedRoute
+
+async def current_user():
+    return {"id": "bench"}
+
+def build_app(route_class, tracing: bool) -> FastAPI:
+    router = APIRouter(route_class=route_class)
+
+    @router.get("/items")
+    async def items(user=Depends(current_user)):
+        return [{"id": i, "name": f"Item {i}", "price": 10.0 + i} for i in range(50)]
+
+    app = FastAPI()
+    app.include_router(router)
+    if tracing:
+        app.add_middleware(TracingMiddleware)
+    return app
+
+async def call(app):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/items", "raw_path": b"/items", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+async def timed(app, requests):
+    for _ in range(200):
+        await call(app)
+    began = time.perf_counter()
+    for _ in range(requests):
+        await call(app)
+    return (time.perf_counter() - began) / requests * 1e6
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    settings.TRACE_EXPORT_FILE = ""
+    settings.TRACE_EXPORT_URL = ""
+
+    baseline = await timed(build_app(APIRoute, tracing=False), requests)
+    settings.TRACE_SAMPLE_RATE = 0.0
+    off = await timed(build_app(TracedRoute, tracing=True), requests)
+    settings.TRACE_SAMPLE_RATE = 1.0
+    on = await timed(build_app(TracedRoute, tracing=True), requests)
+
+    print(f"Mean per request over {requests} requests")
+    print(f"  no tracing        {baseline:8.1f}us")
+    print(f"  sampling off      {off:8.1f}us  (+{off - baseline:.1f}us, {100 * (off - baseline) / baseline:+.1f}%)")
+    print(f"  every request     {on:8.1f}us  (+{on - baseline:.1f}us, {100 * (on - baseline) / baseline:+.1f}%)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
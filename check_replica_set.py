@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Replica Set Routing Check
+Verifies against a replica set (DB_HOST listing the members, DB_REPLICA_SET
+set) that analytics reads are served by a secondary and that reads resumed
+from a causal token see the writes that produced it.
+
+Local three-node set:
+    mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0
+    mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-1
+    mongod --replSet rs0 --port 27019 --dbpath /tmp/rs0-2
+    mongosh --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"},
+        {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+    DB_HOST=localhost:27017,localhost:27018,localhost:27019 DB_REPLICA_SET=rs0 python check_replica_set.py
+"""
+import asyncio
+import sys
+from pymongo.read_preferences import Secondary
+from src.config.database import db, get_database, get_analytics_database
+from src.config.settings import settings
+from src.middleware.causal_middleware import encode_causal_token, advance_session
+
+ROUNDS = 200
+COLLECTION = "replica_check"
+
+async def check_replica_set():
+    if not settings.DB_REPLICA_SET:
+        print("[INFO] DB_REPLICA_SET is not set; nothing to check")
+        return 1
+
+    await db.connect_to_database()
+    primary_db = await get_database()
+    analytics_db = await get_analytics_database()
+
+    status = await db.client.admin.command("replSetGetStatus")
+    for member in status["members"]:
+        print(f"  {member['name']}: {member['stateStr']}")
+
+    # Commands follow the same server selection as reads with this preference
+    hello = await analytics_db.command("hello", read_preference=analytics_db.read_preference)
+    served_by = "secondary" if hello.get("secondary") else "primary"
+    print(f"[{'OK' if hello.get('secondary') else 'FAIL'}] Analytics reads served by {served_by} {hello['me']}")
+
+    secondary_reads = primary_db[COLLECTION].with_options(read_preference=Secondary())
+    await primary_db[COLLECTION].delete_many({})
+
+    # Plain secondary reads straight after a write may miss it
+    stale = 0
+    for i in range(ROUNDS):
+        await primary_db[COLLECTION].insert_one({"_id": f"plain-{i}"})
+        if not await secondary_reads.find_one({"_id": f"plain-{i}"}):
+            stale += 1
+    print(f"[INFO] Without a session: {stale}/{ROUNDS} reads missed the preceding write")
+
+    # Each round is one write request and one later read request, linked only by the token
+    missed = 0
+    for i in range(ROUNDS):
+        async with await db.client.start_session(causal_consistency=True) as session:
+            await primary_db[COLLECTION].insert_one({"_id": f"causal-{i}"}, session=session)
+            token = encode_causal_token(session)
+        async with await db.client.start_session(causal_consistency=True) as session:
+            advance_session(session, token)
+            if not await secondary_reads.find_one({"_id": f"causal-{i}"}, session=session):
+                missed += 1
+    print(f"[{'OK' if missed == 0 else 'FAIL'}] With a causal token: {missed}/{ROUNDS} reads missed the preceding write")
+
+    await primary_db.drop_collection(COLLECTION)
+    await db.close_database_connection()
+    return 0 if missed == 0 and hello.get("secondary") else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(check_replica_set()))
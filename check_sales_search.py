@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Sales Search Index Check
+Seeds a scratch database, then explains the query GET /sales/search runs
+for every supported filter combination, chain-wide and store-scoped, and
+checks that the winning plan scans the index led by the expected filter
+field and, for equality filters, returns sales in (created_at, _id) order
+without an in-memory SORT. Then pages through sales sharing one created_at
+to check the before/before_id cursor returns each of them exactly once.
+Exits non-zero if any check fails.
+
+Usage: python check_sales_search.py [sales]
+"""
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.config.indexes import ensure_indexes
+from src.controllers.sale_controller import sale_search_query
+from src.models.sale import SaleSearch
+from src.utils.sales_store import sales_collection, sales_query
+
+STORES = 5
+PRODUCTS = 200
+EMPLOYEES = 50
+CUSTOMERS = 500
+TIES = 37
+SORT = [("created_at", -1), ("_id", -1)]
+
+async def seed(db, count):
+    now = datetime.utcnow()
+    products = [str(ObjectId()) for _ in range(PRODUCTS)]
+    employees = [str(ObjectId()) for _ in range(EMPLOYEES)]
+    sales = []
+    for i in range(count):
+        items = [
+            {"product_id": random.choice(products), "quantity": random.randint(1, 3), "price_at_sale": 10.0}
+            for _ in range(random.randint(1, 4))
+        ]
+        sales.append({
+            "items": items,
+            "total_amount": round(random.uniform(5, 1000), 2),
+            "employee_id": random.choice(employees),
+            "customer_name": f"Customer {random.randrange(CUSTOMERS):03d}" if random.random() < 0.7 else None,
+            "store_id": f"store-{random.randrange(STORES)}",
+            "created_at": now - timedelta(minutes=random.randrange(60 * 24 * 60)),
+            "status": "completed" if random.random() < 0.95 else "cancelled"
+        })
+    await sales_collection(db).insert_many(sales)
+    return products, employees, now
+
+def plan_stages(node, found):
+    """Every stage of a (possibly nested) explain plan"""
+    if isinstance(node, dict):
+        if "stage" in node:
+            found.append(node)
+        for key in ("inputStage", "queryPlan", "winningPlan"):
+            if key in node:
+                plan_stages(node[key], found)
+        for child in node.get("inputStages", []):
+            plan_stages(child, found)
+    return found
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    if settings.SALES_STORAGE_MODE != "standard":
+        print("[INFO] Run with SALES_STORAGE_MODE=standard; the check seeds the plain sales collection")
+        return 0
+
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[f"{settings.DB_NAME}_search_check"]
+    await client.drop_database(db.name)
+    await ensure_indexes(db)
+    products, employees, now = await seed(db, count)
+    week_ago = now - timedelta(days=7)
+
+    # (description, filters, index fields that may lead the scan, date-ordered)
+    combinations = [
+        ("product", {"product_id": products[0]}, {"items.product_id"}, True),
+        ("product + last week", {"product_id": products[0], "start": week_ago}, {"items.product_id"}, True),
+        ("product + last week + over $500", {"product_id": products[0], "start": week_ago, "min_amount": 500}, {"items.product_id"}, True),
+        ("employee + date range", {"employee_id": employees[0], "start": week_ago, "end": now}, {"employee_id"}, True),
+        ("employee + status + amount", {"employee_id": employees[0], "status": "completed", "min_amount": 100, "max_amount": 200}, {"employee_id"}, True),
+        ("customer prefix", {"customer_name": "Customer 04"}, {"customer_name"}, False),
+        ("customer prefix + last week", {"customer_name": "Customer 04", "start": week_ago}, {"customer_name"}, False),
+        ("exact customer", {"customer_name": "Customer 042", "status": "completed"}, {"customer_name"}, False),
+        ("product + employee", {"product_id": products[0], "employee_id": employees[0]}, {"items.product_id", "employee_id"}, True),
+        ("date range + amount + status", {"start": week_ago, "min_amount": 500, "status": "cancelled"}, {"created_at"}, True),
+    ]
+
+    failures = 0
+    for store_id in (None, "store-0"):
+        print(f"\n  {'store-0' if store_id else 'chain-wide'}")
+        for description, filters, leading, date_ordered in combinations:
+            for before, before_id in ((None, None), (now - timedelta(days=3), str(ObjectId()))):
+                query = sales_query(sale_search_query(SaleSearch(**filters), store_id, before, before_id))
+                explain = await sales_collection(db).find(query).sort(SORT).limit(50).explain()
+                stages = plan_stages(explain["queryPlanner"]["winningPlan"], [])
+                scans = [
+                    [field for field in stage["keyPattern"] if field != "store_id"]
+                    for stage in stages if stage["stage"] == "IXSCAN"
+                ]
+                used = scans[0][0] if scans and scans[0] else None
+                sorted_in_memory = any(stage["stage"] == "SORT" for stage in stages)
+                ok = used in leading and (not date_ordered or not sorted_in_memory)
+                failures += not ok
+                label = description + (" + before" if before else "")
+                detail = f"index {'/'.join(scans[0]) if scans else 'none (COLLSCAN)'}" + (", in-memory sort" if sorted_in_memory else "")
+                print(f"    [{'OK' if ok else 'FAIL'}] {label:<40} {detail}")
+
+    # Page through sales that share one created_at, a few per page
+    tied_at = now - timedelta(days=1)
+    employee = str(ObjectId())
+    await sales_collection(db).insert_many([
+        {"items": [], "total_amount": 1.0, "employee_id": employee, "customer_name": None,
+         "store_id": "store-0", "created_at": tied_at, "status": "completed"}
+        for _ in range(TIES)
+    ])
+    seen = []
+    before = before_id = None
+    while True:
+        query = sales_query(sale_search_query(SaleSearch(employee_id=employee), None, before, before_id))
+        page = await sales_collection(db).find(query).sort(SORT).limit(5).to_list(5)
+        if not page:
+            break
+        seen += [sale["_id"] for sale in page]
+        before, before_id = page[-1]["created_at"], str(page[-1]["_id"])
+    ok = len(seen) == len(set(seen)) == TIES
+    failures += not ok
+    print(f"\n  [{'OK' if ok else 'FAIL'}] paged {len(set(seen))} of {TIES} sales sharing one created_at")
+
+    await client.drop_database(db.name)
+    client.close()
+    print(f"\n{'All checks passed' if not failures else f'{failures} checks failed'}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
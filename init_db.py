@@ -7,16 +7,19 @@ import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.config.settings import settings
 from src.utils.auth import get_password_hash
+from src.utils.category_stats import reconcile_category_stats
+from src.utils.sales_store import is_timeseries, TIMESERIES_OPTIONS, sales_collection, sales_query, sales_update
+from src.utils.sales_archive import ARCHIVE, ROLLUPS, get_archive_state, rebuild_rollups
+from src.utils.customer_stats import CUSTOMER_STATS, backfill_customer_stats
+from src.utils.stock_ledger import reconcile_stock_ledger
+from src.config.indexes import index_specs, drop_retired_indexes
+from src.config.database import get_database_url
 
 async def init_database():
     """Initialize MongoDB database with collections and default data"""
     
     # Connect to MongoDB
-    db_url = f"mongodb://{settings.DB_HOST}:27017"
-    if settings.DB_USER and settings.DB_PASS:
-        db_url = f"mongodb://{settings.DB_USER}:{settings.DB_PASS}@{settings.DB_HOST}:27017"
-    
-    client = AsyncIOMotorClient(db_url)
+    client = AsyncIOMotorClient(get_database_url())
     db = client[settings.DB_NAME]
     
     print(f"Connected to MongoDB at {settings.DB_HOST}")
@@ -25,7 +28,7 @@ async def init_database():
     # Create collections if they don't exist
     existing_collections = await db.list_collection_names()
     
-    collections = ["users", "products", "customers", "sales"]
+    collections = ["users", "products", "customers", "sales", "category_stats"]
     for collection in collections:
         if collection not in existing_collections:
             await db.create_collection(collection)
@@ -33,26 +36,52 @@ async def init_database():
         else:
             print(f"[INFO] Collection already exists: {collection}")
     
+    if is_timeseries() and settings.SALES_TIMESERIES_COLLECTION not in existing_collections:
+        await db.create_collection(settings.SALES_TIMESERIES_COLLECTION, timeseries=TIMESERIES_OPTIONS)
+        print(f"[OK] Created time-series collection: {settings.SALES_TIMESERIES_COLLECTION}")
+    
     # Create indexes
     print("\nCreating indexes...")
     
-    # Users collection indexes
-    await db.users.create_index("email", unique=True)
-    print("  [OK] Users: unique index on 'email'")
-    
-    # Products collection indexes
-    await db.products.create_index("name")
-    await db.products.create_index("category")
-    print("  [OK] Products: index on 'name' and 'category'")
-    
-    # Sales collection indexes
-    await db.sales.create_index("created_at")
-    await db.sales.create_index("employee_id")
-    print("  [OK] Sales: index on 'created_at' and 'employee_id'")
-    
-    # Customers collection indexes
-    await db.customers.create_index("email")
-    print("  [OK] Customers: index on 'email'")
+    for collection, keys, options in index_specs():
+        await db[collection].create_index(keys, **options)
+        fields = " + ".join(f"'{field}'" for field, _ in keys)
+        unique = "unique " if options.get("unique") else ""
+        print(f"  [OK] {collection}: {unique}index on {fields}")
+    for dropped in await drop_retired_indexes(db):
+        print(f"  [OK] {dropped['collection']}: dropped retired index on {' + '.join(dropped['keys'])}")
+    
+    # Lower-cased names back the customer prefix search
+    await db.customers.update_many(
+        {"name_lower": {"$exists": False}},
+        [{"$set": {"name_lower": {"$toLower": "$name"}}}]
+    )
+    
+    # Records created before stores existed belong to the default store.
+    # Null matches a missing store_id too, and the time-series layout and
+    # the archive store those sales with an explicit null.
+    assign_default = {"$set": {"store_id": settings.DEFAULT_STORE_ID}}
+    unassigned = {"store_id": None}
+    for collection in ("products", "customers", ARCHIVE):
+        result = await db[collection].update_many(unassigned, assign_default)
+        if result.modified_count:
+            print(f"  [OK] {collection}: assigned {result.modified_count} records to store '{settings.DEFAULT_STORE_ID}'")
+    result = await sales_collection(db).update_many(sales_query(unassigned), sales_update(assign_default))
+    if result.modified_count:
+        print(f"  [OK] sales: assigned {result.modified_count} records to store '{settings.DEFAULT_STORE_ID}'")
+    
+    # Rollups and customer aggregates from before stores are keyed without one
+    archive_state = await get_archive_state(db)
+    if archive_state and archive_state.get("rolled_up_before") and await db[ROLLUPS].find_one(unassigned):
+        oldest = await db[ARCHIVE].find_one({}, {"created_at": 1}, sort=[("created_at", 1)])
+        await db[ROLLUPS].delete_many({})
+        if oldest:
+            first_day = oldest["created_at"].replace(hour=0, minute=0, second=0, microsecond=0)
+            await rebuild_rollups(db, first_day, archive_state["rolled_up_before"])
+        print("  [OK] Rebuilt sales rollups per store")
+    if await db[CUSTOMER_STATS].find_one(unassigned):
+        count = await backfill_customer_stats(db)
+        print(f"  [OK] Rebuilt customer stats per store: {count} customers")
     
     # Check if admin user exists
     admin_exists = await db.users.find_one({"role": "admin"})
@@ -101,7 +130,8 @@ async def init_database():
                 "price": 999.99,
                 "category": "Electronics",
                 "stock_quantity": 10,
-                "low_stock_threshold": 3
+                "low_stock_threshold": 3,
+                "store_id": settings.DEFAULT_STORE_ID
             },
             {
                 "name": "Mouse",
@@ -109,7 +139,8 @@ async def init_database():
                 "price": 29.99,
                 "category": "Electronics",
                 "stock_quantity": 50,
-                "low_stock_threshold": 10
+                "low_stock_threshold": 10,
+                "store_id": settings.DEFAULT_STORE_ID
             },
             {
                 "name": "Keyboard",
@@ -117,7 +148,8 @@ async def init_database():
                 "price": 79.99,
                 "category": "Electronics",
                 "stock_quantity": 25,
-                "low_stock_threshold": 5
+                "low_stock_threshold": 5,
+                "store_id": settings.DEFAULT_STORE_ID
             }
         ]
         await db.products.insert_many(sample_products)
@@ -125,6 +157,14 @@ async def init_database():
     else:
         print(f"\n[INFO] Products collection already has {product_count} products")
     
+    # Rebuild per-category inventory stats from the products collection
+    result = await reconcile_category_stats(db, repair=True)
+    print(f"  [OK] Category stats: {result['checked']} categories, {len(result['mismatched'])} repaired")
+
+    # Record opening stock in the movement ledger for products it doesn't cover yet
+    result = await reconcile_stock_ledger(db, repair=True)
+    print(f"  [OK] Stock ledger: {result['checked']} products, {len(result['mismatched'])} reconciled")
+    
     client.close()
     print("\nDatabase initialization complete!\n")
 
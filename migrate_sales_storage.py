@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Sales Storage Migration Script
+Copies the plain `sales` collection into the time-series layout while the
+API keeps serving traffic. Safe to re-run: progress is tracked by _id.
+
+Usage:
+    1. python migrate_sales_storage.py           (bulk copy + catch-up)
+    2. Set SALES_STORAGE_MODE=timeseries and restart the API workers
+    3. python migrate_sales_storage.py           (copy writes made before the switch)
+    4. python migrate_sales_storage.py --verify  (compare both layouts and
+                                                  look every sale up by id)
+"""
+import asyncio
+import sys
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from pymongo import ReplaceOne
+from src.utils.sales_store import TIMESERIES_OPTIONS, SALE_TIMES, to_sale_document, off_window, sale_ids_query
+
+BATCH_SIZE = 1000
+STATE_ID = "sales_timeseries"
+
+async def copy_batches(db, state):
+    """Copy sales with _id above the watermark until the source is drained"""
+    source = db["sales"]
+    target = db[settings.SALES_TIMESERIES_COLLECTION]
+    copied = 0
+    while True:
+        query = {"_id": {"$gt": state["last_id"]}} if state.get("last_id") else {}
+        batch = await source.find(query).sort("_id", 1).to_list(BATCH_SIZE)
+        if not batch:
+            return copied
+
+        # Time-series collections don't enforce unique _id, so clear out any
+        # partial copy of this batch left behind by an interrupted run
+        ids = [sale["_id"] for sale in batch]
+        created = [sale["created_at"] for sale in batch]
+        await target.delete_many({
+            "_id": {"$in": ids},
+            "created_at": {"$gte": min(created), "$lte": max(created)}
+        })
+        await target.insert_many([to_sale_document(sale, timeseries=True) for sale in batch], ordered=False)
+        # Id lookups only search near the ObjectId timestamp; record the
+        # sales whose created_at is elsewhere (backdated or imported)
+        off = [sale for sale in batch if off_window(sale)]
+        if off:
+            await db[SALE_TIMES].bulk_write([
+                ReplaceOne({"_id": sale["_id"]}, {"created_at": sale["created_at"]}, upsert=True) for sale in off
+            ], ordered=False)
+
+        state["last_id"] = ids[-1]
+        await db["migrations"].update_one({"_id": STATE_ID}, {"$set": {"last_id": state["last_id"]}})
+        copied += len(batch)
+        print(f"  [OK] Copied {copied} sales (up to {state['last_id']})")
+
+async def sync_cancellations(db, state):
+    """Carry over cancellations of sales that were copied before being cancelled"""
+    cancelled = await db["sales"].find(
+        {
+            "status": "cancelled",
+            "cancelled_at": {"$gte": state["started_at"]},
+            "_id": {"$lte": state["last_id"]}
+        },
+        {"_id": 1, "created_at": 1, "cancelled_at": 1}
+    ).to_list(None)
+    target = db[settings.SALES_TIMESERIES_COLLECTION]
+    for sale in cancelled:
+        await target.update_one(
+            {"_id": sale["_id"], "created_at": sale["created_at"]},
+            {"$set": {"meta.status": "cancelled", "cancelled_at": sale["cancelled_at"]}}
+        )
+    return len(cancelled)
+
+async def migrate(db):
+    existing_collections = await db.list_collection_names()
+    if settings.SALES_TIMESERIES_COLLECTION not in existing_collections:
+        await db.create_collection(settings.SALES_TIMESERIES_COLLECTION, timeseries=TIMESERIES_OPTIONS)
+        await db[settings.SALES_TIMESERIES_COLLECTION].create_index([("meta.employee_id", 1), ("created_at", -1)])
+        print(f"[OK] Created time-series collection: {settings.SALES_TIMESERIES_COLLECTION}")
+
+    state = await db["migrations"].find_one({"_id": STATE_ID})
+    if not state:
+        state = {"_id": STATE_ID, "last_id": None, "started_at": datetime.utcnow()}
+        await db["migrations"].insert_one(state)
+        print("[INFO] Starting new migration")
+    else:
+        print(f"[INFO] Resuming migration after {state['last_id']}")
+
+    # Keep catching up until a pass finds nothing new
+    while await copy_batches(db, state):
+        pass
+    synced = await sync_cancellations(db, state)
+    print(f"[OK] Source drained, {synced} cancellations synced")
+
+    if settings.SALES_STORAGE_MODE != "timeseries":
+        print("[INFO] Switch SALES_STORAGE_MODE=timeseries, restart, then run this script again")
+
+async def verify(db):
+    async def totals(collection, status_field):
+        pipeline = [{"$group": {
+            "_id": f"${status_field}",
+            "count": {"$sum": 1},
+            "total": {"$sum": "$total_amount"}
+        }}]
+        return {r["_id"]: (r["count"], round(r["total"], 2)) for r in await collection.aggregate(pipeline).to_list(None)}
+
+    source = await totals(db["sales"], "status")
+    target = await totals(db[settings.SALES_TIMESERIES_COLLECTION], "meta.status")
+    for status in sorted(set(source) | set(target), key=str):
+        marker = "[OK]" if source.get(status) == target.get(status) else "[MISMATCH]"
+        print(f"  {marker} {status}: sales={source.get(status)} {settings.SALES_TIMESERIES_COLLECTION}={target.get(status)}")
+
+    # Every copied sale must be reachable through the bounded id lookup
+    # the API uses (sale_ids_query). Off-window sales are looked up one by
+    # one, as cancel_sale would, so a missing SALE_TIMES entry shows up.
+    target = db[settings.SALES_TIMESERIES_COLLECTION]
+    checked = 0
+    missing = []
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = await db["sales"].find(query, {"_id": 1, "created_at": 1}).sort("_id", 1).to_list(BATCH_SIZE)
+        if not batch:
+            break
+        ids = [sale["_id"] for sale in batch if not off_window(sale)]
+        found = {sale["_id"] async for sale in target.find(sale_ids_query(ids, timeseries=True), {"_id": 1})}
+        missing += [sale_id for sale_id in ids if sale_id not in found]
+        for sale in filter(off_window, batch):
+            created = [time["created_at"] async for time in db[SALE_TIMES].find({"_id": sale["_id"]})]
+            if not await target.find_one(sale_ids_query([sale["_id"]], created, timeseries=True), {"_id": 1}):
+                missing.append(sale["_id"])
+        checked += len(batch)
+        last_id = batch[-1]["_id"]
+    marker = "[OK]" if not missing else "[MISMATCH]"
+    print(f"  {marker} id lookups: {checked - len(missing)} of {checked} sales found")
+    for sale_id in missing[:10]:
+        print(f"    missing: {sale_id}")
+
+async def main():
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[settings.DB_NAME]
+    if "--verify" in sys.argv:
+        await verify(db)
+    else:
+        await migrate(db)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,28 +1,62 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import SecondaryPreferred
 from src.config.settings import settings
+from src.utils.load_monitor import pool_monitor
+from src.utils.query_monitor import query_monitor
+from src.utils.tracing import command_tracer
+
+logger = logging.getLogger(__name__)
+
+def get_database_url():
+    # SECURITY NOTE: Ensure DB_USER and DB_PASS are strong and not hardcoded
+    # Insecure: Using default ports without auth in production
+    hosts = settings.DB_HOST if ":" in settings.DB_HOST else f"{settings.DB_HOST}:27017"
+    db_url = f"mongodb://{hosts}"
+    if settings.DB_USER and settings.DB_PASS:
+         db_url = f"mongodb://{settings.DB_USER}:{settings.DB_PASS}@{hosts}"
+    if settings.DB_REPLICA_SET:
+        db_url += f"/?replicaSet={settings.DB_REPLICA_SET}"
+    return db_url
 
 class Database:
     client: AsyncIOMotorClient = None
 
     async def connect_to_database(self):
-        # SECURITY NOTE: Ensure DB_USER and DB_PASS are strong and not hardcoded
-        # Insecure: Using default ports without auth in production
-        db_url = f"mongodb://{settings.DB_HOST}:27017"
-        if settings.DB_USER and settings.DB_PASS:
-             db_url = f"mongodb://{settings.DB_USER}:{settings.DB_PASS}@{settings.DB_HOST}:27017"
+        db_url = get_database_url()
         
         # SECURITY NOTE: NoSQL Injection
         # Insecure: Constructing queries with string concatenation from user input
         # Secure: Using Motor/PyMongo which handles parameterization
-        self.client = AsyncIOMotorClient(db_url)
-        print("Connected to MongoDB")
+        # Motor connects lazily; utils/lifecycle.py pings and fills the pool
+        # before the worker reports ready
+        self.client = AsyncIOMotorClient(
+            db_url,
+            minPoolSize=settings.DB_WARM_CONNECTIONS,
+            event_listeners=[pool_monitor, query_monitor, command_tracer]
+        )
+        logger.info("MongoDB client created for %s", settings.DB_HOST)
 
     async def close_database_connection(self):
         if self.client:
             self.client.close()
-            print("Closed MongoDB connection")
+            logger.info("Closed MongoDB connection")
 
 db = Database()
 
 async def get_database():
     return db.client[settings.DB_NAME]
+
+async def get_analytics_database():
+    """Reports and aggregations: prefer secondaries within the staleness bound"""
+    return db.client.get_database(
+        settings.DB_NAME,
+        read_preference=SecondaryPreferred(max_staleness=settings.ANALYTICS_MAX_STALENESS_SECONDS)
+    )
+
+async def get_read_database():
+    """User-facing reads. On a replica set these may use secondaries because
+    CausalConsistencyMiddleware makes them wait for the caller's own writes."""
+    if not settings.DB_REPLICA_SET:
+        return db.client[settings.DB_NAME]
+    return db.client.get_database(settings.DB_NAME, read_preference=SecondaryPreferred())
@@ -0,0 +1,137 @@
+from src.config.settings import settings
+from src.utils.sales_store import is_timeseries
+
+# Every index the application relies on: (collection, keys, options).
+# init_db.py creates them and the scheduler's index check recreates any
+# that go missing. Store-scoped queries lead with store_id, so the
+# store-prefixed keys also work as shard keys ({store_id: 1, created_at: 1}
+# for sales, a prefix of its index, {store_id: 1, _id: 1} for products and
+# customers).
+INDEXES = [
+    ("users", [("email", 1)], {"unique": True}),
+    # Chain-wide (unscoped admin) lookups use the single-field indexes,
+    # store-scoped ones their store-prefixed twins
+    ("products", [("name", 1)], {}),
+    ("products", [("category", 1)], {}),
+    ("products", [("store_id", 1), ("name", 1)], {}),
+    ("products", [("store_id", 1), ("category", 1)], {}),
+    # _id breaks created_at ties for the (created_at, _id) cursor of the
+    # sales search, which walks these in reverse
+    ("sales", [("created_at", 1), ("_id", 1)], {}),
+    ("sales", [("store_id", 1), ("created_at", 1), ("_id", 1)], {}),
+    ("sales", [("store_id", 1), ("employee_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales", [("store_id", 1), ("customer_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    # Sales search (sale_search_query): each filter, chain-wide and per store,
+    # in (created_at, _id) order; items.product_id is multikey
+    ("sales", [("employee_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales", [("items.product_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales", [("store_id", 1), ("items.product_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales", [("customer_name", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales", [("store_id", 1), ("customer_name", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales_archive", [("created_at", 1)], {}),
+    ("sales_archive", [("employee_id", 1), ("created_at", 1)], {}),
+    ("sales_archive", [("store_id", 1), ("created_at", 1)], {}),
+    ("sales_archive", [("store_id", 1), ("customer_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("sales_rollups", [("day", 1), ("employee_id", 1)], {}),
+    ("sales_rollups", [("store_id", 1), ("day", 1)], {}),
+    ("customers", [("name_lower", 1)], {}),
+    ("customers", [("email", 1)], {}),
+    ("customers", [("phone", 1)], {}),
+    ("customers", [("store_id", 1), ("email", 1)], {}),
+    ("customers", [("store_id", 1), ("phone", 1)], {}),
+    ("customers", [("store_id", 1), ("name_lower", 1)], {}),
+    ("customer_stats", [("last_purchase_at", -1)], {}),
+    ("customer_stats", [("first_purchase_at", -1)], {}),
+    ("customer_stats", [("total_spent", -1)], {}),
+    ("customer_stats", [("store_id", 1), ("last_purchase_at", -1)], {}),
+    ("customer_stats", [("store_id", 1), ("total_spent", -1)], {}),
+    ("stock_movements", [("product_id", 1), ("at", -1)], {}),
+    ("stock_movements", [("store_id", 1), ("at", 1)], {}),
+    ("stock_movements", [("at", 1)], {}),
+    ("stock_snapshots", [("at", -1)], {}),
+    ("stock_snapshots", [("product_id", 1), ("at", -1)], {}),
+    ("idempotency_keys", [("created_at", 1)], {"expireAfterSeconds": settings.IDEMPOTENCY_TTL_SECONDS}),
+]
+
+TIMESERIES_INDEXES = [
+    ([("meta.employee_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ([("meta.store_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ([("meta.store_id", 1), ("customer_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ([("items.product_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ([("meta.store_id", 1), ("items.product_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ([("customer_name", 1), ("created_at", -1), ("_id", -1)], {}),
+    ([("meta.store_id", 1), ("customer_name", 1), ("created_at", -1), ("_id", -1)], {}),
+]
+
+# Layouts replaced by the ones above, each a prefix of its replacement;
+# dropped by drop_retired_indexes once the replacement exists
+RETIRED_INDEXES = [
+    ("sales", [("employee_id", 1)]),
+    ("sales", [("created_at", 1)]),
+    ("sales", [("store_id", 1), ("created_at", 1)]),
+    ("sales", [("store_id", 1), ("employee_id", 1), ("created_at", -1)]),
+    ("sales", [("employee_id", 1), ("created_at", -1)]),
+    ("sales", [("items.product_id", 1), ("created_at", -1)]),
+    ("sales", [("store_id", 1), ("items.product_id", 1), ("created_at", -1)]),
+    ("sales", [("customer_name", 1), ("created_at", -1)]),
+    ("sales", [("store_id", 1), ("customer_name", 1), ("created_at", -1)]),
+    ("sales", [("store_id", 1), ("customer_id", 1), ("created_at", -1)]),
+    ("sales_archive", [("store_id", 1), ("customer_id", 1), ("created_at", -1)]),
+]
+
+TIMESERIES_RETIRED_INDEXES = [
+    [("meta.employee_id", 1), ("created_at", -1)],
+    [("meta.store_id", 1), ("created_at", -1)],
+    [("items.product_id", 1), ("created_at", -1)],
+    [("meta.store_id", 1), ("items.product_id", 1), ("created_at", -1)],
+    [("customer_name", 1), ("created_at", -1)],
+    [("meta.store_id", 1), ("customer_name", 1), ("created_at", -1)],
+    [("meta.store_id", 1), ("customer_id", 1), ("created_at", -1)],
+]
+
+def index_specs():
+    specs = list(INDEXES)
+    if is_timeseries():
+        specs += [(settings.SALES_TIMESERIES_COLLECTION, keys, options) for keys, options in TIMESERIES_INDEXES]
+    return specs
+
+def retired_specs():
+    specs = list(RETIRED_INDEXES)
+    if is_timeseries():
+        specs += [(settings.SALES_TIMESERIES_COLLECTION, keys) for keys in TIMESERIES_RETIRED_INDEXES]
+    return specs
+
+def _key(keys):
+    return tuple((field, int(direction)) for field, direction in keys)
+
+async def ensure_indexes(db):
+    """Create any expected index that is missing; returns the ones created"""
+    created = []
+    existing = {}
+    for collection, keys, options in index_specs():
+        if collection not in existing:
+            existing[collection] = {
+                _key(index["key"].items()) async for index in db[collection].list_indexes()
+            }
+        if _key(keys) in existing[collection]:
+            continue
+        await db[collection].create_index(keys, **options)
+        existing[collection].add(_key(keys))
+        created.append({"collection": collection, "keys": [field for field, _ in keys]})
+    return created
+
+async def drop_retired_indexes(db):
+    """Drop retired index layouts that are still present; returns the ones dropped"""
+    dropped = []
+    existing = {}
+    for collection, keys in retired_specs():
+        if collection not in existing:
+            existing[collection] = {
+                _key(index["key"].items()): index["name"] async for index in db[collection].list_indexes()
+            }
+        name = existing[collection].get(_key(keys))
+        if name is None:
+            continue
+        await db[collection].drop_index(name)
+        dropped.append({"collection": collection, "keys": [field for field, _ in keys]})
+    return dropped
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     PORT: int = 8000
@@ -6,10 +6,95 @@ class Settings(BaseSettings):
     DB_USER: str = ""
     DB_PASS: str = ""
     DB_NAME: str = "inventory_system"
+    # Replica set name; DB_HOST may then list members, e.g. "h1:27017,h2:27017,h3:27017"
+    DB_REPLICA_SET: str = ""
+    # Analytics reads go to secondaries no more than this far behind (minimum 90)
+    ANALYTICS_MAX_STALENESS_SECONDS: int = 120
+    # Most IDs POST /products/batch resolves in one call
+    PRODUCT_BATCH_MAX: int = 200
+    # Store assigned to records and users that don't name one (see utils/stores.py)
+    DEFAULT_STORE_ID: str = "main"
     JWT_SECRET: str
     COOKIE_SECRET: str
+    # "standard" or "timeseries" (MongoDB 7.0+, see migrate_sales_storage.py)
+    SALES_STORAGE_MODE: str = "standard"
+    SALES_TIMESERIES_COLLECTION: str = "sales_ts"
+    # Group-commit concurrent POST /sales/ requests (see utils/sale_batcher.py)
+    SALE_GROUP_COMMIT: bool = False
+    SALE_BATCH_WINDOW_MS: float = 2.0
+    SALE_BATCH_MAX_SIZE: int = 100
+    # Idempotency-Key handling for POST /sales/ (see utils/idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_POLL_MS: float = 50.0
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: int = 60
+    # Most sales POST /sales/cancel will void in one call
+    SALE_BULK_CANCEL_MAX: int = 1000
+    # Hot/cold archival of old sales (see archive_sales.py)
+    SALES_ARCHIVE_HORIZON_DAYS: int = 365
+    SALES_ARCHIVE_CANCELLED_AFTER_DAYS: int = 30
+    SALES_ARCHIVE_BATCH_SIZE: int = 1000
+    # RFM segment thresholds (see utils/customer_stats.py)
+    RFM_RECENT_DAYS: int = 30
+    RFM_LAPSED_DAYS: int = 180
+    RFM_FREQUENT_ORDERS: int = 5
+    RFM_HIGH_SPEND: float = 1000.0
+    # Columnar sales snapshot for offline reports (see utils/sales_snapshot.py)
+    ANALYTICS_SNAPSHOT_DIR: str = "data/sales_snapshot"
+    ANALYTICS_SNAPSHOT_LAG_SECONDS: int = 60
+    # Reorder-point suggestions (see utils/reorder.py)
+    REORDER_HISTORY_DAYS: int = 90
+    REORDER_LEAD_TIME_DAYS: float = 7.0
+    REORDER_SERVICE_Z: float = 1.65
+    # Stock movement ledger snapshots (see utils/stock_ledger.py)
+    LEDGER_SNAPSHOT_INTERVAL_SECONDS: int = 6 * 3600
+    LEDGER_SNAPSHOT_LAG_SECONDS: int = 60
+    # Warm-up, readiness and drain (see utils/lifecycle.py)
+    DB_WARM_CONNECTIONS: int = 10
+    WARMUP_TIMEOUT_SECONDS: float = 30.0
+    READINESS_HOLD_SECONDS: float = 10.0
+    READINESS_PING_TIMEOUT_SECONDS: float = 2.0
+    SHUTDOWN_DRAIN_SECONDS: float = 25.0
+    # Shared secret for POST /health/drain; empty disables the endpoint
+    DRAIN_SECRET: str = ""
+    # Cached catalog/categories/dashboard responses and their local snapshot (see utils/read_cache.py)
+    READ_CACHE_SNAPSHOT_FILE: str = "data/read_cache.bin"
+    READ_CACHE_SNAPSHOT_INTERVAL_SECONDS: int = 60
+    READ_CACHE_MAX_AGE_SECONDS: float = 300.0
+    READ_CACHE_MAX_ENTRIES: int = 256
+    READ_CACHE_STOCK_COALESCE_SECONDS: float = 1.0
+    # Background scheduler (see utils/scheduler.py and utils/jobs.py)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LEASE_SECONDS: int = 30
+    DASHBOARD_SNAPSHOT_INTERVAL_SECONDS: int = 60
+    DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS: int = 180
+    # Admission control (see middleware/admission_middleware.py)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_USER_RATE: float = 20.0
+    ADMISSION_USER_BURST: int = 40
+    ADMISSION_POOL_WAIT_LOW: int = 2
+    ADMISSION_POOL_WAIT_NORMAL: int = 10
+    ADMISSION_LAG_LOW_MS: float = 50.0
+    ADMISSION_LAG_NORMAL_MS: float = 200.0
+    # Per-request deadlines passed to Mongo as maxTimeMS (see middleware/deadline_middleware.py)
+    DEADLINE_DEFAULT_MS: int = 10000
+    DEADLINE_MAX_MS: int = 30000
+    DEADLINE_ROUTES: dict = {"/auth": 5000, "/sales": 5000, "/analytics": 20000}
+    # Correlation ids and sampled tracing (see middleware/tracing_middleware.py)
+    LOG_LEVEL: str = "INFO"
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_SERVICE_NAME: str = "inventory-api"
+    # OTLP/JSON lines; TRACE_EXPORT_URL is an OTLP/HTTP collector's /v1/traces
+    TRACE_EXPORT_FILE: str = "data/traces.jsonl"
+    TRACE_EXPORT_URL: str = ""
+    # Request profiling and slow-query capture (see middleware/profiling_middleware.py)
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_TOP_FUNCTIONS: int = 40
+    PROFILE_LOG_BYTES: int = 16 * 1024 * 1024
+    SLOW_QUERY_MS: float = 100.0
+    SLOW_QUERY_LOG_BYTES: int = 16 * 1024 * 1024
 
-    class Config:
-        env_file = ".env"
+    model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
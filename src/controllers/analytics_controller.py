@@ -4,36 +4,83 @@ from src.config.database import get_database
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from bson import ObjectId
+from src.utils.category_stats import get_category_stats, reconcile_category_stats
+from src.utils.sales_store import bson_now, sales_collection, sales_query, sales_field
+from src.utils.sales_archive import ARCHIVE, get_archive_state, archived_sales_totals, to_naive_utc
+from src.utils.sales_snapshot import (
+    SalesSnapshot, refresh_snapshot, moving_average_revenue, hour_of_week_heatmap,
+    basket_size_distribution, co_purchase_counts
+)
+from src.utils.reorder import compute_reorder_points, write_reorder_suggestions
+from src.config.settings import settings
+from fastapi.concurrency import run_in_threadpool
+from src.utils.request_context import find_options, command_options
+from src.utils.stores import store_filter
+from src.utils.read_cache import read_cache, bump_version, DASHBOARD
 
-async def get_dashboard_stats(current_user: UserResponse, db):
+async def get_dashboard_stats(current_user: UserResponse, db, store_id: Optional[str] = None):
     """Get comprehensive dashboard statistics"""
+    # Chain-wide admin figures are precomputed by the scheduler; serve them while fresh
+    if current_user.role == "admin" and not store_id:
+        snapshot = await db["dashboard_snapshots"].find_one({"_id": "admin"}, **find_options())
+        max_age = timedelta(seconds=settings.DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS)
+        if snapshot and datetime.utcnow() - snapshot["computed_at"] <= max_age:
+            return snapshot["stats"]
+    return await compute_dashboard_stats(current_user, db, store_id)
+
+async def get_cached_dashboard_stats(current_user: UserResponse, db, store_id: Optional[str] = None):
+    """Chain-wide admin figures through the read cache, refreshed with each precomputed snapshot"""
+    if current_user.role == "admin" and not store_id:
+        return await read_cache.fetch(
+            db, "dashboard:admin", (DASHBOARD,), lambda: get_dashboard_stats(current_user, db),
+            settings.DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS
+        )
+    return await get_dashboard_stats(current_user, db, store_id)
+
+async def precompute_admin_dashboard(db):
+    """Store the admin dashboard figures for get_dashboard_stats to serve"""
+    admin = UserResponse(id="scheduler", email="scheduler@example.com", role="admin", name="Scheduler")
+    stats = await compute_dashboard_stats(admin, db)
+    await db["dashboard_snapshots"].replace_one(
+        {"_id": "admin"},
+        {"stats": stats, "computed_at": datetime.utcnow()},
+        upsert=True
+    )
+    await bump_version(db, DASHBOARD)
+    return stats
+
+async def compute_dashboard_stats(current_user: UserResponse, db, store_id: Optional[str] = None):
+    """Compute dashboard statistics from the source collections"""
     stats = {}
+    store = store_filter(store_id)
     
     # Total products
-    total_products = await db["products"].count_documents({})
+    total_products = await db["products"].count_documents(store, **command_options())
     stats["total_products"] = total_products
     
     # Total customers (admin only)
     if current_user.role == "admin":
-        total_customers = await db["customers"].count_documents({})
+        total_customers = await db["customers"].count_documents(store, **command_options())
         stats["total_customers"] = total_customers
     
     # Total sales count
     if current_user.role == "admin":
-        total_sales = await db["sales"].count_documents({"status": "completed"})
+        total_sales = await sales_collection(db).count_documents(sales_query({**store, "status": "completed"}), **command_options())
     else:
-        total_sales = await db["sales"].count_documents({
+        total_sales = await sales_collection(db).count_documents(sales_query({
+            **store,
             "status": "completed",
             "employee_id": current_user.id
-        })
+        }), **command_options())
     stats["total_sales"] = total_sales
     
     # Total revenue
+    revenue_match = {**store, "status": "completed"}
+    if current_user.role != "admin":
+        revenue_match["employee_id"] = current_user.id
     pipeline = [
-        {"$match": {"status": "completed"}}
+        {"$match": sales_query(revenue_match)}
     ]
-    if current_user.role != "admin":
-        pipeline[0]["$match"]["employee_id"] = current_user.id
     
     pipeline.append({
         "$group": {
@@ -42,11 +89,12 @@ async def get_dashboard_stats(current_user: UserResponse, db):
         }
     })
     
-    result = await db["sales"].aggregate(pipeline).to_list(1)
+    result = await sales_collection(db).aggregate(pipeline, **command_options()).to_list(1)
     stats["total_revenue"] = result[0]["total_revenue"] if result else 0
     
     # Low stock products count
     low_stock_pipeline = [
+        {"$match": store},
         {
             "$project": {
                 "name": 1,
@@ -64,21 +112,21 @@ async def get_dashboard_stats(current_user: UserResponse, db):
         },
         {"$count": "count"}
     ]
-    low_stock_result = await db["products"].aggregate(low_stock_pipeline).to_list(1)
+    low_stock_result = await db["products"].aggregate(low_stock_pipeline, **command_options()).to_list(1)
     stats["low_stock_count"] = low_stock_result[0]["count"] if low_stock_result else 0
     
     # Today's sales
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_match = {"status": "completed", "created_at": {"$gte": today_start}}
+    today_match = {**store, "status": "completed", "created_at": {"$gte": today_start}}
     if current_user.role != "admin":
         today_match["employee_id"] = current_user.id
     
-    today_sales = await db["sales"].count_documents(today_match)
+    today_sales = await sales_collection(db).count_documents(sales_query(today_match), **command_options())
     stats["today_sales"] = today_sales
     
     # Today's revenue
     today_revenue_pipeline = [
-        {"$match": today_match},
+        {"$match": sales_query(today_match)},
         {
             "$group": {
                 "_id": None,
@@ -86,25 +134,25 @@ async def get_dashboard_stats(current_user: UserResponse, db):
             }
         }
     ]
-    today_revenue_result = await db["sales"].aggregate(today_revenue_pipeline).to_list(1)
+    today_revenue_result = await sales_collection(db).aggregate(today_revenue_pipeline, **command_options()).to_list(1)
     stats["today_revenue"] = today_revenue_result[0]["total"] if today_revenue_result else 0
     
     # This week's sales
     week_start = today_start - timedelta(days=today_start.weekday())
-    week_match = {"status": "completed", "created_at": {"$gte": week_start}}
+    week_match = {**store, "status": "completed", "created_at": {"$gte": week_start}}
     if current_user.role != "admin":
         week_match["employee_id"] = current_user.id
     
-    week_sales = await db["sales"].count_documents(week_match)
+    week_sales = await sales_collection(db).count_documents(sales_query(week_match), **command_options())
     stats["week_sales"] = week_sales
     
     # This month's sales
     month_start = today_start.replace(day=1)
-    month_match = {"status": "completed", "created_at": {"$gte": month_start}}
+    month_match = {**store, "status": "completed", "created_at": {"$gte": month_start}}
     if current_user.role != "admin":
         month_match["employee_id"] = current_user.id
     
-    month_sales = await db["sales"].count_documents(month_match)
+    month_sales = await sales_collection(db).count_documents(sales_query(month_match), **command_options())
     stats["month_sales"] = month_sales
     
     return stats
@@ -113,10 +161,11 @@ async def get_sales_report(
     start_date: Optional[str],
     end_date: Optional[str],
     current_user: UserResponse,
-    db
+    db,
+    store_id: Optional[str] = None
 ):
     """Get sales report with date filtering"""
-    match_query = {"status": "completed"}
+    match_query = {**store_filter(store_id), "status": "completed"}
     
     if current_user.role != "admin":
         match_query["employee_id"] = current_user.id
@@ -138,8 +187,19 @@ async def get_sales_report(
         except:
             pass
     
+    # Federate with the archive when the range reaches past the hot collection.
+    # The hot half then starts at archived_before, so a sale copied to the
+    # archive but not yet deleted from the hot collection counts once.
+    archive_state = await get_archive_state(db)
+    range_start = to_naive_utc(match_query.get("created_at", {}).get("$gte"))
+    range_end = to_naive_utc(match_query.get("created_at", {}).get("$lte"))
+    federate = archive_state and (range_start is None or range_start < archive_state["archived_before"])
+    hot_query = match_query
+    if federate:
+        hot_query = {**match_query, "created_at": {**match_query.get("created_at", {}), "$gte": archive_state["archived_before"]}}
+
     pipeline = [
-        {"$match": match_query},
+        {"$match": sales_query(hot_query)},
         {
             "$group": {
                 "_id": None,
@@ -150,29 +210,39 @@ async def get_sales_report(
         }
     ]
     
-    result = await db["sales"].aggregate(pipeline).to_list(1)
-    if not result:
+    result = await sales_collection(db).aggregate(pipeline, **command_options()).to_list(1)
+    total_sales = result[0]["total_sales"] if result else 0
+    count = result[0]["count"] if result else 0
+    
+    if federate:
+        base_query = {k: v for k, v in match_query.items() if k != "created_at"}
+        archived_total, archived_count = await archived_sales_totals(
+            db, base_query, range_start, range_end, archive_state
+        )
+        total_sales += archived_total
+        count += archived_count
+    
+    if not count:
         return {"total_sales": 0, "count": 0, "average_sale": 0}
     
-    return result[0]
+    return {"_id": None, "total_sales": total_sales, "count": count, "average_sale": total_sales / count}
 
-async def get_product_analytics(db):
+async def get_product_analytics(db, store_id: Optional[str] = None):
     """Get product analytics"""
-    pipeline = [
-        {
-            "$group": {
+    if store_id:
+        # The maintained stats are chain-wide, so one store is aggregated live
+        categories = await db["products"].aggregate([
+            {"$match": store_filter(store_id)},
+            {"$group": {
                 "_id": "$category",
                 "count": {"$sum": 1},
                 "total_stock": {"$sum": "$stock_quantity"},
-                "total_value": {
-                    "$sum": {"$multiply": ["$stock_quantity", "$price"]}
-                }
-            }
-        },
-        {"$sort": {"count": -1}}
-    ]
-    
-    categories = await db["products"].aggregate(pipeline).to_list(100)
+                "total_value": {"$sum": {"$multiply": ["$stock_quantity", "$price"]}}
+            }},
+            {"$sort": {"count": -1}}
+        ], **command_options()).to_list(None)
+    else:
+        categories = await get_category_stats(db)
     
     return {
         "categories": [
@@ -186,9 +256,14 @@ async def get_product_analytics(db):
         ]
     }
 
-async def get_low_stock_products(db):
+async def reconcile_product_analytics(repair: bool, db):
+    """Verify the incrementally maintained category stats against products"""
+    return await reconcile_category_stats(db, repair=repair)
+
+async def get_low_stock_products(db, store_id: Optional[str] = None):
     """Get products with low stock"""
     pipeline = [
+        {"$match": store_filter(store_id)},
         {
             "$project": {
                 "name": 1,
@@ -209,7 +284,7 @@ async def get_low_stock_products(db):
         {"$sort": {"stock_quantity": 1}}
     ]
     
-    products = await db["products"].aggregate(pipeline).to_list(100)
+    products = await db["products"].aggregate(pipeline, **command_options()).to_list(100)
     
     return [
         {
@@ -218,15 +293,16 @@ async def get_low_stock_products(db):
             "category": p["category"],
             "stock_quantity": p["stock_quantity"],
             "low_stock_threshold": p["low_stock_threshold"],
-            "price": p["price"]
+            "price": p["price"],
+            "store_id": p.get("store_id")
         }
         for p in products
     ]
 
-async def get_top_selling_products(limit: int, db):
+async def get_top_selling_products(limit: int, db, store_id: Optional[str] = None):
     """Get top selling products"""
     pipeline = [
-        {"$match": {"status": "completed"}},
+        {"$match": sales_query({**store_filter(store_id), "status": "completed"})},
         {"$unwind": "$items"},
         {
             "$group": {
@@ -235,38 +311,51 @@ async def get_top_selling_products(limit: int, db):
                 "total_revenue": {
                     "$sum": {"$multiply": ["$items.quantity", "$items.price_at_sale"]}
                 },
-                "sale_count": {"$sum": 1}
+                "sale_count": {"$sum": 1},
+                # Line-item snapshots; null only for sales older than the backfill
+                "name": {"$max": "$items.product_name"},
+                "category": {"$max": "$items.category"}
             }
         },
         {"$sort": {"total_quantity": -1}},
         {"$limit": limit}
     ]
     
-    results = await db["sales"].aggregate(pipeline).to_list(limit)
+    results = await sales_collection(db).aggregate(pipeline, **command_options()).to_list(limit)
     
-    # Get product details
+    # Fall back to the products collection only for unsnapshotted ones, in one query
+    missing = [ObjectId(r["_id"]) for r in results if r.get("name") is None and ObjectId.is_valid(r["_id"])]
+    products = {}
+    if missing:
+        products = {
+            str(p["_id"]): p
+            for p in await db["products"].find({"_id": {"$in": missing}}, {"name": 1, "category": 1}, **find_options()).to_list(None)
+        }
+
     top_products = []
     for result in results:
-        product = await db["products"].find_one({"_id": ObjectId(result["_id"])})
-        if product:
-            top_products.append({
-                "id": str(product["_id"]),
-                "name": product["name"],
-                "category": product.get("category", ""),
-                "total_quantity_sold": result["total_quantity"],
-                "total_revenue": result["total_revenue"],
-                "sale_count": result["sale_count"]
-            })
+        product = products.get(result["_id"], result)
+        if product.get("name") is None:
+            continue
+        top_products.append({
+            "id": result["_id"],
+            "name": product["name"],
+            "category": product.get("category") or "",
+            "total_quantity_sold": result["total_quantity"],
+            "total_revenue": result["total_revenue"],
+            "sale_count": result["sale_count"]
+        })
     
     return top_products
 
 async def get_revenue_by_date_range(
     start_date: Optional[str],
     end_date: Optional[str],
-    db
+    db,
+    store_id: Optional[str] = None
 ):
     """Get revenue analytics by date range"""
-    match_query = {"status": "completed"}
+    match_query = {**store_filter(store_id), "status": "completed"}
     
     if start_date:
         try:
@@ -287,7 +376,7 @@ async def get_revenue_by_date_range(
     
     # Daily revenue
     daily_pipeline = [
-        {"$match": match_query},
+        {"$match": sales_query(match_query)},
         {
             "$group": {
                 "_id": {
@@ -303,7 +392,7 @@ async def get_revenue_by_date_range(
         {"$sort": {"_id": 1}}
     ]
     
-    daily_revenue = await db["sales"].aggregate(daily_pipeline).to_list(100)
+    daily_revenue = await sales_collection(db).aggregate(daily_pipeline, **command_options()).to_list(100)
     
     return {
         "daily_revenue": [
@@ -316,3 +405,163 @@ async def get_revenue_by_date_range(
         ]
     }
 
+async def get_store_breakdown(start_date: Optional[str], end_date: Optional[str], db):
+    """Per-store sales totals and inventory figures, one row per store"""
+    created_at = {}
+    if start_date:
+        created_at["$gte"] = _parse_date(start_date)
+    if end_date:
+        created_at["$lte"] = _parse_date(end_date)
+    match_query = {"status": "completed"}
+    if created_at:
+        match_query["created_at"] = created_at
+
+    # Pull in the archive only when the range reaches back into it; the hot
+    # half then starts where the archive ends, so the two never overlap
+    archive_state = await get_archive_state(db)
+    federate = archive_state and ("$gte" not in created_at or created_at["$gte"] < archive_state["archived_before"])
+    hot_query = match_query
+    if federate:
+        hot_query = {**match_query, "created_at": {**created_at, "$gte": archive_state["archived_before"]}}
+    pipeline = [
+        {"$match": sales_query(hot_query)},
+        {"$project": {"store_id": f"${sales_field('store_id')}", "total_amount": 1}}
+    ]
+    if federate:
+        archived_match = {**match_query, "created_at": {**created_at, "$lt": archive_state["archived_before"]}}
+        pipeline.append({"$unionWith": {"coll": ARCHIVE, "pipeline": [
+            {"$match": archived_match},
+            {"$project": {"store_id": 1, "total_amount": 1}}
+        ]}})
+    pipeline.append({"$group": {
+        "_id": "$store_id",
+        "total_sales": {"$sum": "$total_amount"},
+        "count": {"$sum": 1}
+    }})
+    sales = {
+        row["_id"]: row
+        for row in await sales_collection(db).aggregate(pipeline, **command_options()).to_list(None)
+    }
+
+    inventory = {
+        row["_id"]: row
+        for row in await db["products"].aggregate([
+            {"$group": {
+                "_id": "$store_id",
+                "products": {"$sum": 1},
+                "total_value": {"$sum": {"$multiply": ["$stock_quantity", "$price"]}},
+                "low_stock": {"$sum": {"$cond": [{"$lte": ["$stock_quantity", "$low_stock_threshold"]}, 1, 0]}}
+            }}
+        ], **command_options()).to_list(None)
+    }
+
+    stores = []
+    for store_id in sorted(sales.keys() | inventory.keys(), key=str):
+        store_sales = sales.get(store_id, {})
+        store_inventory = inventory.get(store_id, {})
+        count = store_sales.get("count", 0)
+        stores.append({
+            "store_id": store_id,
+            "total_sales": store_sales.get("total_sales", 0),
+            "count": count,
+            "average_sale": store_sales["total_sales"] / count if count else 0,
+            "products": store_inventory.get("products", 0),
+            "inventory_value": store_inventory.get("total_value", 0),
+            "low_stock_count": store_inventory.get("low_stock", 0)
+        })
+    return {"stores": stores}
+
+def _parse_date(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return to_naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+async def refresh_offline_snapshot(db):
+    """Pull new sales and cancellations into the columnar snapshot"""
+    return await refresh_snapshot(db)
+
+async def get_offline_moving_average(window: int, start_date: Optional[str], end_date: Optional[str]):
+    """Daily revenue and trailing moving average from the offline snapshot"""
+    snapshot = SalesSnapshot()
+    days = await run_in_threadpool(
+        moving_average_revenue, snapshot, window, _parse_date(start_date), _parse_date(end_date)
+    )
+    return {"window": window, "as_of": snapshot.manifest["watermark"], "days": days}
+
+async def get_offline_heatmap(start_date: Optional[str], end_date: Optional[str]):
+    """Hour-of-week sales heatmap from the offline snapshot"""
+    snapshot = SalesSnapshot()
+    heatmap = await run_in_threadpool(
+        hour_of_week_heatmap, snapshot, _parse_date(start_date), _parse_date(end_date)
+    )
+    return {"as_of": snapshot.manifest["watermark"], **heatmap}
+
+async def get_offline_basket_sizes(max_size: int, start_date: Optional[str], end_date: Optional[str]):
+    """Basket-size distribution from the offline snapshot"""
+    snapshot = SalesSnapshot()
+    distribution = await run_in_threadpool(
+        basket_size_distribution, snapshot, max_size, _parse_date(start_date), _parse_date(end_date)
+    )
+    return {"as_of": snapshot.manifest["watermark"], "distribution": distribution}
+
+async def get_offline_co_purchases(top_products: int, limit: int, start_date: Optional[str], end_date: Optional[str], db):
+    """Most frequent product pairs from the offline snapshot"""
+    snapshot = SalesSnapshot()
+    pairs = await run_in_threadpool(
+        co_purchase_counts, snapshot, top_products, limit, _parse_date(start_date), _parse_date(end_date)
+    )
+    ids = {pid for pair in pairs for pid in (pair["product_a"], pair["product_b"]) if ObjectId.is_valid(pid)}
+    names = {
+        str(p["_id"]): p["name"]
+        for p in await db["products"].find({"_id": {"$in": [ObjectId(pid) for pid in ids]}}, {"name": 1}, **find_options()).to_list(len(ids))
+    }
+    for pair in pairs:
+        pair["product_a_name"] = names.get(pair["product_a"])
+        pair["product_b_name"] = names.get(pair["product_b"])
+    return {"as_of": snapshot.manifest["watermark"], "pairs": pairs}
+
+async def run_reorder_job(apply: bool, db):
+    """Recompute sales velocity and reorder points for the whole catalog"""
+    await refresh_snapshot(db)
+    computed_at = bson_now()
+    product_ids, velocity, reorder = await run_in_threadpool(
+        compute_reorder_points, SalesSnapshot(), computed_at,
+        settings.REORDER_HISTORY_DAYS, settings.REORDER_LEAD_TIME_DAYS, settings.REORDER_SERVICE_Z
+    )
+    modified = await write_reorder_suggestions(db, product_ids, velocity, reorder, computed_at, apply)
+    return {
+        "computed_at": computed_at,
+        "products_with_sales": len(product_ids),
+        "modified": modified,
+        "applied_to_thresholds": apply
+    }
+
+async def get_reorder_suggestions(below_only: bool, limit: int, db, store_id: Optional[str] = None):
+    """Products with their suggested reorder points, most urgent first"""
+    pipeline = [{"$match": {**store_filter(store_id), "suggested_reorder_point": {"$exists": True}}}]
+    if below_only:
+        pipeline[0]["$match"]["$expr"] = {"$lte": ["$stock_quantity", "$suggested_reorder_point"]}
+    pipeline += [
+        {"$set": {"cover": {"$subtract": ["$stock_quantity", "$suggested_reorder_point"]}}},
+        {"$sort": {"cover": 1}},
+        {"$limit": limit}
+    ]
+    products = await db["products"].aggregate(pipeline, **command_options()).to_list(limit)
+    
+    return [
+        {
+            "id": str(p["_id"]),
+            "name": p["name"],
+            "category": p["category"],
+            "stock_quantity": p["stock_quantity"],
+            "low_stock_threshold": p["low_stock_threshold"],
+            "store_id": p.get("store_id"),
+            "sales_velocity": p.get("sales_velocity", 0.0),
+            "suggested_reorder_point": p["suggested_reorder_point"],
+            "reorder_computed_at": p.get("reorder_computed_at")
+        }
+        for p in products
+    ]
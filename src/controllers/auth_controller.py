@@ -3,10 +3,11 @@ from src.models.user import UserCreate, UserInDB, UserResponse
 from src.utils.auth import get_password_hash, verify_password, create_access_token
 from src.config.database import get_database
 from datetime import timedelta
+from src.utils.request_context import find_options
 
 async def register_user(user: UserCreate, db=Depends(get_database)):
     # Check if user exists
-    existing_user = await db["users"].find_one({"email": user.email})
+    existing_user = await db["users"].find_one({"email": user.email}, **find_options())
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -17,21 +18,17 @@ async def register_user(user: UserCreate, db=Depends(get_database)):
         "email": user.email,
         "role": user.role,
         "name": user.name,
+        "store_id": user.store_id,
         "hashed_password": hashed_password
     }
     
     new_user = await db["users"].insert_one(user_doc)
-    created_user = await db["users"].find_one({"_id": new_user.inserted_id})
+    created_user = await db["users"].find_one({"_id": new_user.inserted_id}, **find_options())
     
-    return UserResponse(
-        id=str(created_user["_id"]),
-        email=created_user["email"],
-        role=created_user["role"],
-        name=created_user["name"]
-    )
+    return UserResponse.model_validate(created_user)
 
 async def login_user(response: Response, form_data, db=Depends(get_database)):
-    user = await db["users"].find_one({"email": form_data.username}) # OAuth2PasswordRequestForm uses username
+    user = await db["users"].find_one({"email": form_data.username}, **find_options()) # OAuth2PasswordRequestForm uses username
     if not user or not verify_password(form_data.password, user["hashed_password"]):
         # SECURITY NOTE: Don't reveal if it's email or password that is wrong
         # Insecure: "User not found" or "Wrong password"
@@ -1,40 +1,155 @@
 from fastapi import HTTPException, Depends
-from src.models.customer import CustomerCreate, CustomerUpdate, CustomerInDB, CustomerResponse
+from src.models.customer import CustomerCreate, CustomerUpdate, CustomerInDB, CustomerResponse, CUSTOMER_LIST
 from src.config.database import get_database
+from src.models.sale import SaleResponse, SALE_LIST
+from src.utils.sales_store import sales_collection, sales_query, sales_field, from_sale_document
+from src.utils.sales_archive import ARCHIVE
+from src.utils.customer_stats import SEGMENTS, get_segment, get_top_customers
 from bson import ObjectId
+from datetime import datetime
+from typing import Optional
+import re
+from src.utils.request_context import find_options, command_options, write_options
+from src.utils.stores import store_filter
+from src.utils.fieldsets import projection, sparse_response, list_response
+from src.config.settings import settings
 
 async def create_customer(customer: CustomerCreate, db=Depends(get_database)):
     customer_dict = customer.model_dump()
-    new_customer = await db["customers"].insert_one(customer_dict)
-    created_customer = await db["customers"].find_one({"_id": new_customer.inserted_id})
-    return CustomerResponse(
-        id=str(created_customer["_id"]),
-        name=created_customer["name"],
-        email=created_customer.get("email"),
-        phone=created_customer.get("phone"),
-        address=created_customer.get("address")
-    )
+    customer_dict["store_id"] = customer.store_id or settings.DEFAULT_STORE_ID
+    # Lower-cased copy of the name backs the indexed prefix search
+    customer_dict["name_lower"] = customer.name.lower()
+    new_customer = await db["customers"].insert_one(customer_dict, **write_options())
+    created_customer = await db["customers"].find_one({"_id": new_customer.inserted_id}, **find_options())
+    return CustomerResponse.model_validate(created_customer)
+
+async def get_customers(
+    search: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db=Depends(get_database),
+    store_id: str = None,
+    fields: tuple = None
+):
+    """List customers, optionally by name prefix or exact email/phone"""
+    query = store_filter(store_id)
+    if search:
+        # Anchored, case-sensitive regex on the lower-cased name uses the index bounds
+        query["name_lower"] = {"$regex": "^" + re.escape(search.lower())}
+    if email:
+        query["email"] = email
+    if phone:
+        query["phone"] = phone
+    
+    customers = await db["customers"].find(
+        query, projection(fields) if fields else None, **find_options()
+    ).sort("name_lower", 1).skip(skip).limit(limit).to_list(limit)
+    if fields:
+        return sparse_response(CustomerResponse, fields, customers)
+    return list_response(CUSTOMER_LIST, customers)
 
-async def get_customers(db=Depends(get_database)):
-    customers = await db["customers"].find().to_list(1000)
-    return [CustomerResponse(
-        id=str(c["_id"]),
-        name=c["name"],
-        email=c.get("email"),
-        phone=c.get("phone"),
-        address=c.get("address")
-    ) for c in customers]
-
-async def get_sales_analytics(db=Depends(get_database)):
+async def get_sales_analytics(db=Depends(get_database), store_id: str = None):
     pipeline = [
-        {"$match": {"status": "completed"}},
+        {"$match": sales_query({**store_filter(store_id), "status": "completed"})},
         {"$group": {
             "_id": None,
             "total_sales": {"$sum": "$total_amount"},
             "count": {"$sum": 1}
         }}
     ]
-    result = await db["sales"].aggregate(pipeline).to_list(1)
+    result = await sales_collection(db).aggregate(pipeline, **command_options()).to_list(1)
     if not result:
         return {"total_sales": 0, "count": 0}
     return {"total_sales": result[0]["total_sales"], "count": result[0]["count"]}
+
+async def get_customer_sales(
+    id: str,
+    before: Optional[datetime] = None,
+    limit: int = 50,
+    db=Depends(get_database),
+    store_id: str = None,
+    fields: tuple = None,
+    before_id: str = None
+):
+    """Purchase history of one customer, newest first.
+
+    Pages through the customer's sales with a (created_at, _id) cursor using
+    the (store_id, customer_id, created_at, _id) indexes, continuing into the
+    archive once the hot collection is exhausted. `before_id` breaks ties
+    between sales sharing the cursor's created_at.
+    """
+    if not ObjectId.is_valid(id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    if before_id is not None and (before is None or not ObjectId.is_valid(before_id)):
+        raise HTTPException(status_code=400, detail="before_id needs before and a valid sale ID")
+    customer = await db["customers"].find_one(
+        {**store_filter(store_id), "_id": ObjectId(id)}, {"store_id": 1}, **find_options()
+    )
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    query = {**store_filter(customer.get("store_id")), "customer_id": id}
+    if before:
+        _page_before(query, before, before_id and ObjectId(before_id))
+    # The cursor needs created_at (id always comes back) even when the client didn't ask for it
+    cursor_fields = fields and tuple(dict.fromkeys((*fields, "created_at")))
+    sales = await sales_collection(db).find(
+        sales_query(query), projection(cursor_fields, sales_field) if fields else None, **find_options()
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit).to_list(limit)
+    sales = [from_sale_document(s) for s in sales]
+    
+    if len(sales) < limit:
+        if sales:
+            _page_before(query, sales[-1]["created_at"], sales[-1]["_id"])
+        remaining = limit - len(sales)
+        sales += await db[ARCHIVE].find(
+            query, projection(cursor_fields) if fields else None, **find_options()
+        ).sort([("created_at", -1), ("_id", -1)]).limit(remaining).to_list(remaining)
+    
+    if fields:
+        return sparse_response(SaleResponse, cursor_fields, sales)
+    return list_response(SALE_LIST, sales)
+
+def _page_before(query: dict, before: datetime, before_id: Optional[ObjectId]):
+    """Restrict the query to sales before (before, before_id) in (created_at, _id) order"""
+    query.pop("$nor", None)
+    if before_id is None:
+        query["created_at"] = {"$lt": before}
+    else:
+        query["created_at"] = {"$lte": before}
+        query["$nor"] = [{"created_at": before, "_id": {"$gte": before_id}}]
+
+async def _with_customer_details(stats: list, db):
+    """Attach name/email to customer aggregates with a single $in lookup"""
+    ids = [ObjectId(s["_id"]) for s in stats if ObjectId.is_valid(s["_id"])]
+    customers = {
+        str(c["_id"]): c
+        for c in await db["customers"].find({"_id": {"$in": ids}}, {"name": 1, "email": 1}, **find_options()).to_list(len(ids))
+    }
+    now = datetime.utcnow()
+    return [
+        {
+            "customer_id": s["_id"],
+            "name": customers.get(s["_id"], {}).get("name"),
+            "email": customers.get(s["_id"], {}).get("email"),
+            "order_count": s["order_count"],
+            "total_spent": s["total_spent"],
+            "first_purchase_at": s.get("first_purchase_at"),
+            "last_purchase_at": s.get("last_purchase_at"),
+            "recency_days": (now - s["last_purchase_at"]).days if s.get("last_purchase_at") else None
+        }
+        for s in stats
+    ]
+
+async def get_customer_segment(segment: str, limit: int = 50, db=Depends(get_database), store_id: str = None):
+    """Customers in an RFM segment, served from the maintained aggregates"""
+    if segment not in SEGMENTS:
+        raise HTTPException(status_code=400, detail=f"Unknown segment. Choose from: {', '.join(SEGMENTS)}")
+    stats = await get_segment(db, segment, limit, store_id)
+    return {"segment": segment, "customers": await _with_customer_details(stats, db)}
+
+async def get_top_customers_by_spend(limit: int = 10, db=Depends(get_database), store_id: str = None):
+    stats = await get_top_customers(db, limit, store_id)
+    return await _with_customer_details(stats, db)
@@ -1,82 +1,127 @@
 from fastapi import HTTPException, Depends
-from src.models.product import ProductCreate, ProductUpdate, ProductInDB, ProductResponse
+from src.models.product import ProductCreate, ProductUpdate, ProductInDB, ProductResponse, ProductBatchItem, PRODUCT_LIST
 from src.config.database import get_database
+from src.utils.category_stats import add_product, apply_category_deltas, get_category_stats
 from bson import ObjectId
+from pymongo import ReturnDocument
+from src.utils.request_context import find_options, command_options, write_options
+from src.utils.stores import store_filter
+from src.utils.fieldsets import projection, sparse_response, list_response
+from src.utils.stock_ledger import add_movement, record_movements
+from src.utils.read_cache import read_cache, bump_version, PRODUCTS, STOCK
+from src.config.settings import settings
 
 async def create_product(product: ProductCreate, db=Depends(get_database)):
     product_dict = product.model_dump()
-    new_product = await db["products"].insert_one(product_dict)
-    created_product = await db["products"].find_one({"_id": new_product.inserted_id})
-    return ProductResponse(
-        id=str(created_product["_id"]),
-        name=created_product["name"],
-        description=created_product.get("description"),
-        price=created_product["price"],
-        category=created_product["category"],
-        stock_quantity=created_product["stock_quantity"],
-        low_stock_threshold=created_product["low_stock_threshold"]
-    )
+    product_dict["store_id"] = product.store_id or settings.DEFAULT_STORE_ID
+    new_product = await db["products"].insert_one(product_dict, **write_options())
+
+    deltas = {}
+    add_product(deltas, product_dict)
+    await apply_category_deltas(db, deltas)
+    await bump_version(db, PRODUCTS)
+    if product_dict.get("stock_quantity"):
+        movements = []
+        add_movement(movements, {**product_dict, "_id": new_product.inserted_id}, product_dict["stock_quantity"], "received")
+        await record_movements(db, movements)
+
+    created_product = await db["products"].find_one({"_id": new_product.inserted_id}, **find_options())
+    return ProductResponse.model_validate(created_product)
+
+async def get_products(db=Depends(get_database), store_id: str = None, fields: tuple = None):
+    products = await db["products"].find(
+        store_filter(store_id), projection(fields) if fields else None, **find_options()
+    ).to_list(1000)
+    if fields:
+        return sparse_response(ProductResponse, fields, products)
+    return list_response(PRODUCT_LIST, products)
 
-async def get_products(db=Depends(get_database)):
-    products = await db["products"].find().to_list(1000)
-    return [ProductResponse(
-        id=str(p["_id"]),
-        name=p["name"],
-        description=p.get("description"),
-        price=p["price"],
-        category=p["category"],
-        stock_quantity=p["stock_quantity"],
-        low_stock_threshold=p["low_stock_threshold"]
-    ) for p in products]
-
-async def get_product(id: str, db=Depends(get_database)):
+async def get_product(id: str, db=Depends(get_database), store_id: str = None, fields: tuple = None):
     if not ObjectId.is_valid(id):
         raise HTTPException(status_code=400, detail="Invalid ID")
-    product = await db["products"].find_one({"_id": ObjectId(id)})
+    product = await db["products"].find_one(
+        {**store_filter(store_id), "_id": ObjectId(id)}, projection(fields) if fields else None, **find_options()
+    )
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return ProductResponse(
-        id=str(product["_id"]),
-        name=product["name"],
-        description=product.get("description"),
-        price=product["price"],
-        category=product["category"],
-        stock_quantity=product["stock_quantity"],
-        low_stock_threshold=product["low_stock_threshold"]
-    )
+    if fields:
+        return sparse_response(ProductResponse, fields, product)
+    return ProductResponse.model_validate(product)
+
+async def get_products_by_ids(ids: list, db=Depends(get_database), store_id: str = None):
+    """Resolve many IDs with one $in query, in request order, duplicates included"""
+    if len(ids) > settings.PRODUCT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.PRODUCT_BATCH_MAX} IDs per request")
+    valid = {id for id in ids if ObjectId.is_valid(id)}
+    products = {}
+    if valid:
+        found = await db["products"].find(
+            {**store_filter(store_id), "_id": {"$in": [ObjectId(id) for id in valid]}}, **find_options()
+        ).to_list(None)
+        products = {str(p["_id"]): p for p in found}
+
+    results = []
+    for id in ids:
+        if id not in valid:
+            results.append(ProductBatchItem(id=id, status="invalid_id"))
+            continue
+        p = products.get(id)
+        if p is None:
+            results.append(ProductBatchItem(id=id, status="not_found"))
+            continue
+        results.append(ProductBatchItem(id=id, status="ok", product=ProductResponse.model_validate(p)))
+    return results
 
-async def update_product(id: str, product: ProductUpdate, db=Depends(get_database)):
+async def update_product(id: str, product: ProductUpdate, db=Depends(get_database), store_id: str = None):
     if not ObjectId.is_valid(id):
         raise HTTPException(status_code=400, detail="Invalid ID")
     
     update_data = {k: v for k, v in product.model_dump().items() if v is not None}
     
     if len(update_data) >= 1:
-        update_result = await db["products"].update_one(
-            {"_id": ObjectId(id)}, {"$set": update_data}
+        previous_product = await db["products"].find_one_and_update(
+            {**store_filter(store_id), "_id": ObjectId(id)}, {"$set": update_data},
+            return_document=ReturnDocument.BEFORE, **write_options()
         )
-        if update_result.modified_count == 0:
-             # Check if product exists
-            if not await db["products"].find_one({"_id": ObjectId(id)}):
-                raise HTTPException(status_code=404, detail="Product not found")
+        if not previous_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        # Move the product's contribution from its old figures to the new ones
+        deltas = {}
+        add_product(deltas, previous_product, -1)
+        add_product(deltas, {**previous_product, **update_data})
+        await apply_category_deltas(db, deltas)
+        await bump_version(db, PRODUCTS)
+
+        current = {**previous_product, **update_data}
+        movements = []
+        stock_change = current.get("stock_quantity", 0) - previous_product.get("stock_quantity", 0)
+        if stock_change:
+            add_movement(movements, current, stock_change, "adjustment")
+        elif current["price"] != previous_product["price"]:
+            add_movement(movements, current, 0, "repriced")
+        await record_movements(db, movements)
     
-    existing_product = await db["products"].find_one({"_id": ObjectId(id)})
-    return ProductResponse(
-        id=str(existing_product["_id"]),
-        name=existing_product["name"],
-        description=existing_product.get("description"),
-        price=existing_product["price"],
-        category=existing_product["category"],
-        stock_quantity=existing_product["stock_quantity"],
-        low_stock_threshold=existing_product["low_stock_threshold"]
-    )
+    existing_product = await db["products"].find_one({**store_filter(store_id), "_id": ObjectId(id)}, **find_options())
+    if not existing_product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return ProductResponse.model_validate(existing_product)
 
-async def delete_product(id: str, db=Depends(get_database)):
+async def delete_product(id: str, db=Depends(get_database), store_id: str = None):
     if not ObjectId.is_valid(id):
         raise HTTPException(status_code=400, detail="Invalid ID")
-    delete_result = await db["products"].delete_one({"_id": ObjectId(id)})
-    if delete_result.deleted_count == 0:
+    deleted_product = await db["products"].find_one_and_delete({**store_filter(store_id), "_id": ObjectId(id)}, **write_options())
+    if not deleted_product:
         raise HTTPException(status_code=404, detail="Product not found")
+
+    deltas = {}
+    add_product(deltas, deleted_product, -1)
+    await apply_category_deltas(db, deltas)
+    await bump_version(db, PRODUCTS)
+    if deleted_product.get("stock_quantity"):
+        movements = []
+        add_movement(movements, deleted_product, -deleted_product["stock_quantity"], "product_deleted")
+        await record_movements(db, movements)
     return {"message": "Product deleted"}
 
 async def search_products(
@@ -85,10 +130,12 @@ async def search_products(
     min_price: float = None,
     max_price: float = None,
     low_stock_only: bool = False,
-    db=Depends(get_database)
+    db=Depends(get_database),
+    store_id: str = None,
+    fields: tuple = None
 ):
     """Search and filter products"""
-    query = {}
+    query = store_filter(store_id)
     
     if search:
         query["$or"] = [
@@ -110,27 +157,32 @@ async def search_products(
     if low_stock_only:
         query["$expr"] = {"$lte": ["$stock_quantity", "$low_stock_threshold"]}
     
-    products = await db["products"].find(query).to_list(1000)
-    return [ProductResponse(
-        id=str(p["_id"]),
-        name=p["name"],
-        description=p.get("description"),
-        price=p["price"],
-        category=p["category"],
-        stock_quantity=p["stock_quantity"],
-        low_stock_threshold=p["low_stock_threshold"]
-    ) for p in products]
-
-async def get_categories(db=Depends(get_database)):
+    products = await db["products"].find(query, projection(fields) if fields else None, **find_options()).to_list(1000)
+    if fields:
+        return sparse_response(ProductResponse, fields, products)
+    return list_response(PRODUCT_LIST, products)
+
+async def get_categories(db=Depends(get_database), store_id: str = None):
     """Get all unique product categories"""
-    pipeline = [
-        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    categories = await db["products"].aggregate(pipeline).to_list(100)
+    if store_id:
+        # Maintained stats are chain-wide; a single store is small enough to count live
+        categories = await db["products"].aggregate([
+            {"$match": store_filter(store_id)},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}}
+        ], **command_options()).to_list(None)
+    else:
+        categories = await get_category_stats(db)
     return {
         "categories": [
             {"name": cat["_id"], "count": cat["count"]}
             for cat in categories if cat["_id"]
         ]
-    }
\ No newline at end of file
+    }
+
+async def get_cached_products(db, store_id: str = None):
+    """The full catalog of a scope through the read cache"""
+    return await read_cache.fetch(db, f"catalog:{store_id or '*'}", (PRODUCTS, STOCK), lambda: get_products(db, store_id))
+
+async def get_cached_categories(db, store_id: str = None):
+    return await read_cache.fetch(db, f"categories:{store_id or '*'}", (PRODUCTS,), lambda: get_categories(db, store_id))
@@ -1,83 +1,227 @@
-from fastapi import HTTPException, Depends
-from src.models.sale import SaleCreate, SaleInDB, SaleResponse
+from fastapi import HTTPException, Depends, Response
+from src.models.sale import SaleCreate, SaleInDB, SaleResponse, SaleBulkCancel, SaleSearch, SALE_LIST, RECEIPT_LIST
 from src.config.database import get_database
+from src.config.settings import settings
+from src.utils.category_stats import add_stock_change, apply_category_deltas
+from src.utils.read_cache import bump_version_soon, STOCK
+from src.utils.sales_store import (
+    sales_collection, sales_query, sales_update, sales_field, sale_id_query, sale_ids_query, sale_times,
+    to_sale_document, from_sale_document, bson_now
+)
+from src.utils.sale_batcher import sale_batcher
+from src.utils.sales_archive import ARCHIVE
+from src.utils.customer_stats import record_purchases, record_cancellations
+from src.utils.request_context import find_options, write_options, request_tag
+from src.utils.stores import store_filter
+from src.utils.fieldsets import projection, sparse_response, list_response
+from src.utils.sale_items import snapshot_item, fill_missing_snapshots
+from src.utils.stock_ledger import add_movement, record_movements
 from bson import ObjectId
+import re
 from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
 
-async def create_sale(sale: SaleCreate, employee_id: str, db=Depends(get_database)):
-    total_amount = 0
-    for item in sale.items:
-        if not ObjectId.is_valid(item.product_id):
-            raise HTTPException(status_code=400, detail=f"Invalid product ID: {item.product_id}")
-        
-        product = await db["products"].find_one({"_id": ObjectId(item.product_id)})
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product not found: {item.product_id}")
-        
-        if product["stock_quantity"] < item.quantity:
-            raise HTTPException(status_code=400, detail=f"Insufficient stock for: {product['name']}")
-        
-        # Calculate total
-        total_amount += item.price_at_sale * item.quantity
-
-        # Update stock
-        await db["products"].update_one(
-            {"_id": ObjectId(item.product_id)},
-            {"$inc": {"stock_quantity": -item.quantity}}
+async def create_sale(sale: SaleCreate, employee_id: str, db=Depends(get_database), store_id: str = None):
+    store_id = store_id or settings.DEFAULT_STORE_ID
+    customer_name = sale.customer_name
+    if sale.customer_id is not None:
+        if not ObjectId.is_valid(sale.customer_id):
+            raise HTTPException(status_code=400, detail=f"Invalid customer ID: {sale.customer_id}")
+        customer = await db["customers"].find_one(
+            {"store_id": store_id, "_id": ObjectId(sale.customer_id)}, {"name": 1}, **find_options()
         )
+        if not customer:
+            raise HTTPException(status_code=404, detail=f"Customer not found: {sale.customer_id}")
+        customer_name = customer_name or customer["name"]
+
+    if settings.SALE_GROUP_COMMIT:
+        sale_doc = {
+            "items": [item.model_dump() for item in sale.items],
+            "total_amount": sum(item.price_at_sale * item.quantity for item in sale.items),
+            "employee_id": employee_id,
+            "customer_name": customer_name,
+            "customer_id": sale.customer_id,
+            "store_id": store_id,
+            "created_at": bson_now(),
+            "status": "completed"
+        }
+        created_sale = await sale_batcher.submit(db, sale_doc)
+        return SaleResponse.model_validate(created_sale)
+
+    total_amount = 0
+    items = []
+    category_deltas = {}
+    movements = []
+    sale_id = ObjectId()
+    # Stock already decremented stays reflected in the stats and ledger even if a later item fails
+    try:
+        for item in sale.items:
+            if not ObjectId.is_valid(item.product_id):
+                raise HTTPException(status_code=400, detail=f"Invalid product ID: {item.product_id}")
+            
+            # No deadline here: stock for earlier items is already decremented.
+            # The tag still lets tracing and the query monitor attribute the read.
+            product = await db["products"].find_one(
+                {"store_id": store_id, "_id": ObjectId(item.product_id)}, comment=request_tag()
+            )
+            if not product:
+                raise HTTPException(status_code=404, detail=f"Product not found: {item.product_id}")
+            
+            if product["stock_quantity"] < item.quantity:
+                raise HTTPException(status_code=400, detail=f"Insufficient stock for: {product['name']}")
+            
+            # Calculate total
+            total_amount += item.price_at_sale * item.quantity
+            items.append(snapshot_item(item.model_dump(), product))
+
+            # Update stock
+            await db["products"].update_one(
+                {"store_id": store_id, "_id": ObjectId(item.product_id)},
+                {"$inc": {"stock_quantity": -item.quantity}}, **write_options()
+            )
+            add_stock_change(category_deltas, product["category"], product["price"], -item.quantity)
+            add_movement(movements, product, -item.quantity, "sale", sale_id)
+    finally:
+        await apply_category_deltas(db, category_deltas)
+        await record_movements(db, movements)
+        if category_deltas:
+            bump_version_soon(db, STOCK)
 
     sale_doc = {
-        "items": [item.model_dump() for item in sale.items],
+        "_id": sale_id,
+        "items": items,
         "total_amount": total_amount,
         "employee_id": employee_id,
-        "customer_name": sale.customer_name,
-        "created_at": datetime.utcnow(),
+        "customer_name": customer_name,
+        "customer_id": sale.customer_id,
+        "store_id": store_id,
+        "created_at": bson_now(),
         "status": "completed"
     }
     
-    new_sale = await db["sales"].insert_one(sale_doc)
-    created_sale = await db["sales"].find_one({"_id": new_sale.inserted_id})
-    return SaleResponse(
-        id=str(created_sale["_id"]),
-        items=created_sale["items"],
-        total_amount=created_sale["total_amount"],
-        employee_id=created_sale["employee_id"],
-        customer_name=created_sale.get("customer_name"),
-        created_at=created_sale["created_at"],
-        status=created_sale["status"]
-    )
+    await sales_collection(db).insert_one(to_sale_document(sale_doc), **write_options())
+    created_sale = sale_doc
+    await record_purchases(db, [created_sale])
+    return SaleResponse.model_validate(created_sale)
+
+async def receipts_response(db, sales: list) -> Response:
+    """Sales with named, totalled line items; legacy items are completed in one lookup"""
+    sales = await fill_missing_snapshots(db, sales)
+    return list_response(RECEIPT_LIST, sales)
+
+async def get_sales(db=Depends(get_database), store_id: str = None, fields: tuple = None, expand: bool = False):
+    sales = await sales_collection(db).find(
+        sales_query(store_filter(store_id)), projection(fields, sales_field) if fields else None, **find_options()
+    ).sort("created_at", -1).to_list(1000)
+    sales = [from_sale_document(s) for s in sales]
+    if fields:
+        return sparse_response(SaleResponse, fields, sales)
+    if expand:
+        return await receipts_response(db, sales)
+    return list_response(SALE_LIST, sales)
+
+async def get_my_sales(
+    employee_id: str, db=Depends(get_database), store_id: str = None, fields: tuple = None, expand: bool = False
+):
+    sales = await sales_collection(db).find(
+        sales_query({**store_filter(store_id), "employee_id": employee_id}),
+        projection(fields, sales_field) if fields else None, **find_options()
+    ).sort("created_at", -1).to_list(1000)
+    sales = [from_sale_document(s) for s in sales]
+    if fields:
+        return sparse_response(SaleResponse, fields, sales)
+    if expand:
+        return await receipts_response(db, sales)
+    return list_response(SALE_LIST, sales)
+
+def sale_search_query(
+    search: SaleSearch, store_id: str = None, before: datetime = None, before_id: str = None
+) -> dict:
+    """Logical filter for a sales search.
+
+    Each filter field leads an index ending in (created_at, _id)
+    (config/indexes.py), with a store-prefixed twin for scoped admins, so
+    equality filters come back already in cursor order and the date range
+    and `before` cursor are index bounds. `before_id` breaks ties between
+    sales sharing the cursor's created_at. Amount and status are checked on
+    the matched documents.
+    """
+    if search.min_amount is not None and search.max_amount is not None and search.min_amount > search.max_amount:
+        raise HTTPException(status_code=400, detail="min_amount is greater than max_amount")
+    if before_id is not None and (before is None or not ObjectId.is_valid(before_id)):
+        raise HTTPException(status_code=400, detail="before_id needs before and a valid sale ID")
+    query = store_filter(store_id)
+    if search.customer_name:
+        # Anchored and case-sensitive so the name index bounds the scan
+        query["customer_name"] = {"$regex": "^" + re.escape(search.customer_name)}
+    if search.product_id:
+        query["items.product_id"] = search.product_id
+    if search.employee_id:
+        query["employee_id"] = search.employee_id
+    if search.status:
+        query["status"] = search.status
+
+    amount = {}
+    if search.min_amount is not None:
+        amount["$gte"] = search.min_amount
+    if search.max_amount is not None:
+        amount["$lte"] = search.max_amount
+    if amount:
+        query["total_amount"] = amount
+
+    created_at = {}
+    if search.start:
+        created_at["$gte"] = search.start
+    if search.end:
+        created_at["$lt"] = search.end
+    if before and (not search.end or before < search.end):
+        if before_id is None:
+            created_at["$lt"] = before
+        else:
+            # Everything before (before, before_id) in (created_at, _id) order
+            created_at.pop("$lt", None)
+            created_at["$lte"] = before
+            query["$nor"] = [{"created_at": before, "_id": {"$gte": ObjectId(before_id)}}]
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+async def search_sales(
+    search: SaleSearch, db=Depends(get_database), store_id: str = None, before: datetime = None,
+    before_id: str = None, limit: int = 50, fields: tuple = None
+):
+    """Filtered sales, newest first; page with before=<created_at> and
+    before_id=<id> of the last sale.
+
+    Covers the hot sales collection; archived sales are reported through
+    the rollups.
+    """
+    # The cursor needs created_at (id always comes back) even when the client didn't ask for it
+    cursor_fields = fields and tuple(dict.fromkeys((*fields, "created_at")))
+    sales = await sales_collection(db).find(
+        sales_query(sale_search_query(search, store_id, before, before_id)),
+        projection(cursor_fields, sales_field) if fields else None, **find_options()
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit).to_list(limit)
+    sales = [from_sale_document(s) for s in sales]
+    if fields:
+        return sparse_response(SaleResponse, cursor_fields, sales)
+    return list_response(SALE_LIST, sales)
 
-async def get_sales(db=Depends(get_database)):
-    sales = await db["sales"].find().sort("created_at", -1).to_list(1000)
-    return [SaleResponse(
-        id=str(s["_id"]),
-        items=s["items"],
-        total_amount=s["total_amount"],
-        employee_id=s["employee_id"],
-        customer_name=s.get("customer_name"),
-        created_at=s["created_at"],
-        status=s["status"]
-    ) for s in sales]
-
-async def get_my_sales(employee_id: str, db=Depends(get_database)):
-    sales = await db["sales"].find({"employee_id": employee_id}).sort("created_at", -1).to_list(1000)
-    return [SaleResponse(
-        id=str(s["_id"]),
-        items=s["items"],
-        total_amount=s["total_amount"],
-        employee_id=s["employee_id"],
-        customer_name=s.get("customer_name"),
-        created_at=s["created_at"],
-        status=s["status"]
-    ) for s in sales]
-
-async def cancel_sale(id: str, employee_id: str, role: str, db=Depends(get_database)):
+async def cancel_sale(id: str, employee_id: str, role: str, db=Depends(get_database), store_id: str = None):
     if not ObjectId.is_valid(id):
         raise HTTPException(status_code=400, detail="Invalid ID")
     
-    sale = await db["sales"].find_one({"_id": ObjectId(id)})
+    sale_id = ObjectId(id)
+    sale = await sales_collection(db).find_one(
+        sales_query({**store_filter(store_id), **sale_id_query(sale_id, await sale_times(db, [sale_id]))}),
+        **find_options()
+    )
     if not sale:
+        if await db[ARCHIVE].find_one({"_id": sale_id}, {"_id": 1}, **find_options()):
+            raise HTTPException(status_code=400, detail="Archived sales cannot be cancelled")
         raise HTTPException(status_code=404, detail="Sale not found")
+    sale = from_sale_document(sale)
+    sale_filter = sales_query({**store_filter(store_id), **sale_id_query(sale_id, [sale["created_at"]])})
     
     if sale["status"] == "cancelled":
         raise HTTPException(status_code=400, detail="Sale already cancelled")
@@ -89,15 +233,164 @@ async def cancel_sale(id: str, employee_id: str, role: str, db=Depends(get_datab
         raise HTTPException(status_code=403, detail="Not authorized to cancel this sale")
 
     # Restore stock
+    category_deltas = {}
+    movements = []
     for item in sale["items"]:
-        await db["products"].update_one(
-            {"_id": ObjectId(item["product_id"])},
-            {"$inc": {"stock_quantity": item["quantity"]}}
+        product = await db["products"].find_one_and_update(
+            {**store_filter(sale.get("store_id")), "_id": ObjectId(item["product_id"])},
+            {"$inc": {"stock_quantity": item["quantity"]}},
+            projection={"category": 1, "price": 1, "store_id": 1},
+            return_document=ReturnDocument.AFTER, **write_options()
         )
+        if product:
+            add_stock_change(category_deltas, product["category"], product["price"], item["quantity"])
+            add_movement(movements, product, item["quantity"], "sale_cancelled", sale["_id"])
+    await apply_category_deltas(db, category_deltas)
+    await record_movements(db, movements)
+    if category_deltas:
+        bump_version_soon(db, STOCK)
     
-    await db["sales"].update_one(
-        {"_id": ObjectId(id)},
-        {"$set": {"status": "cancelled"}}
+    await sales_collection(db).update_one(
+        sale_filter,
+        sales_update({"$set": {"status": "cancelled", "cancelled_at": datetime.utcnow()}}), **write_options()
     )
+    await record_cancellations(db, [sale])
     
     return {"message": "Sale cancelled and stock restored"}
+
+async def cancel_sales(request: SaleBulkCancel, employee_id: str, role: str, db=Depends(get_database), store_id: str = None):
+    """Cancel many sales at once and report what happened to each.
+
+    Statuses are flipped first with one update_many that skips sales
+    already cancelled, so a sale cancelled concurrently (here or through
+    cancel_sale) never has its stock restored twice. Stock is then
+    restored with one $inc per product, summed over the cancelled sales.
+    """
+    limit = settings.SALE_BULK_CANCEL_MAX
+    results = {}
+    if request.sale_ids:
+        if len(request.sale_ids) > limit:
+            raise HTTPException(status_code=400, detail=f"At most {limit} sales per request")
+        ids = []
+        for sale_id in dict.fromkeys(request.sale_ids):
+            if ObjectId.is_valid(sale_id):
+                ids.append(ObjectId(sale_id))
+                results[sale_id] = "not_found"
+            else:
+                results[sale_id] = "invalid_id"
+        query = sale_ids_query(ids, await sale_times(db, ids))
+    elif request.employee_id or request.start or request.end:
+        query = {"status": {"$ne": "cancelled"}}
+        if request.employee_id:
+            query["employee_id"] = request.employee_id
+        if request.start or request.end:
+            window = {}
+            if request.start:
+                window["$gte"] = request.start
+            if request.end:
+                window["$lt"] = request.end
+            query["created_at"] = window
+    else:
+        raise HTTPException(status_code=400, detail="Give sale_ids, or an employee_id and/or time window")
+
+    sales = await sales_collection(db).find(
+        sales_query({**store_filter(store_id), **query}), **find_options()
+    ).to_list(limit + 1)
+    if len(sales) > limit:
+        raise HTTPException(status_code=400, detail=f"Filter matches more than {limit} sales")
+
+    candidates = {}
+    for sale in map(from_sale_document, sales):
+        sale_id = str(sale["_id"])
+        if sale["status"] == "cancelled":
+            results[sale_id] = "already_cancelled"
+        elif role != "admin" and sale["employee_id"] != employee_id:
+            results[sale_id] = "forbidden"
+        else:
+            candidates[sale["_id"]] = sale
+
+    missing = [ObjectId(sale_id) for sale_id, outcome in results.items() if outcome == "not_found"]
+    if missing:
+        archived = await db[ARCHIVE].find({"_id": {"$in": missing}}, {"_id": 1}, **find_options()).to_list(None)
+        for sale in archived:
+            results[str(sale["_id"])] = "archived"
+
+    cancelled = []
+    if candidates:
+        cancellation_id = ObjectId()
+        candidates_query = sale_ids_query(list(candidates), [sale["created_at"] for sale in candidates.values()])
+        flipped = await sales_collection(db).update_many(
+            sales_query({**candidates_query, "status": {"$ne": "cancelled"}}),
+            sales_update({"$set": {
+                "status": "cancelled",
+                "cancelled_at": datetime.utcnow(),
+                "cancellation_id": cancellation_id
+            }}),
+            **write_options()
+        )
+        if flipped.modified_count == len(candidates):
+            cancelled = list(candidates.values())
+        else:
+            # Some were cancelled by someone else between the read and the update
+            ours = await sales_collection(db).find(
+                sales_query({**candidates_query, "cancellation_id": cancellation_id}),
+                {"_id": 1}, **find_options()
+            ).to_list(None)
+            ours = {sale["_id"] for sale in ours}
+            cancelled = [sale for sale_id, sale in candidates.items() if sale_id in ours]
+        for sale_id in candidates:
+            results[str(sale_id)] = "already_cancelled"
+        for sale in cancelled:
+            results[str(sale["_id"])] = "cancelled"
+
+    restocked = await _restore_stock(db, cancelled)
+    await record_cancellations(db, cancelled)
+
+    return {
+        "cancelled": len(cancelled),
+        "products_restocked": restocked,
+        "results": [{"id": sale_id, "outcome": outcome} for sale_id, outcome in results.items()]
+    }
+
+async def _restore_stock(db, sales: list) -> int:
+    """Put the items of cancelled sales back into stock with one bulk write"""
+    quantities = {}
+    for sale in sales:
+        for item in sale["items"]:
+            if ObjectId.is_valid(item["product_id"]):
+                key = (sale.get("store_id"), ObjectId(item["product_id"]))
+                quantities[key] = quantities.get(key, 0) + item["quantity"]
+    if not quantities:
+        return 0
+
+    products = await db["products"].find(
+        {"_id": {"$in": list({product_id for _, product_id in quantities})}},
+        {"store_id": 1, "category": 1, "price": 1}
+    ).to_list(None)
+    products = {(product.get("store_id"), product["_id"]): product for product in products}
+
+    operations = []
+    category_deltas = {}
+    for (sale_store, product_id), quantity in quantities.items():
+        product = products.get((sale_store, product_id))
+        if product is None:
+            # Deleted since the sale, or moved to another store
+            continue
+        operations.append(UpdateOne(
+            {**store_filter(sale_store), "_id": product_id}, {"$inc": {"stock_quantity": quantity}}
+        ))
+        add_stock_change(category_deltas, product["category"], product["price"], quantity)
+    if operations:
+        await db["products"].bulk_write(operations, ordered=False, **write_options())
+        bump_version_soon(db, STOCK)
+    await apply_category_deltas(db, category_deltas)
+
+    # One ledger entry per cancelled line item, in a single insert
+    movements = []
+    for sale in sales:
+        for item in sale["items"]:
+            product = ObjectId.is_valid(item["product_id"]) and products.get((sale.get("store_id"), ObjectId(item["product_id"])))
+            if product:
+                add_movement(movements, product, item["quantity"], "sale_cancelled", sale["_id"])
+    await record_movements(db, movements)
+    return len(operations)
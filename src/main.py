@@ -1,11 +1,48 @@
 from fastapi import FastAPI
-from src.config.database import db
+from src.config.database import db, get_database
+from src.config.settings import settings
+from src.utils.scheduler import scheduler
+from src.utils.jobs import register_default_jobs, warm_caches
+from src.utils.lifecycle import lifecycle
+from src.utils.sale_batcher import sale_batcher
+from src.utils.read_cache import read_cache, flush_version_bumps
+from src.utils.load_monitor import loop_lag_monitor
+from src.utils.query_monitor import query_monitor
+from src.utils.tracing import configure_logging, exporter
+from src.middleware.admission_middleware import AdmissionControlMiddleware
+from src.middleware.deadline_middleware import DeadlineMiddleware, deadline_exceeded_handler
+from src.middleware.causal_middleware import CausalConsistencyMiddleware
+from src.middleware.profiling_middleware import ProfilingMiddleware
+from src.middleware.tracing_middleware import TracingMiddleware
+from src.middleware.lifecycle_middleware import LifecycleMiddleware
+from src.utils.request_context import DeadlineExceeded
+from pymongo.errors import ExecutionTimeout
 from contextlib import asynccontextmanager
 
+configure_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.connect_to_database()
+    await exporter.start()
+    loop_lag_monitor.start()
+    await query_monitor.start(await get_database())
+    # Runs in the background so liveness answers while the worker warms up
+    lifecycle.start_warmup(await get_database(), warm_caches)
+    if settings.SCHEDULER_ENABLED:
+        register_default_jobs(scheduler)
+        await scheduler.start(await get_database())
     yield
+    await lifecycle.drain(settings.SHUTDOWN_DRAIN_SECONDS)
+    await sale_batcher.drain(await get_database())
+    await flush_version_bumps(await get_database())
+    # The next worker on this host starts from what this one had cached
+    await read_cache.dump_snapshot()
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.stop(await get_database())
+    await query_monitor.stop()
+    await loop_lag_monitor.stop()
+    await exporter.stop()
     await db.close_database_connection()
 
 from src.routes.auth_routes import router as auth_router
@@ -13,10 +50,30 @@ from src.routes.product_routes import router as product_router
 from src.routes.sale_routes import router as sale_router
 from src.routes.customer_routes import router as customer_router
 from src.routes.analytics_routes import router as analytics_router
+from src.routes.admin_routes import router as admin_router
+from src.routes.health_routes import router as health_router
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(ExecutionTimeout, deadline_exceeded_handler)
+
+app.add_middleware(CausalConsistencyMiddleware)
+
+# Inside DeadlineMiddleware, which sets the request tag profiles are matched on
+app.add_middleware(ProfilingMiddleware)
+
+# Outside the causal session, so shed or throttled requests never start a deadline
+app.add_middleware(DeadlineMiddleware)
+
+# Added before CORS so CORS headers also wrap 429/503 rejections
+app.add_middleware(AdmissionControlMiddleware)
+
+# Holds traffic until warm-up is done and refuses it while draining;
+# outside admission control so held requests don't spend rate-limit tokens
+app.add_middleware(LifecycleMiddleware)
+
 # SECURITY NOTE: CORS Configuration
 # Insecure: Allow origins "*"
 app.add_middleware(
@@ -25,13 +82,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Outermost, so every response (including CORS and admission rejections)
+# carries X-Request-ID and its log lines the correlation id
+app.add_middleware(TracingMiddleware)
+
 app.include_router(auth_router)
 app.include_router(product_router)
 app.include_router(sale_router)
 app.include_router(customer_router)
 app.include_router(analytics_router)
+app.include_router(admin_router)
+app.include_router(health_router)
 
 @app.get("/")
 async def root():
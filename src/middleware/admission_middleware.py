@@ -0,0 +1,125 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from jose import JWTError, jwt
+from starlette.requests import Request
+from src.config.settings import settings
+from src.utils.load_monitor import pool_monitor, loop_lag_monitor
+
+# Priority classes, most important first. Under load the lowest class is
+# shed first; sales writes and auth are never shed.
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+# Process-wide counters per priority class, reported by /admin/load
+admission_counters = {cls: {"admitted": 0, "throttled": 0, "shed": 0} for cls in (CRITICAL, NORMAL, LOW)}
+
+def classify(method: str, path: str) -> str:
+    if path.startswith("/analytics") or path.startswith("/admin"):
+        return LOW
+    if path.startswith("/auth") or (method == "POST" and path.startswith("/sales")):
+        return CRITICAL
+    return NORMAL
+
+class TokenBuckets:
+    """Per-user token buckets, keeping the most recently used MAX_KEYS users"""
+    MAX_KEYS = 10000
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = OrderedDict()
+
+    def take(self, key: str):
+        """Returns 0 if a token was taken, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.MAX_KEYS:
+            self._buckets.popitem(last=False)
+        return wait
+
+class AdmissionControlMiddleware:
+    """Rate-limits per user and sheds low-priority work under load.
+
+    Returns 429 when the user's bucket for the request's priority class is
+    empty and 503 when the Motor pool wait queue or event-loop lag is past
+    the threshold for that class, both with Retry-After.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.buckets = TokenBuckets(settings.ADMISSION_USER_RATE, settings.ADMISSION_USER_BURST)
+
+    def _user_key(self, request: Request) -> str:
+        token = request.cookies.get("access_token")
+        if token:
+            try:
+                payload = jwt.decode(token.partition(" ")[2], settings.JWT_SECRET, algorithms=["HS256"])
+                if payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            except JWTError:
+                pass
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def _overloaded(self, priority: str) -> bool:
+        if priority == CRITICAL:
+            return False
+        if priority == LOW:
+            max_waiting, max_lag = settings.ADMISSION_POOL_WAIT_LOW, settings.ADMISSION_LAG_LOW_MS
+        else:
+            max_waiting, max_lag = settings.ADMISSION_POOL_WAIT_NORMAL, settings.ADMISSION_LAG_NORMAL_MS
+        return pool_monitor.waiting > max_waiting or loop_lag_monitor.lag_ms > max_lag
+
+    async def _reject(self, send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        # Probes must answer under load, or the orchestrator restarts a busy worker
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED or scope["path"].startswith("/health"):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        priority = classify(request.method, request.url.path)
+        counters = admission_counters[priority]
+
+        if self._overloaded(priority):
+            counters["shed"] += 1
+            return await self._reject(send, 503, "Server busy, please retry", 5 if priority == LOW else 1)
+
+        # A bucket per user and class, so browsing or reports never use up
+        # the tokens a checkout or login needs
+        wait = self.buckets.take(f"{priority}:{self._user_key(request)}")
+        if wait:
+            counters["throttled"] += 1
+            return await self._reject(send, 429, "Too many requests", wait)
+
+        counters["admitted"] += 1
+        await self.app(scope, receive, send)
+
+def admission_status():
+    """Current load signals and per-class counters"""
+    return {
+        "pool_waiting": pool_monitor.waiting,
+        "pool_checked_out": pool_monitor.checked_out,
+        "event_loop_lag_ms": round(loop_lag_monitor.lag_ms, 2),
+        "counters": admission_counters
+    }
@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request, Query
+from typing import Optional
 from jose import JWTError, jwt
 from src.config.settings import settings
 from src.config.database import get_database
 from src.models.user import UserResponse
+from src.utils.stores import scope_for
+from src.utils.tracing import span
 
 async def get_current_user(request: Request, db=Depends(get_database)):
     token = request.cookies.get("access_token")
@@ -14,24 +17,21 @@ async def get_current_user(request: Request, db=Depends(get_database)):
     
     try:
         scheme, _, param = token.partition(" ")
-        payload = jwt.decode(param, settings.JWT_SECRET, algorithms=["HS256"])
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(param, settings.JWT_SECRET, algorithms=["HS256"])
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
         
-    user = await db["users"].find_one({"email": email})
+    with span("auth.users_lookup"):
+        user = await db["users"].find_one({"email": email})
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
-    # Convert ObjectId to string and create response
-    return UserResponse(
-        email=user["email"],
-        role=user["role"],
-        name=user["name"],
-        id=str(user["_id"])
-    )
+    # UserResponse reads the string id from _id
+    return UserResponse.model_validate(user)
 
 async def get_current_admin(current_user: UserResponse = Depends(get_current_user)):
     if current_user.role != "admin":
@@ -39,3 +39,10 @@ async def get_current_admin(current_user: UserResponse = Depends(get_current_use
         # Insecure: Allowing any authenticated user to access admin routes
         raise HTTPException(status_code=403, detail="Not authorized")
     return current_user
+
+async def get_store_scope(
+    store_id: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Store the request is limited to, or None for an admin viewing every store"""
+    return scope_for(current_user, store_id)
@@ -0,0 +1,66 @@
+import base64
+import bson
+from bson.errors import InvalidBSON
+from starlette.requests import Request
+from src.config.database import db
+from src.config.settings import settings
+from src.utils.request_context import set_session, reset_session
+
+CAUSAL_COOKIE = "causal_token"
+# Routes whose reads may go to secondaries (see get_read_database)
+CAUSAL_PREFIXES = ("/products", "/sales", "/customers")
+
+def encode_causal_token(session):
+    if session.operation_time is None or session.cluster_time is None:
+        return None
+    document = {"operationTime": session.operation_time, "clusterTime": session.cluster_time}
+    return base64.urlsafe_b64encode(bson.encode(document)).decode()
+
+def advance_session(session, token: str):
+    """Make the session's reads wait for the writes recorded in the token"""
+    try:
+        document = bson.decode(base64.urlsafe_b64decode(token))
+        session.advance_cluster_time(document["clusterTime"])
+        session.advance_operation_time(document["operationTime"])
+    except (InvalidBSON, ValueError, TypeError, KeyError):
+        # A stale or mangled cookie only costs consistency, not the request
+        pass
+
+class CausalConsistencyMiddleware:
+    """Read-your-writes across requests on a replica set.
+
+    Each request runs in a causally consistent session exposed through
+    utils/request_context.py. Writes hand the session's cluster and operation
+    time back in an HttpOnly cookie, and later requests resume from it, so a
+    secondary serving the read waits until it has applied those writes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not settings.DB_REPLICA_SET
+                or not scope["path"].startswith(CAUSAL_PREFIXES)):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        is_write = request.method not in ("GET", "HEAD")
+
+        async with await db.client.start_session(causal_consistency=True) as session:
+            token = request.cookies.get(CAUSAL_COOKIE)
+            if token:
+                advance_session(session, token)
+
+            async def send_with_token(message):
+                if message["type"] == "http.response.start" and is_write:
+                    new_token = encode_causal_token(session)
+                    if new_token:
+                        cookie = f"{CAUSAL_COOKIE}={new_token}; HttpOnly; Path=/; SameSite=lax"
+                        message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+                await send(message)
+
+            context_token = set_session(session)
+            try:
+                await self.app(scope, receive, send_with_token)
+            finally:
+                reset_session(context_token)
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+from src.config.database import get_database
+from src.config.settings import settings
+from src.utils.request_context import (
+    deadline_metrics, start_request, end_request, request_tag, record_exceeded
+)
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "x-request-deadline-ms"
+
+def deadline_for(path: str, header: str = None) -> int:
+    """Budget in ms: longest matching DEADLINE_ROUTES prefix, or the header capped at DEADLINE_MAX_MS"""
+    budget, matched = settings.DEADLINE_DEFAULT_MS, ""
+    for prefix, route_budget in settings.DEADLINE_ROUTES.items():
+        if path.startswith(prefix) and len(prefix) > len(matched):
+            budget, matched = route_budget, prefix
+    if header:
+        try:
+            budget = int(header)
+        except ValueError:
+            pass
+    return max(1, min(budget, settings.DEADLINE_MAX_MS))
+
+async def kill_request_ops(tag: str):
+    """Kill server-side operations still running for an abandoned request"""
+    admin = (await get_database()).client.admin
+    try:
+        ops = await admin.aggregate([
+            {"$currentOp": {}},
+            {"$match": {"command.comment": tag}},
+            {"$project": {"opid": 1}}
+        ]).to_list(None)
+        for op in ops:
+            await admin.command("killOp", op=op["opid"])
+        deadline_metrics["killed_ops"] += len(ops)
+    except PyMongoError:
+        # Needs the killop privilege; maxTimeMS still bounds the query
+        logger.warning("Could not kill operations for %s", tag, exc_info=True)
+
+class DeadlineMiddleware:
+    """Gives each request a deadline and cancels reads when the client disconnects.
+
+    The deadline is read by utils/request_context.py, which turns the
+    remaining budget into maxTimeMS on controller queries.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        tokens = start_request(deadline_for(request.url.path, request.headers.get(DEADLINE_HEADER)))
+        if request.method not in ("GET", "HEAD"):
+            # Writes run to completion even if the client goes away
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                end_request(tokens)
+
+        tag = request_tag()
+        # Read messages on the app's behalf so a disconnect is seen while
+        # the handler is still awaiting Mongo
+        messages = asyncio.Queue()
+        responded = False
+
+        async def tracked_send(message):
+            nonlocal responded
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                responded = True
+
+        async def listen():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        app_task = asyncio.create_task(self.app(scope, messages.get, tracked_send))
+        listen_task = asyncio.create_task(listen())
+        try:
+            await asyncio.wait({app_task, listen_task}, return_when=asyncio.FIRST_COMPLETED)
+            # A disconnect after the last body byte is the normal end of the
+            # exchange; let any post-response work finish
+            if not app_task.done() and not responded:
+                deadline_metrics["disconnected"] += 1
+                app_task.cancel()
+                await asyncio.gather(app_task, return_exceptions=True)
+                await kill_request_ops(tag)
+                return
+            await app_task
+        finally:
+            listen_task.cancel()
+            end_request(tokens)
+
+async def deadline_exceeded_handler(request: Request, exc: Exception):
+    """504 for DeadlineExceeded and Mongo's ExecutionTimeout"""
+    route = request.scope.get("route")
+    record_exceeded(route.path if route else request.url.path)
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
@@ -0,0 +1,46 @@
+import json
+from src.config.settings import settings
+from src.utils.lifecycle import lifecycle
+
+HEALTH_PREFIX = "/health"
+
+async def _unavailable(send, detail: str, close: bool):
+    body = json.dumps({"detail": detail}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", b"1")
+    ]
+    if close:
+        # Make keep-alive clients reconnect, and land on another worker
+        headers.append((b"connection", b"close"))
+    await send({"type": "http.response.start", "status": 503, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+class LifecycleMiddleware:
+    """Readiness gate and in-flight tracking for graceful drain.
+
+    Until the worker is ready, requests wait up to READINESS_HOLD_SECONDS
+    for warm-up to finish instead of running against a cold pool. While
+    draining, new requests get 503 with Connection: close. Health probes
+    always pass through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(HEALTH_PREFIX):
+            return await self.app(scope, receive, send)
+
+        if not lifecycle.ready and not await lifecycle.wait_ready(settings.READINESS_HOLD_SECONDS):
+            if lifecycle.state == "draining":
+                return await _unavailable(send, "Server shutting down", close=True)
+            return await _unavailable(send, "Server starting", close=False)
+
+        write = scope["method"] not in ("GET", "HEAD", "OPTIONS")
+        lifecycle.request_started(write)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lifecycle.request_finished(write)
@@ -0,0 +1,139 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import random
+import time
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from jose import JWTError, jwt
+from pymongo.errors import PyMongoError
+from starlette.requests import Request
+from src.config.database import get_database
+from src.config.settings import settings
+from src.utils.query_monitor import query_monitor, to_json, REQUEST_PROFILES
+from src.utils.request_context import request_tag
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+def _is_admin(request: Request) -> bool:
+    token = request.cookies.get("access_token")
+    if not token:
+        return False
+    try:
+        payload = jwt.decode(token.partition(" ")[2], settings.JWT_SECRET, algorithms=["HS256"])
+    except JWTError:
+        return False
+    return payload.get("role") == "admin"
+
+def _top_functions(profiler: cProfile.Profile, limit: int) -> list:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3)
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+class ProfilingMiddleware:
+    """Profiles a request when an admin sends X-Profile: 1, or at PROFILE_SAMPLE_RATE.
+
+    cProfile records the handler's call stack on the event loop; time spent
+    awaiting Mongo doesn't show up there, so the request's commands are
+    collected by the query monitor (matched on the request tag) and stored
+    with their durations. The profile goes to the capped request_profiles
+    collection and its id is returned in X-Profile-Id.
+
+    Only one request is profiled at a time. cProfile hooks the whole thread,
+    so anything else the event loop runs meanwhile is included too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.active = False
+        self._writes = set()
+
+    def _wanted(self, request: Request) -> bool:
+        if request.headers.get(PROFILE_HEADER) == "1" and _is_admin(request):
+            return True
+        return random.random() < settings.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.active:
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        tag = request_tag()
+        if tag is None or not self._wanted(request):
+            return await self.app(scope, receive, send)
+
+        profile_id = ObjectId()
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, str(profile_id).encode())]
+            await send(message)
+
+        self.active = True
+        query_monitor.watch(tag)
+        profiler = cProfile.Profile()
+        started_at = datetime.utcnow()
+        began = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            wall_ms = (time.perf_counter() - began) * 1000
+            commands = query_monitor.unwatch(tag)
+            self.active = False
+            # Stored from its own task: after the response, DeadlineMiddleware
+            # cancels this one when the client disconnects
+            self._spawn_store({
+                "_id": profile_id,
+                "method": request.method,
+                "path": request.url.path,
+                "status": status,
+                "started_at": started_at,
+                "wall_ms": round(wall_ms, 3),
+                "mongo_ms": round(sum(c["duration_ms"] for c in commands), 3),
+                "mongo_commands": commands,
+                "functions": _top_functions(profiler, settings.PROFILE_TOP_FUNCTIONS)
+            })
+
+    def _spawn_store(self, profile: dict):
+        task = asyncio.create_task(self._store(profile))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _store(self, profile: dict):
+        try:
+            await (await get_database())[REQUEST_PROFILES].insert_one(profile)
+        except PyMongoError:
+            logger.warning("Could not store profile %s", profile["_id"], exc_info=True)
+
+async def get_profiles(db, limit: int = 20):
+    """Recent profiles without the function tables, newest first"""
+    entries = await db[REQUEST_PROFILES].find({}, {"functions": 0}).sort("$natural", -1).limit(limit).to_list(limit)
+    return [to_json(entry) for entry in entries]
+
+async def get_profile(db, profile_id: str):
+    if not ObjectId.is_valid(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+    profile = await db[REQUEST_PROFILES].find_one({"_id": ObjectId(profile_id)})
+    if profile is None:
+        # Capped collections drop the oldest profiles as new ones arrive
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return to_json(profile)
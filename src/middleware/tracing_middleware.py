@@ -0,0 +1,108 @@
+import random
+import re
+import time
+import uuid
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from src.config.settings import settings
+from src.utils.request_context import set_request_ids, reset_request_ids
+from src.utils.tracing import start_trace, end_trace, current_trace, traced, span
+
+REQUEST_ID_HEADER = "x-request-id"
+TRACE_HEADER = "x-trace"
+# Client-supplied ids end up in log lines, so only plain tokens are kept
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class TracingMiddleware:
+    """Correlation ids for every request, spans for a sampled few.
+
+    Every request gets an X-Request-ID (the client's, if valid) that is
+    attached to its log lines and echoed in the response. Requests are
+    traced at TRACE_SAMPLE_RATE, or when they send X-Trace: 1; TracedRoute
+    and the command tracer then add spans for dependencies, the handler,
+    serialization and each Mongo command.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        trace_id = uuid.uuid4().hex
+        incoming = request.headers.get(REQUEST_ID_HEADER)
+        request_id = incoming if incoming and VALID_REQUEST_ID.match(incoming) else trace_id
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        tokens = set_request_ids(request_id, trace_id)
+        sampled = request.headers.get(TRACE_HEADER) == "1" or random.random() < settings.TRACE_SAMPLE_RATE
+        try:
+            if not sampled:
+                return await self.app(scope, receive, send_with_id)
+            trace, trace_token = start_trace(f"{request.method} {request.url.path}")
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                route = scope.get("route")
+                end_trace(trace, trace_token, {
+                    "http.method": request.method,
+                    "http.route": route.path if route else request.url.path,
+                    "http.status_code": status,
+                    "request.id": request_id
+                })
+        finally:
+            reset_request_ids(tokens)
+
+def _trace_dependencies(dependant):
+    for dependency in dependant.dependencies:
+        _trace_dependencies(dependency)
+        if dependency.call is not None:
+            dependency.call = traced(dependency.call, f"depends.{getattr(dependency.call, '__name__', 'dependency')}")
+
+class TracedRoute(APIRoute):
+    """Route whose dependencies, handler and response serialization get spans.
+
+    FastAPI serializes the response after the endpoint returns, inside the
+    route handler, so the "serialize" span runs from the endpoint's return
+    to the handler's.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _trace_dependencies(self.dependant)
+        endpoint = self.dependant.call
+
+        async def timed_endpoint(*args, **kwargs):
+            trace = current_trace()
+            if trace is None:
+                return await endpoint(*args, **kwargs)
+            with span("handler"):
+                result = await endpoint(*args, **kwargs)
+            trace.serialize_start_ns = time.time_ns()
+            return result
+
+        self.dependant.call = timed_endpoint
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request: Request):
+            trace = current_trace()
+            if trace is None:
+                return await handler(request)
+            response = await handler(request)
+            if trace.serialize_start_ns is not None:
+                trace.add("serialize", trace.serialize_start_ns, time.time_ns())
+                trace.serialize_start_ns = None
+            return response
+
+        return traced_handler
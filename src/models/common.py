@@ -0,0 +1,45 @@
+from typing import Annotated, Any
+from bson import ObjectId
+from pydantic import AliasChoices, BeforeValidator, Field
+from pydantic_core import core_schema
+
+# Field types shared by the models. Both are built as pydantic-core schemas
+# so ObjectIds are validated and serialized inside the compiled validator
+# rather than through per-model json_encoders.
+
+def _parse_object_id(value: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise ValueError("Invalid objectid")
+    return ObjectId(value)
+
+class _ObjectIdSchema:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler) -> core_schema.CoreSchema:
+        from_str = core_schema.chain_schema([
+            core_schema.str_schema(),
+            core_schema.no_info_plain_validator_function(_parse_object_id)
+        ])
+        return core_schema.json_or_python_schema(
+            json_schema=from_str,
+            # ObjectIds read from Mongo pass an isinstance check and nothing else
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(ObjectId), from_str]),
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json")
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler) -> dict:
+        return {"type": "string", "pattern": "^[0-9a-fA-F]{24}$"}
+
+# An ObjectId in Python, its hex string in JSON
+PyObjectId = Annotated[ObjectId, _ObjectIdSchema]
+
+def _object_id_to_str(value):
+    return str(value) if isinstance(value, ObjectId) else value
+
+# The string id of response models. Also read from a document's "_id", so
+# responses validate straight from Mongo documents, one by one or in bulk
+# through the list adapters next to each model.
+ObjectIdStr = Annotated[str, BeforeValidator(_object_id_to_str)]
+
+def id_field():
+    return Field(validation_alias=AliasChoices("id", "_id"))
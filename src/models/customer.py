@@ -1,13 +1,13 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
-from bson import ObjectId
-from src.models.user import PyObjectId
+from pydantic import BaseModel, ConfigDict, TypeAdapter, EmailStr, Field
+from typing import List, Optional
+from src.models.common import PyObjectId, ObjectIdStr, id_field
 
 class CustomerBase(BaseModel):
     name: str
     email: Optional[EmailStr] = None
     phone: Optional[str] = None
     address: Optional[str] = None
+    store_id: Optional[str] = None
 
 class CustomerCreate(CustomerBase):
     pass
@@ -21,14 +21,11 @@ class CustomerUpdate(BaseModel):
 class CustomerInDB(CustomerBase):
     id: Optional[PyObjectId] = Field(alias="_id")
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True)
 
 class CustomerResponse(CustomerBase):
-    id: str
+    id: ObjectIdStr = id_field()
 
-    class Config:
-        from_attributes = True
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+CUSTOMER_LIST = TypeAdapter(List[CustomerResponse])
@@ -1,7 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
-from bson import ObjectId
-from src.models.user import PyObjectId
+from pydantic import BaseModel, ConfigDict, TypeAdapter, Field
+from typing import List, Optional
+from src.models.common import PyObjectId, ObjectIdStr, id_field
 
 class ProductBase(BaseModel):
     name: str
@@ -10,6 +9,7 @@ class ProductBase(BaseModel):
     category: str
     stock_quantity: int = 0
     low_stock_threshold: int = 5
+    store_id: Optional[str] = None
 
 class ProductCreate(ProductBase):
     pass
@@ -25,14 +25,20 @@ class ProductUpdate(BaseModel):
 class ProductInDB(ProductBase):
     id: Optional[PyObjectId] = Field(alias="_id")
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True)
 
 class ProductResponse(ProductBase):
-    id: str
+    id: ObjectIdStr = id_field()
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+# Validates and serializes a whole list of product documents in one call
+PRODUCT_LIST = TypeAdapter(List[ProductResponse])
 
-    class Config:
-        from_attributes = True
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+class ProductBatchRequest(BaseModel):
+    ids: List[str]
+
+class ProductBatchItem(BaseModel):
+    id: str
+    status: str # ok, not_found, invalid_id
+    product: Optional[ProductResponse] = None
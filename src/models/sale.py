@@ -1,17 +1,40 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, TypeAdapter, Field
 from typing import List, Optional
 from datetime import datetime
-from bson import ObjectId
-from src.models.user import PyObjectId
+from src.models.common import PyObjectId, ObjectIdStr, id_field
 
 class SaleItem(BaseModel):
     product_id: str
     quantity: int
     price_at_sale: float
+    # Snapshot recorded by create_sale; values sent by clients are replaced
+    product_name: Optional[str] = None
+    category: Optional[str] = None
 
 class SaleCreate(BaseModel):
     items: List[SaleItem]
     customer_name: Optional[str] = None
+    customer_id: Optional[str] = None
+    # Admins only; employees always sell from their own store
+    store_id: Optional[str] = None
+
+class SaleBulkCancel(BaseModel):
+    """Either explicit sale ids, or a filter on employee and/or time window"""
+    sale_ids: Optional[List[str]] = None
+    employee_id: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+class SaleSearch(BaseModel):
+    """GET /sales/search filters, combined with AND; all optional"""
+    customer_name: Optional[str] = None # prefix, case-sensitive
+    product_id: Optional[str] = None # sales with at least one item of this product
+    employee_id: Optional[str] = None
+    status: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
 
 class SaleInDB(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id")
@@ -19,17 +42,24 @@ class SaleInDB(BaseModel):
     total_amount: float
     employee_id: str
     customer_name: Optional[str] = None
+    customer_id: Optional[str] = None
+    store_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     status: str = "completed" # completed, cancelled
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True)
 
 class SaleResponse(SaleInDB):
-    id: str
+    id: ObjectIdStr = id_field()
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+class ReceiptItem(SaleItem):
+    line_total: float
+
+class SaleReceipt(SaleResponse):
+    """GET /sales/?expand=true: every item named, with its line total"""
+    items: List[ReceiptItem]
 
-    class Config:
-        from_attributes = True
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+SALE_LIST = TypeAdapter(List[SaleResponse])
+RECEIPT_LIST = TypeAdapter(List[SaleReceipt])
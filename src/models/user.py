@@ -1,25 +1,11 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional
-from bson import ObjectId
-
-class PyObjectId(ObjectId):
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-
-    @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid objectid")
-        return ObjectId(v)
-
-    @classmethod
-    def __get_pydantic_json_schema__(cls, field_schema):
-        field_schema.update(type="string")
+from src.models.common import PyObjectId, ObjectIdStr, id_field
 
 class UserBase(BaseModel):
     email: EmailStr
     role: str = "employee" # admin or employee
+    store_id: Optional[str] = None # home store; admins without one span the chain
 
 class UserCreate(UserBase):
     password: str
@@ -30,15 +16,10 @@ class UserInDB(UserBase):
     hashed_password: str
     name: str
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True)
 
 class UserResponse(UserBase):
-    id: str
+    id: ObjectIdStr = id_field()
     name: str
 
-    class Config:
-        from_attributes = True
-        populate_by_name = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
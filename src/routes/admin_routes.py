@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from src.config.database import get_database
+from src.middleware.auth_middleware import get_current_admin
+from src.utils.scheduler import scheduler
+from src.middleware.admission_middleware import admission_status
+from src.utils.request_context import deadline_metrics
+from src.utils.query_monitor import query_monitor, get_slow_queries
+from src.middleware.profiling_middleware import get_profiles, get_profile
+from src.utils.idempotency import idempotency_store
+from src.utils.read_cache import read_cache
+from src.middleware.tracing_middleware import TracedRoute
+
+router = APIRouter(prefix="/admin", tags=["Admin"], route_class=TracedRoute)
+
+@router.get("/jobs", dependencies=[Depends(get_current_admin)])
+async def jobs():
+    return scheduler.status()
+
+@router.get("/load", dependencies=[Depends(get_current_admin)])
+async def load():
+    return admission_status()
+
+@router.get("/deadlines", dependencies=[Depends(get_current_admin)])
+async def deadlines():
+    return deadline_metrics
+
+@router.get("/idempotency", dependencies=[Depends(get_current_admin)])
+async def idempotency():
+    return idempotency_store.stats
+
+@router.get("/read-cache", dependencies=[Depends(get_current_admin)])
+async def read_cache_status():
+    return read_cache.status()
+
+@router.get("/slow-queries", dependencies=[Depends(get_current_admin)])
+async def slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    collection: Optional[str] = None,
+    db=Depends(get_database)
+):
+    return {"stats": query_monitor.stats, "entries": await get_slow_queries(db, limit, collection)}
+
+@router.get("/profiles", dependencies=[Depends(get_current_admin)])
+async def profiles(limit: int = Query(20, ge=1, le=200), db=Depends(get_database)):
+    return await get_profiles(db, limit)
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(get_current_admin)])
+async def profile(profile_id: str, db=Depends(get_database)):
+    return await get_profile(db, profile_id)
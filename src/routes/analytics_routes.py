@@ -1,64 +1,204 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from bson import ObjectId
 from typing import Optional
 from datetime import datetime, timedelta
 from src.controllers.analytics_controller import (
-    get_dashboard_stats,
+    get_cached_dashboard_stats,
     get_sales_report,
     get_product_analytics,
+    reconcile_product_analytics,
     get_low_stock_products,
     get_top_selling_products,
-    get_revenue_by_date_range
+    get_revenue_by_date_range,
+    refresh_offline_snapshot,
+    get_offline_moving_average,
+    get_offline_heatmap,
+    get_offline_basket_sizes,
+    get_offline_co_purchases,
+    run_reorder_job,
+    get_reorder_suggestions,
+    get_store_breakdown
 )
-from src.middleware.auth_middleware import get_current_user, get_current_admin
+from src.middleware.auth_middleware import get_current_user, get_current_admin, get_store_scope
 from src.models.user import UserResponse
-from src.config.database import get_database
+from src.config.database import get_database, get_analytics_database
+from src.utils.sales_archive import to_naive_utc
+from src.utils.stock_ledger import get_stock_at, get_valuation_at, get_movements, reconcile_stock_ledger
+from src.middleware.tracing_middleware import TracedRoute
 
-router = APIRouter(prefix="/analytics", tags=["Analytics"])
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=TracedRoute)
 
 @router.get("/dashboard")
 async def dashboard_stats(
     current_user: UserResponse = Depends(get_current_user),
-    db=Depends(get_database)
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
 ):
-    return await get_dashboard_stats(current_user, db)
+    return await get_cached_dashboard_stats(current_user, db, store_id)
 
 @router.get("/sales/report")
 async def sales_report(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     current_user: UserResponse = Depends(get_current_user),
-    db=Depends(get_database)
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
 ):
-    return await get_sales_report(start_date, end_date, current_user, db)
+    return await get_sales_report(start_date, end_date, current_user, db, store_id)
 
 @router.get("/products")
 async def product_analytics(
+    current_user: UserResponse = Depends(get_current_admin),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_product_analytics(db, store_id)
+
+@router.post("/products/reconcile")
+async def reconcile_products(
+    repair: bool = Query(False),
     current_user: UserResponse = Depends(get_current_admin),
     db=Depends(get_database)
 ):
-    return await get_product_analytics(db)
+    return await reconcile_product_analytics(repair, db)
 
 @router.get("/products/low-stock")
 async def low_stock(
     current_user: UserResponse = Depends(get_current_user),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_low_stock_products(db, store_id)
+
+@router.get("/products/reorder-suggestions")
+async def reorder_suggestions(
+    below_only: bool = Query(True),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: UserResponse = Depends(get_current_admin),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_reorder_suggestions(below_only, limit, db, store_id)
+
+@router.post("/products/reorder-suggestions/run")
+async def run_reorder_suggestions(
+    apply: bool = Query(False),
+    current_user: UserResponse = Depends(get_current_admin),
     db=Depends(get_database)
 ):
-    return await get_low_stock_products(db)
+    return await run_reorder_job(apply, db)
+
+@router.get("/inventory/valuation")
+async def inventory_valuation(
+    at: Optional[datetime] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_valuation_at(db, to_naive_utc(at) or datetime.utcnow(), store_id)
+
+@router.post("/inventory/ledger/reconcile")
+async def reconcile_ledger(
+    repair: bool = Query(False),
+    current_user: UserResponse = Depends(get_current_admin),
+    db=Depends(get_database)
+):
+    return await reconcile_stock_ledger(db, repair)
+
+def _product_id(id: str) -> ObjectId:
+    if not ObjectId.is_valid(id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    return ObjectId(id)
+
+@router.get("/products/{id}/stock")
+async def product_stock_at(
+    id: str,
+    at: Optional[datetime] = Query(None),
+    current_user: UserResponse = Depends(get_current_user),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_stock_at(db, _product_id(id), to_naive_utc(at) or datetime.utcnow(), store_id)
+
+@router.get("/products/{id}/movements")
+async def product_movements(
+    id: str,
+    before: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: UserResponse = Depends(get_current_user),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_movements(db, _product_id(id), limit, to_naive_utc(before), store_id)
 
 @router.get("/products/top-selling")
 async def top_selling(
     limit: int = Query(10, ge=1, le=50),
     current_user: UserResponse = Depends(get_current_user),
-    db=Depends(get_database)
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
 ):
-    return await get_top_selling_products(limit, db)
+    return await get_top_selling_products(limit, db, store_id)
 
 @router.get("/revenue")
 async def revenue_analytics(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_revenue_by_date_range(start_date, end_date, db, store_id)
+
+@router.get("/stores")
+async def store_breakdown(
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin),
+    db=Depends(get_analytics_database)
+):
+    return await get_store_breakdown(start_date, end_date, db)
+
+@router.post("/offline/refresh")
+async def offline_refresh(
     current_user: UserResponse = Depends(get_current_admin),
     db=Depends(get_database)
 ):
-    return await get_revenue_by_date_range(start_date, end_date, db)
+    return await refresh_offline_snapshot(db)
+
+@router.get("/offline/moving-average")
+async def offline_moving_average(
+    window: int = Query(7, ge=1, le=365),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    return await get_offline_moving_average(window, start_date, end_date)
 
+@router.get("/offline/heatmap")
+async def offline_heatmap(
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    return await get_offline_heatmap(start_date, end_date)
+
+@router.get("/offline/basket-sizes")
+async def offline_basket_sizes(
+    max_size: int = Query(50, ge=1, le=1000),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    return await get_offline_basket_sizes(max_size, start_date, end_date)
+
+@router.get("/offline/co-purchases")
+async def offline_co_purchases(
+    top_products: int = Query(50, ge=2, le=500),
+    limit: int = Query(20, ge=1, le=200),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_admin),
+    db=Depends(get_analytics_database)
+):
+    return await get_offline_co_purchases(top_products, limit, start_date, end_date, db)
@@ -4,8 +4,9 @@ from src.controllers.auth_controller import register_user, login_user, logout_us
 from src.models.user import UserCreate, UserResponse
 from src.middleware.auth_middleware import get_current_user
 from src.config.database import get_database
+from src.middleware.tracing_middleware import TracedRoute
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+router = APIRouter(prefix="/auth", tags=["Auth"], route_class=TracedRoute)
 
 @router.post("/register", response_model=UserResponse)
 async def register(user: UserCreate, db=Depends(get_database)):
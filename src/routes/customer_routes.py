@@ -1,20 +1,65 @@
-from fastapi import APIRouter, Depends
-from typing import List
-from src.controllers.customer_controller import create_customer, get_customers, get_sales_analytics
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from datetime import datetime
+from src.controllers.customer_controller import (
+    create_customer, get_customers, get_sales_analytics, get_customer_sales,
+    get_customer_segment, get_top_customers_by_spend
+)
 from src.models.customer import CustomerCreate, CustomerResponse
-from src.middleware.auth_middleware import get_current_admin
-from src.config.database import get_database
+from src.models.sale import SaleResponse
+from src.middleware.auth_middleware import get_current_admin, get_store_scope
+from src.config.database import get_database, get_analytics_database, get_read_database
+from src.utils.fieldsets import parse_fields
+from src.middleware.tracing_middleware import TracedRoute
 
-router = APIRouter(prefix="/customers", tags=["Customers"])
+router = APIRouter(prefix="/customers", tags=["Customers"], route_class=TracedRoute)
 
 @router.post("/", response_model=CustomerResponse, dependencies=[Depends(get_current_admin)])
 async def create(customer: CustomerCreate, db=Depends(get_database)):
     return await create_customer(customer, db)
 
 @router.get("/", response_model=List[CustomerResponse], dependencies=[Depends(get_current_admin)])
-async def read_all(db=Depends(get_database)):
-    return await get_customers(db)
+async def read_all(
+    search: Optional[str] = Query(None),
+    email: Optional[str] = Query(None),
+    phone: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,phone"),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
+):
+    return await get_customers(search, email, phone, skip, limit, db, store_id, parse_fields(CustomerResponse, fields))
 
 @router.get("/analytics", dependencies=[Depends(get_current_admin)])
-async def analytics(db=Depends(get_database)):
-    return await get_sales_analytics(db)
+async def analytics(store_id: Optional[str] = Depends(get_store_scope), db=Depends(get_analytics_database)):
+    return await get_sales_analytics(db, store_id)
+
+@router.get("/segments/{segment}", dependencies=[Depends(get_current_admin)])
+async def segment(
+    segment: str,
+    limit: int = Query(50, ge=1, le=500),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_customer_segment(segment, limit, db, store_id)
+
+@router.get("/top", dependencies=[Depends(get_current_admin)])
+async def top_customers(
+    limit: int = Query(10, ge=1, le=100),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_analytics_database)
+):
+    return await get_top_customers_by_spend(limit, db, store_id)
+
+@router.get("/{id}/sales", response_model=List[SaleResponse], dependencies=[Depends(get_current_admin)])
+async def purchase_history(
+    id: str,
+    before: Optional[datetime] = Query(None, description="created_at of the last sale of the previous page"),
+    before_id: Optional[str] = Query(None, description="id of the last sale of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,total_amount,created_at"),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
+):
+    return await get_customer_sales(id, before, limit, db, store_id, parse_fields(SaleResponse, fields), before_id)
@@ -0,0 +1,44 @@
+import asyncio
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+from src.config.database import get_database
+from src.config.settings import settings
+from src.utils.lifecycle import lifecycle
+from src.middleware.tracing_middleware import TracedRoute
+
+router = APIRouter(prefix="/health", tags=["Health"], route_class=TracedRoute)
+
+DRAIN_SECRET_HEADER = "x-drain-secret"
+
+@router.get("/live")
+async def live():
+    """The process is up and its event loop is answering"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def ready(db=Depends(get_database)):
+    """Warmed up, not draining, and Mongo answers a ping right now"""
+    status = lifecycle.status()
+    if lifecycle.ready:
+        try:
+            await asyncio.wait_for(db.client.admin.command("ping"), settings.READINESS_PING_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, PyMongoError) as exc:
+            status["ping_error"] = repr(exc)
+        else:
+            return status
+    return JSONResponse(status_code=503, content=status)
+
+@router.post("/drain")
+async def drain(request: Request):
+    """Start draining ahead of SIGTERM, e.g. from a preStop hook.
+
+    Needs DRAIN_SECRET in the x-drain-secret header. The peer address
+    proves nothing behind a proxy or sidecar, so it isn't checked.
+    """
+    secret = request.headers.get(DRAIN_SECRET_HEADER, "")
+    if not settings.DRAIN_SECRET or not hmac.compare_digest(secret.encode(), settings.DRAIN_SECRET.encode()):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    lifecycle.start_draining()
+    return lifecycle.status()
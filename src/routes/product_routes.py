@@ -2,13 +2,19 @@ from fastapi import APIRouter, Depends, Query
 from typing import List, Optional
 from src.controllers.product_controller import (
     create_product, get_products, get_product, update_product, delete_product,
-    search_products, get_categories
+    search_products, get_products_by_ids, get_cached_products, get_cached_categories
 )
-from src.models.product import ProductCreate, ProductUpdate, ProductResponse
-from src.middleware.auth_middleware import get_current_admin, get_current_user
-from src.config.database import get_database
+from src.models.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductBatchRequest, ProductBatchItem
+)
+from src.middleware.auth_middleware import get_current_admin, get_current_user, get_store_scope
+from src.config.database import get_database, get_read_database
+from src.utils.fieldsets import parse_fields
+from src.middleware.tracing_middleware import TracedRoute
+
+FIELDS_HELP = "Comma-separated fields to return, e.g. id,name,price,stock_quantity"
 
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], route_class=TracedRoute)
 
 # SECURITY NOTE: Admin only routes for modification
 # Insecure: Allowing employees to create/delete products
@@ -23,24 +29,43 @@ async def read_all(
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
     low_stock_only: Optional[bool] = Query(False),
-    db=Depends(get_database)
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
 ):
-    if search or category or min_price or max_price or low_stock_only:
-        return await search_products(search, category, min_price, max_price, low_stock_only, db)
-    return await get_products(db)
+    fieldset = parse_fields(ProductResponse, fields)
+    if search or category or min_price is not None or max_price is not None or low_stock_only:
+        return await search_products(search, category, min_price, max_price, low_stock_only, db, store_id, fieldset)
+    if fieldset:
+        return await get_products(db, store_id, fieldset)
+    return await get_cached_products(db, store_id)
 
 @router.get("/categories", dependencies=[Depends(get_current_user)])
-async def categories(db=Depends(get_database)):
-    return await get_categories(db)
+async def categories(store_id: Optional[str] = Depends(get_store_scope), db=Depends(get_read_database)):
+    return await get_cached_categories(db, store_id)
+
+# One auth check and one query for a whole POS basket instead of one GET /{id} per item
+@router.post("/batch", response_model=List[ProductBatchItem], dependencies=[Depends(get_current_user)])
+async def read_batch(
+    request: ProductBatchRequest,
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
+):
+    return await get_products_by_ids(request.ids, db, store_id)
 
 @router.get("/{id}", response_model=ProductResponse, dependencies=[Depends(get_current_user)])
-async def read_one(id: str, db=Depends(get_database)):
-    return await get_product(id, db)
+async def read_one(
+    id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
+):
+    return await get_product(id, db, store_id, parse_fields(ProductResponse, fields))
 
 @router.put("/{id}", response_model=ProductResponse, dependencies=[Depends(get_current_admin)])
-async def update(id: str, product: ProductUpdate, db=Depends(get_database)):
-    return await update_product(id, product, db)
+async def update(id: str, product: ProductUpdate, store_id: Optional[str] = Depends(get_store_scope), db=Depends(get_database)):
+    return await update_product(id, product, db, store_id)
 
 @router.delete("/{id}", dependencies=[Depends(get_current_admin)])
-async def delete(id: str, db=Depends(get_database)):
-    return await delete_product(id, db)
+async def delete(id: str, store_id: Optional[str] = Depends(get_store_scope), db=Depends(get_database)):
+    return await delete_product(id, db, store_id)
@@ -1,24 +1,85 @@
-from fastapi import APIRouter, Depends
-from typing import List
-from src.controllers.sale_controller import create_sale, get_sales, get_my_sales, cancel_sale
-from src.models.sale import SaleCreate, SaleResponse
-from src.middleware.auth_middleware import get_current_user, get_current_admin
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import List, Optional
+from datetime import datetime
+from src.controllers.sale_controller import create_sale, get_sales, get_my_sales, cancel_sale, cancel_sales, search_sales
+from src.models.sale import SaleCreate, SaleResponse, SaleBulkCancel, SaleSearch
+from src.middleware.auth_middleware import get_current_user, get_current_admin, get_store_scope
+from src.utils.stores import store_for_write
+from src.utils.idempotency import idempotency_store, fingerprint
+from src.utils.fieldsets import parse_fields
 from src.models.user import UserResponse
-from src.config.database import get_database
+from src.config.database import get_database, get_read_database
+from src.middleware.tracing_middleware import TracedRoute
 
-router = APIRouter(prefix="/sales", tags=["Sales"])
+router = APIRouter(prefix="/sales", tags=["Sales"], route_class=TracedRoute)
 
 @router.post("/", response_model=SaleResponse)
-async def create(sale: SaleCreate, current_user: UserResponse = Depends(get_current_user), db=Depends(get_database)):
-    return await create_sale(sale, current_user.id, db)
+async def create(
+    sale: SaleCreate,
+    response: Response,
+    current_user: UserResponse = Depends(get_current_user),
+    db=Depends(get_database),
+    idempotency_key: Optional[str] = Header(None)
+):
+    store_id = store_for_write(current_user, sale.store_id)
+    if idempotency_key is None:
+        return await create_sale(sale, current_user.id, db, store_id)
+    result, replayed = await idempotency_store.run(
+        db, current_user.id, idempotency_key, fingerprint(store_id, sale.model_dump_json()),
+        lambda: create_sale(sale, current_user.id, db, store_id)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 @router.get("/", response_model=List[SaleResponse])
-async def read_all(current_user: UserResponse = Depends(get_current_user), db=Depends(get_database)):
+async def read_all(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,total_amount,created_at"),
+    expand: bool = Query(False, description="Receipt view: items with product name, category and line total"),
+    current_user: UserResponse = Depends(get_current_user),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
+):
+    if fields and expand:
+        raise HTTPException(status_code=400, detail="fields and expand cannot be combined")
+    fieldset = parse_fields(SaleResponse, fields)
     if current_user.role == "admin":
-        return await get_sales(db)
+        return await get_sales(db, store_id, fieldset, expand)
     else:
-        return await get_my_sales(current_user.id, db)
+        return await get_my_sales(current_user.id, db, store_id, fieldset, expand)
+
+@router.get("/search", response_model=List[SaleResponse], dependencies=[Depends(get_current_admin)])
+async def find(
+    search: SaleSearch = Depends(),
+    before: Optional[datetime] = Query(None, description="created_at of the last sale of the previous page"),
+    before_id: Optional[str] = Query(None, description="id of the last sale of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,total_amount,created_at"),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_read_database)
+):
+    return await search_sales(search, db, store_id, before, before_id, limit, parse_fields(SaleResponse, fields))
+
+@router.post("/cancel")
+async def cancel_many(
+    request: SaleBulkCancel,
+    current_user: UserResponse = Depends(get_current_user),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_database)
+):
+    if current_user.role != "admin":
+        # Employees can only void their own sales, and must still say which:
+        # the employee_id filled in here would otherwise match all of them
+        if not (request.sale_ids or request.start or request.end):
+            raise HTTPException(status_code=400, detail="Give sale_ids and/or a time window")
+        request.employee_id = current_user.id
+    return await cancel_sales(request, current_user.id, current_user.role, db, store_id)
 
 @router.post("/{id}/cancel")
-async def cancel(id: str, current_user: UserResponse = Depends(get_current_user), db=Depends(get_database)):
-    return await cancel_sale(id, current_user.id, current_user.role, db)
+async def cancel(
+    id: str,
+    current_user: UserResponse = Depends(get_current_user),
+    store_id: Optional[str] = Depends(get_store_scope),
+    db=Depends(get_database)
+):
+    return await cancel_sale(id, current_user.id, current_user.role, db, store_id)
@@ -0,0 +1,98 @@
+from pymongo import UpdateOne, DeleteOne
+from src.utils.request_context import find_options
+from src.utils.read_cache import bump_version, PRODUCTS
+
+# Per-category inventory totals, keyed by category name:
+# {"_id": category, "count": int, "total_stock": int, "total_value": float}
+CATEGORY_STATS = "category_stats"
+
+def add_product(deltas: dict, product: dict, sign: int = 1):
+    """Record a product entering (sign=1) or leaving (sign=-1) its category"""
+    entry = deltas.setdefault(product["category"], {"count": 0, "total_stock": 0, "total_value": 0.0})
+    stock = product.get("stock_quantity", 0)
+    entry["count"] += sign
+    entry["total_stock"] += sign * stock
+    entry["total_value"] += sign * stock * product["price"]
+
+def add_stock_change(deltas: dict, category: str, price: float, quantity: int):
+    """Record a stock movement of `quantity` units (negative for sales)"""
+    entry = deltas.setdefault(category, {"count": 0, "total_stock": 0, "total_value": 0.0})
+    entry["total_stock"] += quantity
+    entry["total_value"] += quantity * price
+
+async def apply_category_deltas(db, deltas: dict):
+    """Apply accumulated deltas with a single bulk write"""
+    operations = [
+        UpdateOne({"_id": category}, {"$inc": delta}, upsert=True)
+        for category, delta in deltas.items()
+        if any(delta.values())
+    ]
+    if operations:
+        await db[CATEGORY_STATS].bulk_write(operations, ordered=False)
+
+async def get_category_stats(db, limit: int = 100):
+    """Categories that currently hold products, largest first"""
+    return await db[CATEGORY_STATS].find({"count": {"$gt": 0}}, **find_options()).sort("count", -1).to_list(limit)
+
+def _matches(expected: dict, actual: dict) -> bool:
+    return (
+        expected["count"] == actual.get("count")
+        and expected["total_stock"] == actual.get("total_stock")
+        and abs(expected["total_value"] - actual.get("total_value", 0.0)) <= 1e-6 * max(1.0, abs(expected["total_value"]))
+    )
+
+async def reconcile_category_stats(db, repair: bool = False):
+    """Verify category stats against the products collection and optionally repair drift.
+
+    Repairs $inc each stats document by its difference from the products
+    aggregate rather than replacing it, so deltas applied by writers after
+    the comparison are kept.
+    """
+    pipeline = [
+        {
+            "$group": {
+                "_id": "$category",
+                "count": {"$sum": 1},
+                "total_stock": {"$sum": "$stock_quantity"},
+                "total_value": {
+                    "$sum": {"$multiply": ["$stock_quantity", "$price"]}
+                }
+            }
+        }
+    ]
+    expected = {
+        cat["_id"]: cat
+        for cat in await db["products"].aggregate(pipeline).to_list(None)
+    }
+    actual = {
+        cat["_id"]: cat
+        for cat in await db[CATEGORY_STATS].find().to_list(None)
+    }
+
+    operations = []
+    mismatched = []
+    empty = {"count": 0, "total_stock": 0, "total_value": 0.0}
+    for category in sorted(expected.keys() | actual.keys(), key=str):
+        stats = expected.get(category, empty)
+        current = actual.get(category, {})
+        if category in expected and category in actual and _matches(stats, current):
+            continue
+        # Emptied categories legitimately linger at zero until cleaned up here
+        if category in expected or current.get("count"):
+            mismatched.append(category)
+        difference = {field: stats[field] - current.get(field, 0) for field in empty}
+        if any(difference.values()):
+            operations.append(UpdateOne({"_id": category}, {"$inc": difference}, upsert=True))
+        if category not in expected:
+            # Unless a product has joined the category meanwhile
+            operations.append(DeleteOne({"_id": category, "count": 0}))
+
+    if repair and operations:
+        await db[CATEGORY_STATS].bulk_write(operations, ordered=True)
+        await bump_version(db, PRODUCTS)
+
+    return {
+        "checked": len(expected),
+        "mismatched": mismatched,
+        "repaired": repair and bool(operations)
+    }
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from src.config.settings import settings
+from src.utils.sales_store import sales_collection, sales_query, sales_field
+from src.utils.stores import store_filter
+from src.utils.sales_archive import ARCHIVE
+from src.utils.request_context import find_options
+
+# Per-customer purchase aggregates keyed by customer id (string):
+# {"_id", "store_id", "first_purchase_at", "last_purchase_at", "order_count", "total_spent"}
+CUSTOMER_STATS = "customer_stats"
+
+async def record_purchases(db, sales: list):
+    """Fold completed sales into their customers' aggregates with one bulk write"""
+    operations = [
+        UpdateOne(
+            {"_id": sale["customer_id"]},
+            {
+                "$inc": {"order_count": 1, "total_spent": sale["total_amount"]},
+                "$min": {"first_purchase_at": sale["created_at"]},
+                "$max": {"last_purchase_at": sale["created_at"]},
+                "$set": {"store_id": sale.get("store_id")}
+            },
+            upsert=True
+        )
+        for sale in sales if sale.get("customer_id")
+    ]
+    if operations:
+        await db[CUSTOMER_STATS].bulk_write(operations, ordered=False)
+
+async def record_cancellations(db, sales: list):
+    """Take cancelled sales back out of the aggregates.
+
+    First/last purchase dates are left as they are; the backfill recomputes
+    them exactly if needed.
+    """
+    operations = [
+        UpdateOne(
+            {"_id": sale["customer_id"]},
+            {"$inc": {"order_count": -1, "total_spent": -sale["total_amount"]}}
+        )
+        for sale in sales if sale.get("customer_id")
+    ]
+    if operations:
+        await db[CUSTOMER_STATS].bulk_write(operations, ordered=False)
+
+def _segment_queries(now: datetime):
+    recent = now - timedelta(days=settings.RFM_RECENT_DAYS)
+    lapsed = now - timedelta(days=settings.RFM_LAPSED_DAYS)
+    frequent = settings.RFM_FREQUENT_ORDERS
+    high_spend = settings.RFM_HIGH_SPEND
+    return {
+        "champions": {
+            "last_purchase_at": {"$gte": recent},
+            "order_count": {"$gte": frequent},
+            "total_spent": {"$gte": high_spend}
+        },
+        "loyal": {
+            "last_purchase_at": {"$gte": lapsed},
+            "order_count": {"$gte": frequent}
+        },
+        "new": {
+            "first_purchase_at": {"$gte": recent},
+            "order_count": {"$gt": 0}
+        },
+        "at_risk": {
+            "last_purchase_at": {"$gte": lapsed, "$lt": recent},
+            "total_spent": {"$gte": high_spend}
+        },
+        "lost": {
+            "last_purchase_at": {"$lt": lapsed},
+            "order_count": {"$gt": 0}
+        }
+    }
+
+SEGMENTS = ("champions", "loyal", "new", "at_risk", "lost")
+
+async def get_segment(db, segment: str, limit: int, store_id: str = None):
+    """Customers in an RFM segment, most recent purchase first"""
+    query = {**store_filter(store_id), **_segment_queries(datetime.utcnow())[segment]}
+    sort_field = "first_purchase_at" if segment == "new" else "last_purchase_at"
+    return await db[CUSTOMER_STATS].find(query, **find_options()).sort(sort_field, -1).limit(limit).to_list(limit)
+
+async def get_top_customers(db, limit: int, store_id: str = None):
+    query = {**store_filter(store_id), "order_count": {"$gt": 0}}
+    return await db[CUSTOMER_STATS].find(query, **find_options()).sort("total_spent", -1).limit(limit).to_list(limit)
+
+async def backfill_customer_stats(db):
+    """Recompute all aggregates from hot and archived sales, replacing the collection"""
+    group = {"$group": {
+        "_id": "$customer_id",
+        "first_purchase_at": {"$min": "$created_at"},
+        "last_purchase_at": {"$max": "$created_at"},
+        "order_count": {"$sum": 1},
+        "total_spent": {"$sum": "$total_amount"},
+        "store_id": {"$last": "$store_id"}
+    }}
+    match = {"status": "completed", "customer_id": {"$type": "string"}}
+    pipeline = [
+        {"$match": sales_query(match)},
+        {"$project": {"customer_id": 1, "created_at": 1, "total_amount": 1, "store_id": f"${sales_field('store_id')}"}},
+        {"$unionWith": {"coll": ARCHIVE, "pipeline": [
+            {"$match": match},
+            {"$project": {"customer_id": 1, "created_at": 1, "total_amount": 1, "store_id": 1}}
+        ]}},
+        group,
+        {"$out": CUSTOMER_STATS}
+    ]
+    await sales_collection(db).aggregate(pipeline).to_list(None)
+    return await db[CUSTOMER_STATS].count_documents({})
@@ -0,0 +1,58 @@
+from functools import lru_cache
+from typing import List, Optional
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter, create_model
+
+# Sparse fieldsets: ?fields=id,name,price on list and detail routes. The
+# field set becomes a Mongo projection, so unrequested fields are neither
+# sent by the server nor decoded, and the documents are serialized through
+# a trimmed copy of the route's response model. Both the parsed field set
+# and the trimmed model are cached, so repeat requests for the same shape
+# only pay for the projection. Full documents go through list_response,
+# the same path with the model's own list adapter.
+
+@lru_cache(maxsize=512)
+def parse_fields(model, fields: Optional[str]) -> Optional[tuple]:
+    """Validated, ordered field names from a ?fields= value; None means all fields"""
+    if fields is None:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(model.model_fields)}"
+        )
+    # id always comes back so clients can refer to what they received
+    return tuple(dict.fromkeys(["id", *requested]))
+
+@lru_cache(maxsize=512)
+def _adapters(model, fields: tuple):
+    sparse = create_model(
+        f"{model.__name__}[{','.join(fields)}]",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+    return TypeAdapter(sparse), TypeAdapter(List[sparse])
+
+def projection(fields: tuple, storage_field=lambda name: name) -> dict:
+    """Mongo projection for a field set; storage_field maps logical to stored paths"""
+    return {"_id": 1, **{storage_field(name): 1 for name in fields if name != "id"}}
+
+def list_response(adapter: TypeAdapter, documents: list) -> Response:
+    """Validate and serialize documents with one adapter call each way.
+
+    Returned as a ready Response, so FastAPI doesn't validate the list a
+    second time against the route's response_model.
+    """
+    return Response(content=adapter.dump_json(adapter.validate_python(documents)), media_type="application/json")
+
+def sparse_response(model, fields: tuple, documents) -> Response:
+    """Serialize projected documents (or one document) through the trimmed model"""
+    single, many = _adapters(model, fields)
+
+    def trimmed(document):
+        return {name: str(document["_id"]) if name == "id" else document.get(name) for name in fields}
+
+    if isinstance(documents, list):
+        return list_response(many, [trimmed(d) for d in documents])
+    return Response(content=single.dump_json(single.validate_python(trimmed(documents))), media_type="application/json")
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+from src.config.settings import settings
+
+# Stored results of idempotent requests, keyed "<user id>:<Idempotency-Key>":
+# {"_id", "fingerprint", "status": "pending" | "done", "response", "created_at", "claimed_at"}
+# A TTL index on created_at (config/indexes.py) expires them after IDEMPOTENCY_TTL_SECONDS.
+IDEMPOTENCY_KEYS = "idempotency_keys"
+
+def fingerprint(*parts) -> str:
+    """Hash of the request body, to refuse a key reused for a different request"""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+class IdempotencyStore:
+    """Runs a handler at most once per idempotency key.
+
+    Completed responses sit in the idempotency_keys collection with an LRU
+    of recent ones in front, so most replays cost no query at all. A
+    duplicate arriving while the first request is still running waits on
+    it: in-process through a shared future, across workers by polling the
+    pending claim. A claim left behind by a crashed worker is taken over
+    after IDEMPOTENCY_PENDING_TIMEOUT_SECONDS.
+
+    Failed requests release their claim, so the client can retry them.
+    """
+
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self.stats = {"executed": 0, "replayed_cache": 0, "replayed_db": 0, "waited": 0}
+
+    async def run(self, db, user_id: str, key: str, request_fingerprint: str, handler):
+        """Returns (response, replayed)"""
+        if not key or len(key) > 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters")
+        record_id = f"{user_id}:{key}"
+
+        cached = self._cache.get(record_id)
+        if cached is not None and cached["expires_at"] <= datetime.utcnow():
+            del self._cache[record_id]
+            cached = None
+        if cached is not None:
+            self._cache.move_to_end(record_id)
+            self.stats["replayed_cache"] += 1
+            return self._replay(cached, request_fingerprint), True
+
+        in_flight = self._in_flight.get(record_id)
+        if in_flight is not None:
+            self.stats["waited"] += 1
+            record = await asyncio.shield(in_flight)
+            return self._replay(record, request_fingerprint), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[record_id] = future
+        try:
+            record = await self._claim(db, record_id, request_fingerprint)
+            if record is not None:
+                future.set_result(record)
+                self.stats["replayed_db"] += 1
+                return self._replay(record, request_fingerprint), True
+
+            try:
+                response = await handler()
+            except BaseException:
+                await db[IDEMPOTENCY_KEYS].delete_one({"_id": record_id, "status": "pending"})
+                raise
+            record = {
+                "fingerprint": request_fingerprint,
+                "response": jsonable_encoder(response),
+                "created_at": datetime.utcnow()
+            }
+            await db[IDEMPOTENCY_KEYS].update_one(
+                {"_id": record_id}, {"$set": {"status": "done", "response": record["response"]}}
+            )
+            self._remember(record_id, record)
+            future.set_result(record)
+            self.stats["executed"] += 1
+            return response, False
+        except BaseException as exc:
+            if future.done():
+                raise
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                # Waiters re-raise it; don't warn when there were none
+                future.exception()
+            raise
+        finally:
+            self._in_flight.pop(record_id, None)
+
+    async def _claim(self, db, record_id: str, request_fingerprint: str):
+        """Claim the key, or return the finished record of whoever holds it"""
+        deadline = asyncio.get_running_loop().time() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            now = datetime.utcnow()
+            try:
+                await db[IDEMPOTENCY_KEYS].insert_one({
+                    "_id": record_id,
+                    "fingerprint": request_fingerprint,
+                    "status": "pending",
+                    "created_at": now,
+                    "claimed_at": now
+                })
+                return None
+            except DuplicateKeyError:
+                pass
+
+            record = await db[IDEMPOTENCY_KEYS].find_one({"_id": record_id})
+            if record is None:
+                # Released by a failed attempt; try again
+                continue
+            if record["status"] == "done":
+                self._remember(record_id, record)
+                return record
+
+            stale = now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+            taken = await db[IDEMPOTENCY_KEYS].update_one(
+                {"_id": record_id, "status": "pending", "claimed_at": {"$lt": stale}},
+                {"$set": {"fingerprint": request_fingerprint, "claimed_at": now}}
+            )
+            if taken.modified_count:
+                return None
+            if asyncio.get_running_loop().time() >= deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            self.stats["waited"] += 1
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_MS / 1000)
+
+    def _replay(self, record: dict, request_fingerprint: str):
+        if record["fingerprint"] != request_fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        return record["response"]
+
+    def _remember(self, record_id: str, record: dict):
+        self._cache[record_id] = {
+            "fingerprint": record["fingerprint"],
+            "response": record["response"],
+            # Not past the TTL that removes the stored record
+            "expires_at": record["created_at"] + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        }
+        self._cache.move_to_end(record_id)
+        while len(self._cache) > settings.IDEMPOTENCY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,79 @@
+import logging
+from src.config.settings import settings
+from src.models.user import UserResponse
+from src.controllers.analytics_controller import (
+    get_cached_dashboard_stats, get_low_stock_products, precompute_admin_dashboard, run_reorder_job
+)
+from src.controllers.product_controller import get_cached_products, get_cached_categories
+from src.config.indexes import ensure_indexes, drop_retired_indexes
+from src.utils.category_stats import reconcile_category_stats
+from src.utils.sales_archive import archive_sales
+from src.utils.sales_snapshot import refresh_snapshot
+from src.utils.stock_ledger import take_stock_snapshot, reconcile_stock_ledger
+from src.utils.read_cache import read_cache
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+async def warm_caches(db):
+    """Fill the read cache, from the local snapshot where its stamps are
+    still current, and pull the other hot read paths into the server cache;
+    run by every worker before it reports ready (see utils/lifecycle.py)"""
+    admin = UserResponse(id="scheduler", email="scheduler@example.com", role="admin", name="Scheduler")
+    await read_cache.load_snapshot(db)
+    await get_cached_categories(db)
+    await get_cached_products(db)
+    await get_low_stock_products(db)
+    await get_cached_dashboard_stats(admin, db)
+
+async def dump_read_cache(db):
+    await read_cache.dump_snapshot()
+
+async def precompute_dashboard(db):
+    await precompute_admin_dashboard(db)
+
+async def compact_rollups(db):
+    result = await archive_sales(db)
+    logger.info("Archived %d sales, rolled up before %s", result["moved"], result["rolled_up_before"])
+
+async def check_indexes(db):
+    created = await ensure_indexes(db)
+    if created:
+        logger.warning("Recreated missing indexes: %s", created)
+    dropped = await drop_retired_indexes(db)
+    if dropped:
+        logger.info("Dropped retired indexes: %s", dropped)
+
+async def reconcile_categories(db):
+    # Check only: a repair racing live sales would drop their deltas
+    result = await reconcile_category_stats(db, repair=False)
+    if result["mismatched"]:
+        logger.warning("Category stats disagree with products in: %s", result["mismatched"])
+
+async def refresh_offline_snapshot(db):
+    await refresh_snapshot(db)
+
+async def refresh_reorder_suggestions(db):
+    await run_reorder_job(False, db)
+
+async def snapshot_stock_ledger(db):
+    await take_stock_snapshot(db)
+
+async def verify_stock_ledger(db):
+    result = await reconcile_stock_ledger(db, repair=False)
+    if result["mismatched"]:
+        logger.warning("Stock ledger disagrees with products for %d products", len(result["mismatched"]))
+
+def register_default_jobs(scheduler):
+    scheduler.register("dashboard_snapshot", precompute_dashboard, settings.DASHBOARD_SNAPSHOT_INTERVAL_SECONDS)
+    scheduler.register("index_check", check_indexes, HOUR)
+    scheduler.register("category_stats_reconcile", reconcile_categories, HOUR)
+    scheduler.register("offline_snapshot_refresh", refresh_offline_snapshot, 5 * 60)
+    scheduler.register("rollup_compaction", compact_rollups, DAY)
+    scheduler.register("reorder_suggestions", refresh_reorder_suggestions, DAY)
+    scheduler.register("stock_ledger_snapshot", snapshot_stock_ledger, settings.LEDGER_SNAPSHOT_INTERVAL_SECONDS)
+    scheduler.register("stock_ledger_verify", verify_stock_ledger, DAY)
+    # Every worker keeps its own cache, so every worker writes the snapshot
+    scheduler.register("read_cache_snapshot", dump_read_cache, settings.READ_CACHE_SNAPSHOT_INTERVAL_SECONDS, leader_only=False)
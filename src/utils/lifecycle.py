@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from pymongo.errors import PyMongoError
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+READY = "ready"
+DRAINING = "draining"
+
+class Lifecycle:
+    """Worker state for rolling restarts: starting -> ready -> draining.
+
+    A new worker answers liveness straight away but is only ready once it
+    has reached Mongo, opened DB_WARM_CONNECTIONS pool connections and run
+    the cache warm-up; LifecycleMiddleware holds other traffic until then.
+    Draining refuses new requests and waits for the ones in flight.
+    """
+
+    def __init__(self):
+        self.state = STARTING
+        self.in_flight = 0
+        self.in_flight_writes = 0
+        self.warmup = {"ping_ms": None, "pool_ms": None, "caches_ms": None, "error": None}
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start_warmup(self, db, warm_caches):
+        self._task = asyncio.create_task(self._warm_up(db, warm_caches))
+
+    async def _warm_up(self, db, warm_caches):
+        began = time.perf_counter()
+        # Server discovery and the auth handshake happen on the first command
+        while True:
+            try:
+                await db.client.admin.command("ping")
+                break
+            except PyMongoError as exc:
+                self.warmup["error"] = repr(exc)
+                logger.warning("Waiting for MongoDB: %s", exc)
+                await asyncio.sleep(1)
+        self.warmup["ping_ms"] = round((time.perf_counter() - began) * 1000, 2)
+
+        # Concurrent pings each check out their own connection, so the pool
+        # opens them now rather than during the first burst of requests
+        began = time.perf_counter()
+        await asyncio.gather(
+            *(db.client.admin.command("ping") for _ in range(settings.DB_WARM_CONNECTIONS)),
+            return_exceptions=True
+        )
+        self.warmup["pool_ms"] = round((time.perf_counter() - began) * 1000, 2)
+
+        began = time.perf_counter()
+        try:
+            await asyncio.wait_for(warm_caches(db), settings.WARMUP_TIMEOUT_SECONDS)
+        except Exception as exc:
+            # Cold caches only cost latency; don't keep the worker out of rotation
+            logger.warning("Cache warm-up incomplete: %r", exc)
+            self.warmup["error"] = repr(exc)
+        else:
+            self.warmup["error"] = None
+        self.warmup["caches_ms"] = round((time.perf_counter() - began) * 1000, 2)
+
+        if self.state == STARTING:
+            self.state = READY
+            logger.info("Worker ready (ping %sms, pool %sms, caches %sms)",
+                        self.warmup["ping_ms"], self.warmup["pool_ms"], self.warmup["caches_ms"])
+        self._ready.set()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def request_started(self, write: bool):
+        self.in_flight += 1
+        self.in_flight_writes += write
+        self._idle.clear()
+
+    def request_finished(self, write: bool):
+        self.in_flight -= 1
+        self.in_flight_writes -= write
+        if not self.in_flight:
+            self._idle.set()
+
+    def start_draining(self):
+        if self.state != DRAINING:
+            logger.info("Draining with %d requests in flight", self.in_flight)
+        self.state = DRAINING
+        # Release requests held at the gate; they are refused from here on
+        self._ready.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop taking requests and wait up to `timeout` for in-flight ones"""
+        self.start_draining()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Drain timed out with %d requests (%d writes) in flight", self.in_flight, self.in_flight_writes)
+            return False
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "in_flight_writes": self.in_flight_writes,
+            "warmup": self.warmup
+        }
+
+lifecycle = Lifecycle()
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from pymongo.monitoring import ConnectionPoolListener
+
+class PoolWaitMonitor(ConnectionPoolListener):
+    """Counts operations waiting to check a connection out of the Motor pool.
+
+    Pool events fire on Motor's executor threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checked_out = 0
+
+    def _adjust(self, waiting=0, checked_out=0):
+        with self._lock:
+            self.waiting += waiting
+            self.checked_out += checked_out
+
+    def connection_check_out_started(self, event):
+        self._adjust(waiting=1)
+
+    def connection_checked_out(self, event):
+        self._adjust(waiting=-1, checked_out=1)
+
+    def connection_check_out_failed(self, event):
+        self._adjust(waiting=-1)
+
+    def connection_checked_in(self, event):
+        self._adjust(checked_out=-1)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+class EventLoopLagMonitor:
+    """Measures how late the event loop wakes up from a short sleep"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            began = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            late = (time.perf_counter() - began - self.interval) * 1000
+            # Jump up immediately, decay gradually so one quiet tick doesn't reopen the gate
+            self.lag_ms = max(late, self.lag_ms * 0.7 + late * 0.3)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+pool_monitor = PoolWaitMonitor()
+loop_lag_monitor = EventLoopLagMonitor()
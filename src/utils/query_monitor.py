@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime
+from bson import json_util
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid, PyMongoError
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = "slow_queries"
+REQUEST_PROFILES = "request_profiles"
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Fields the driver adds to a command that explain either rejects or doesn't need
+DRIVER_FIELDS = {"lsid", "$clusterTime", "$db", "$readPreference", "txnNumber", "readConcern", "writeConcern", "maxTimeMS"}
+
+class QueryMonitor(monitoring.CommandListener):
+    """Times every command the client runs.
+
+    Commands slower than SLOW_QUERY_MS are explained and written to the
+    capped slow_queries collection by a background task. Commands tagged
+    with a watched request's comment (see utils/request_context.py) are
+    also collected for that request's profile.
+
+    The listener is called on the driver's threads, so records are handed
+    to the event loop through a bounded queue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self._watched = {}
+        self._loop = None
+        self._queue = None
+        self._task = None
+        self.stats = {"captured": 0, "dropped": 0}
+
+    def watch(self, tag: str):
+        with self._lock:
+            self._watched[tag] = []
+
+    def unwatch(self, tag: str) -> list:
+        """Stop collecting for a request and return its commands"""
+        with self._lock:
+            return self._watched.pop(tag, [])
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if collection in (SLOW_QUERIES, REQUEST_PROFILES):
+            return
+        tag = event.command.get("comment")
+        capture = self._loop is not None and event.command_name in EXPLAINABLE
+        if not capture and tag not in self._watched:
+            return
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (
+                event.command_name,
+                event.database_name,
+                collection if isinstance(collection, str) else None,
+                {k: v for k, v in event.command.items() if k not in DRIVER_FIELDS} if capture else None,
+                tag
+            )
+
+    def succeeded(self, event):
+        self._finish(event, ok=True)
+
+    def failed(self, event):
+        self._finish(event, ok=False)
+
+    def _finish(self, event, ok: bool):
+        with self._lock:
+            entry = self._started.pop((event.connection_id, event.request_id), None)
+            if entry is None:
+                return
+            command_name, database, collection, command, tag = entry
+            duration_ms = event.duration_micros / 1000
+            if tag in self._watched:
+                self._watched[tag].append({
+                    "command": command_name,
+                    "collection": collection,
+                    "duration_ms": round(duration_ms, 3),
+                    "ok": ok
+                })
+        if command is not None and duration_ms >= settings.SLOW_QUERY_MS:
+            record = {
+                "at": datetime.utcnow(),
+                "database": database,
+                "collection": collection,
+                "command_name": command_name,
+                "command": command,
+                "duration_ms": round(duration_ms, 3),
+                "ok": ok,
+                "request_tag": tag
+            }
+            loop = self._loop
+            if loop is not None:
+                loop.call_soon_threadsafe(self._enqueue, record)
+
+    def _enqueue(self, record: dict):
+        if self._queue is None or self._queue.full():
+            self.stats["dropped"] += 1
+            return
+        self._queue.put_nowait(record)
+
+    async def start(self, db):
+        for name, size in ((SLOW_QUERIES, settings.SLOW_QUERY_LOG_BYTES), (REQUEST_PROFILES, settings.PROFILE_LOG_BYTES)):
+            try:
+                await db.create_collection(name, capped=True, size=size)
+            except CollectionInvalid:
+                pass
+        self._queue = asyncio.Queue(maxsize=1000)
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._drain(db))
+
+    async def stop(self):
+        self._loop = None
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _drain(self, db):
+        while True:
+            record = await self._queue.get()
+            try:
+                record["explain"] = await db.client[record["database"]].command(
+                    {"explain": record["command"], "verbosity": "queryPlanner"}
+                )
+            except PyMongoError as exc:
+                record["explain_error"] = str(exc)
+            try:
+                await db[SLOW_QUERIES].insert_one(record)
+                self.stats["captured"] += 1
+            except PyMongoError:
+                logger.warning("Could not record slow %s on %s", record["command_name"], record["collection"], exc_info=True)
+
+query_monitor = QueryMonitor()
+
+def to_json(document: dict) -> dict:
+    """Captured commands and explain output hold arbitrary BSON types"""
+    document["_id"] = str(document["_id"])
+    return json.loads(json_util.dumps(document, json_options=json_util.RELAXED_JSON_OPTIONS))
+
+async def get_slow_queries(db, limit: int = 50, collection: str = None):
+    """Most recent slow operations, newest first"""
+    query = {"collection": collection} if collection else {}
+    entries = await db[SLOW_QUERIES].find(query).sort("$natural", -1).limit(limit).to_list(limit)
+    return [to_json(entry) for entry in entries]
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from src.config.settings import settings
+from src.utils.request_context import find_options
+
+logger = logging.getLogger(__name__)
+
+# Version stamps of the data behind cached responses:
+# {"_id": name, "epoch": str, "version": int}
+# Writers bump a stamp after changing its data; a cached response is only
+# served while the stamps it was built under are all current. The epoch is
+# fixed when the stamp is created, so a dropped and reseeded database never
+# matches a snapshot taken from the old one.
+CACHE_VERSIONS = "cache_versions"
+# Catalog shape: products created, edited or deleted, thresholds, category
+# repairs. Bumped right away (bump_version).
+PRODUCTS = "products"
+# Stock levels, which move with every sale and cancellation. Bumped through
+# bump_version_soon, so checkout traffic costs at most one stamp write per
+# READ_CACHE_STOCK_COALESCE_SECONDS per worker and cached catalogs lag
+# stock by no more than that.
+STOCK = "stock"
+DASHBOARD = "dashboard"
+
+# Snapshot file layout: MAGIC, a little-endian uint32 header length, the
+# JSON header, then the response bodies back to back. The header lists
+# each entry's key, stamp, age and the offset/length of its body. Bumping
+# FORMAT_VERSION makes older files ignored rather than misread.
+FORMAT_VERSION = 2
+MAGIC = b"RDCACHE" + bytes([FORMAT_VERSION])
+HEADER_LENGTH = struct.Struct("<I")
+
+def _stamp(document: dict) -> str:
+    return f"{document['epoch']}:{document['version']}"
+
+async def bump_version(db, name: str):
+    await db[CACHE_VERSIONS].update_one(
+        {"_id": name}, {"$inc": {"version": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex}}, upsert=True
+    )
+
+_pending_bumps = {}
+
+def bump_version_soon(db, name: str):
+    """Coalesced bump_version: the first change schedules one bump after
+    READ_CACHE_STOCK_COALESCE_SECONDS that covers every change until it runs"""
+    if name not in _pending_bumps:
+        _pending_bumps[name] = asyncio.create_task(_delayed_bump(db, name))
+
+async def _delayed_bump(db, name: str):
+    await asyncio.sleep(settings.READ_CACHE_STOCK_COALESCE_SECONDS)
+    # Changes finishing from here on schedule the next bump
+    del _pending_bumps[name]
+    await _bump_logged(db, name)
+
+async def _bump_logged(db, name: str):
+    try:
+        await bump_version(db, name)
+    except PyMongoError:
+        logger.warning("Could not bump cache version %s", name, exc_info=True)
+
+async def flush_version_bumps(db):
+    """Run scheduled bumps now; on shutdown, so other workers don't serve stale stock"""
+    for name, task in list(_pending_bumps.items()):
+        # Still asleep: a task past its sleep has already left the dict
+        task.cancel()
+        del _pending_bumps[name]
+        await _bump_logged(db, name)
+
+def _combined(stamps: dict, names) -> str:
+    return "|".join(stamps[name] if name in stamps else "-" for name in names)
+
+async def _current_stamp(db, names: tuple) -> str:
+    stamps = {
+        document["_id"]: _stamp(document)
+        async for document in db[CACHE_VERSIONS].find({"_id": {"$in": list(names)}}, **find_options())
+    }
+    for name in names:
+        if name not in stamps:
+            document = await db[CACHE_VERSIONS].find_one_and_update(
+                {"_id": name}, {"$setOnInsert": {"epoch": uuid.uuid4().hex, "version": 0}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            stamps[name] = _stamp(document)
+    return _combined(stamps, names)
+
+class ReadCache:
+    """Serialized responses of hot read-mostly routes (catalog, categories,
+    admin dashboard), kept per worker and checked against their version
+    stamp on every hit, so a hit costs one point read instead of a
+    collection scan and re-serialization.
+
+    The entries are dumped to READ_CACHE_SNAPSHOT_FILE periodically and on
+    shutdown. A new worker maps that file at startup and adopts the entries
+    whose stamps are still current, so it starts warm instead of rebuilding
+    everything from Mongo. Bodies loaded this way stay in the mapping and
+    are only paged in when first served.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._mapped = None
+        self.stats = {"hits": 0, "misses": 0, "loaded": 0, "discarded": 0, "dumped": 0}
+
+    async def fetch(self, db, key: str, stamp_names: tuple, build, max_age: float = None) -> Response:
+        """Cached response for `key`, rebuilt with `build()` when any of its stamps has moved.
+
+        `build` returns a Response or anything FastAPI could serialize. The
+        stamps are read before building, so a write landing mid-build leaves
+        the entry already stale rather than wrongly current.
+        """
+        stamp = await _current_stamp(db, stamp_names)
+        entry = self._entries.get(key)
+        if entry is not None and entry["stamp"] == stamp and not self._expired(entry):
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return Response(content=bytes(entry["body"]), media_type="application/json")
+
+        self.stats["misses"] += 1
+        result = await build()
+        response = result if isinstance(result, Response) else JSONResponse(jsonable_encoder(result))
+        if response.status_code == 200:
+            self._store(key, {
+                "stamp_names": list(stamp_names),
+                "stamp": stamp,
+                "stored_at": time.time(),
+                "max_age": max_age or settings.READ_CACHE_MAX_AGE_SECONDS,
+                "body": response.body
+            })
+        return response
+
+    def _expired(self, entry: dict) -> bool:
+        return time.time() - entry["stored_at"] > entry["max_age"]
+
+    def _store(self, key: str, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.READ_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    async def load_snapshot(self, db, path: str = None) -> int:
+        """Adopt the entries of the snapshot file whose stamps are still current"""
+        path = path or settings.READ_CACHE_SNAPSHOT_FILE
+        try:
+            with open(path, "rb") as snapshot_file:
+                mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Missing, or empty (mmap refuses zero-length files)
+            return 0
+        except OSError:
+            logger.warning("Could not map cache snapshot %s", path, exc_info=True)
+            return 0
+        try:
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError("unknown format")
+            start = len(MAGIC) + HEADER_LENGTH.size
+            (length,) = HEADER_LENGTH.unpack_from(mapped, len(MAGIC))
+            header = json.loads(mapped[start:start + length])
+            bodies = start + length
+        except (ValueError, struct.error):
+            logger.warning("Ignoring unreadable cache snapshot %s", path)
+            mapped.close()
+            return 0
+
+        stamps = {
+            document["_id"]: _stamp(document)
+            async for document in db[CACHE_VERSIONS].find({}, **find_options())
+        }
+        view = memoryview(mapped)
+        loaded = 0
+        for entry in header["entries"]:
+            if _combined(stamps, entry["stamp_names"]) != entry["stamp"] or self._expired(entry):
+                self.stats["discarded"] += 1
+                continue
+            offset = bodies + entry.pop("offset")
+            entry["body"] = view[offset:offset + entry.pop("length")]
+            self._store(entry.pop("key"), entry)
+            loaded += 1
+        # The entries' bodies point into the mapping, which lives as long as
+        # this cache; a later dump replaces the file, never rewrites it
+        self._mapped = mapped
+        self.stats["loaded"] += loaded
+        logger.info("Loaded %d cached responses from %s (%d stale)", loaded, path, len(header["entries"]) - loaded)
+        return loaded
+
+    async def dump_snapshot(self, path: str = None) -> int:
+        """Write the unexpired entries to the snapshot file"""
+        path = path or settings.READ_CACHE_SNAPSHOT_FILE
+        entries = [(key, entry) for key, entry in self._entries.items() if not self._expired(entry)]
+        try:
+            await asyncio.to_thread(self._write, path, entries)
+        except OSError:
+            logger.warning("Could not write cache snapshot %s", path, exc_info=True)
+            return 0
+        self.stats["dumped"] += 1
+        return len(entries)
+
+    def _write(self, path: str, entries: list):
+        header = {"written_at": time.time(), "entries": []}
+        offset = 0
+        for key, entry in entries:
+            header["entries"].append({
+                "key": key,
+                "stamp_names": entry["stamp_names"],
+                "stamp": entry["stamp"],
+                "stored_at": entry["stored_at"],
+                "max_age": entry["max_age"],
+                "offset": offset,
+                "length": len(entry["body"])
+            })
+            offset += len(entry["body"])
+        encoded = json.dumps(header).encode()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Workers sharing the file each write their own temporary copy; the
+        # rename is atomic, and mappings of the old file remain valid
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as snapshot_file:
+            snapshot_file.write(MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded)
+            for _, entry in entries:
+                snapshot_file.write(entry["body"])
+        os.replace(temporary, path)
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": sum(len(entry["body"]) for entry in self._entries.values())
+        }
+
+read_cache = ReadCache()
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne, UpdateMany
+from src.utils.sales_snapshot import SalesSnapshot, EPOCH, completed_sale_mask
+from src.utils.read_cache import bump_version, PRODUCTS
+
+def compute_reorder_points(snapshot: SalesSnapshot, now: datetime, history_days: int,
+                           lead_time_days: float, service_z: float):
+    """Per-product daily demand and reorder points in one vectorized pass.
+
+    Daily demand is aggregated per (product, day) over the history window,
+    zero-demand days included, and the reorder point is the lead-time
+    demand plus safety stock: mean * L + z * std * sqrt(L).
+    Returns (product ids, units/day, reorder points) for products sold in
+    the window.
+    """
+    start = now - timedelta(days=history_days)
+    sale = snapshot.column("sale")
+    item_mask = completed_sale_mask(snapshot, start)[sale]
+    if not item_mask.any():
+        return [], np.empty(0), np.empty(0, dtype=np.int64)
+
+    start_epoch = int((start - EPOCH).total_seconds())
+    day = np.minimum((snapshot.column("sale_ts")[sale[item_mask]] - start_epoch) // 86400, history_days - 1)
+    product = snapshot.column("product")[item_mask].astype(np.int64)
+    key = product * history_days + day
+    cells, inverse = np.unique(key, return_inverse=True)
+    daily = np.bincount(inverse, weights=snapshot.column("quantity")[item_mask])
+
+    cell_product = cells // history_days
+    n_products = len(snapshot.manifest["products"])
+    total = np.bincount(cell_product, weights=daily, minlength=n_products)
+    total_sq = np.bincount(cell_product, weights=daily * daily, minlength=n_products)
+    mean = total / history_days
+    std = np.sqrt(np.maximum(total_sq / history_days - mean * mean, 0))
+    reorder = np.ceil(mean * lead_time_days + service_z * std * np.sqrt(lead_time_days)).astype(np.int64)
+
+    sold = np.flatnonzero(total > 0)
+    products = snapshot.manifest["products"]
+    return [products[i] for i in sold], mean[sold], reorder[sold]
+
+async def write_reorder_suggestions(db, product_ids, velocity, reorder, computed_at: datetime, apply: bool = False):
+    """Store suggestions for the whole catalog with a single ordered bulk write"""
+    operations = [
+        UpdateOne(
+            {"_id": ObjectId(pid)},
+            {"$set": {
+                "sales_velocity": round(float(v), 4),
+                "suggested_reorder_point": int(r),
+                "reorder_computed_at": computed_at
+            }}
+        )
+        for pid, v, r in zip(product_ids, velocity, reorder) if ObjectId.is_valid(pid)
+    ]
+    # Products with no sales in the window get zero suggestions
+    operations.append(UpdateMany(
+        {"reorder_computed_at": {"$ne": computed_at}},
+        {"$set": {"sales_velocity": 0.0, "suggested_reorder_point": 0, "reorder_computed_at": computed_at}}
+    ))
+    if apply:
+        operations.append(UpdateMany({}, [{"$set": {"low_stock_threshold": "$suggested_reorder_point"}}]))
+    result = await db["products"].bulk_write(operations, ordered=True)
+    await bump_version(db, PRODUCTS)
+    return result.modified_count
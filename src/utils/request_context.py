@@ -0,0 +1,101 @@
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+# Set per request by DeadlineMiddleware; unset for scheduler jobs and scripts,
+# in which case the helpers below add no limits.
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+_request_tag: ContextVar[Optional[str]] = ContextVar("request_tag", default=None)
+# Causally consistent session, set by CausalConsistencyMiddleware
+_session: ContextVar = ContextVar("session", default=None)
+# Set by TracingMiddleware: the id shown in logs and X-Request-ID (the
+# client's, if it sent one) and the server-generated trace id
+_correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+# Process-wide counters, reported by /admin/deadlines
+deadline_metrics = {"requests": 0, "exceeded": 0, "disconnected": 0, "killed_ops": 0, "exceeded_by_route": {}}
+
+class DeadlineExceeded(Exception):
+    """The request ran out of budget before issuing another query"""
+
+def start_request(budget_ms: int):
+    """Open a request context; pass the result to end_request"""
+    deadline_metrics["requests"] += 1
+    return (
+        _deadline.set(time.monotonic() + budget_ms / 1000),
+        # Always server-generated, since kill_request_ops matches on it
+        _request_tag.set(f"req:{_trace_id.get() or uuid.uuid4().hex}")
+    )
+
+def end_request(tokens):
+    deadline_token, tag_token = tokens
+    _deadline.reset(deadline_token)
+    _request_tag.reset(tag_token)
+
+def set_request_ids(correlation: str, trace: str):
+    return _correlation_id.set(correlation), _trace_id.set(trace)
+
+def reset_request_ids(tokens):
+    correlation_token, trace_token = tokens
+    _correlation_id.reset(correlation_token)
+    _trace_id.reset(trace_token)
+
+def correlation_id() -> Optional[str]:
+    return _correlation_id.get()
+
+def trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+def request_tag() -> Optional[str]:
+    """Comment attached to this request's queries, used to find them in $currentOp"""
+    return _request_tag.get()
+
+def remaining_ms() -> Optional[int]:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = int((deadline - time.monotonic()) * 1000)
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return remaining
+
+def set_session(session):
+    return _session.set(session)
+
+def reset_session(token):
+    _session.reset(token)
+
+def write_options() -> dict:
+    """Keyword arguments for writes whose results later reads must see"""
+    options = {}
+    session = _session.get()
+    if session is not None:
+        options["session"] = session
+    tag = _request_tag.get()
+    if tag is not None:
+        # Lets the query monitor attribute writes to a profiled request
+        options["comment"] = tag
+    return options
+
+def find_options() -> dict:
+    """Keyword arguments for find/find_one"""
+    options = write_options()
+    remaining = remaining_ms()
+    if remaining is not None:
+        options.update(max_time_ms=remaining, comment=request_tag())
+    return options
+
+def command_options() -> dict:
+    """Keyword arguments for aggregate/count_documents"""
+    options = write_options()
+    remaining = remaining_ms()
+    if remaining is not None:
+        options.update(maxTimeMS=remaining, comment=request_tag())
+    return options
+
+def record_exceeded(route: str):
+    deadline_metrics["exceeded"] += 1
+    by_route = deadline_metrics["exceeded_by_route"]
+    by_route[route] = by_route.get(route, 0) + 1
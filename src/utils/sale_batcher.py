@@ -0,0 +1,245 @@
+import asyncio
+import contextvars
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.config.settings import settings
+from src.utils.category_stats import add_stock_change, apply_category_deltas
+from src.utils.customer_stats import record_purchases
+from src.utils.sales_store import sales_collection, to_sale_document
+from src.utils.sale_items import snapshot_item
+from src.utils.stock_ledger import add_movement, record_movements
+from src.utils.read_cache import bump_version_soon, STOCK
+from src.utils.request_context import DeadlineExceeded, remaining_ms, set_session, reset_session, write_options
+
+class SaleBatcher:
+    """Group-commit writer for sales.
+
+    Concurrent create_sale calls are queued for SALE_BATCH_WINDOW_MS (or
+    until SALE_BATCH_MAX_SIZE is reached) and committed together: one read
+    of every product involved, one guarded stock decrement per product
+    (merged across the batch and sent concurrently), and one insert_many of
+    the sales. Each caller gets back its own sale document or its own
+    HTTPException.
+
+    A batch commits in its own causally consistent session (on a replica
+    set), whose cluster and operation time are handed to every caller's
+    session afterwards, so each request's causal token covers its sale.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, db, sale_doc: dict):
+        """Queue a sale (without total/_id) and wait for its batch to commit"""
+        # Raises DeadlineExceeded when the request has no budget left
+        remaining_ms()
+        future = asyncio.get_running_loop().create_future()
+        # The caller's context, to check its deadline when the batch commits
+        self._pending.append((sale_doc, future, contextvars.copy_context()))
+        if len(self._pending) >= settings.SALE_BATCH_MAX_SIZE:
+            self._flush(db)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                settings.SALE_BATCH_WINDOW_MS / 1000, self._flush, db
+            )
+        created_sale, causal_times = await future
+        session = write_options().get("session")
+        if session is not None and causal_times is not None:
+            session.advance_cluster_time(causal_times[0])
+            session.advance_operation_time(causal_times[1])
+        return created_sale
+
+    async def drain(self, db):
+        """Commit anything still queued and wait for batches in progress"""
+        self._flush(db)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self, db):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # A fresh context, so the batch does not run under the session,
+            # deadline and query tag of whichever request happened to flush it
+            task = asyncio.create_task(self._commit(db, batch), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, db, batch):
+        try:
+            if settings.DB_REPLICA_SET:
+                async with await db.client.start_session(causal_consistency=True) as session:
+                    context_token = set_session(session)
+                    try:
+                        await self._commit_batch(db, batch)
+                    finally:
+                        reset_session(context_token)
+            else:
+                await self._commit_batch(db, batch)
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+
+    async def _commit_batch(self, db, batch):
+        def reject(future, status_code, detail):
+            if not future.done():
+                future.set_exception(HTTPException(status_code=status_code, detail=detail))
+
+        # Drop requests whose deadline passed while queued, then validate IDs
+        # and load every product in the batch with one query
+        budgets = []
+        product_ids = set()
+        for sale_doc, future, context in batch:
+            try:
+                budgets.append(context.run(remaining_ms))
+            except DeadlineExceeded as exc:
+                future.set_exception(exc)
+                continue
+            for item in sale_doc["items"]:
+                if not ObjectId.is_valid(item["product_id"]):
+                    reject(future, 400, f"Invalid product ID: {item['product_id']}")
+                    break
+                product_ids.add(ObjectId(item["product_id"]))
+        products = {
+            str(p["_id"]): p
+            for p in await db["products"].find(
+                {"_id": {"$in": list(product_ids)}},
+                {"name": 1, "category": 1, "price": 1, "stock_quantity": 1, "store_id": 1},
+                **write_options(), **_read_limit(budgets)
+            ).to_list(None)
+        }
+
+        # Allocate stock to requests in arrival order
+        available = {pid: p["stock_quantity"] for pid, p in products.items()}
+        accepted = []
+        for sale_doc, future, _ in batch:
+            if future.done():
+                continue
+            needed = {}
+            for item in sale_doc["items"]:
+                needed[item["product_id"]] = needed.get(item["product_id"], 0) + item["quantity"]
+            # Products of another store are treated as unknown
+            missing = next(
+                (pid for pid in needed
+                 if pid not in products or products[pid].get("store_id") != sale_doc["store_id"]),
+                None
+            )
+            if missing:
+                reject(future, 404, f"Product not found: {missing}")
+                continue
+            short = next((pid for pid, qty in needed.items() if available[pid] < qty), None)
+            if short:
+                reject(future, 400, f"Insufficient stock for: {products[short]['name']}")
+                continue
+            for pid, qty in needed.items():
+                available[pid] -= qty
+            accepted.append((sale_doc, future, needed))
+
+        if not accepted:
+            return
+
+        # One guarded decrement per product; each result says whether it
+        # applied, in case another writer took the stock in the meantime.
+        # They run concurrently, so outside the session (which serves one
+        # operation at a time); the insert that follows in the session comes
+        # after them, so its operation time covers them.
+        merged = _merge_quantities(accepted)
+        results = await asyncio.gather(*(
+            db["products"].update_one(
+                {"_id": ObjectId(pid), "stock_quantity": {"$gte": qty}},
+                {"$inc": {"stock_quantity": -qty}}
+            )
+            for pid, qty in merged.items()
+        ))
+        applied = {pid for pid, result in zip(merged, results) if result.matched_count}
+
+        if len(applied) < len(merged):
+            restore = {}
+            still_accepted = []
+            for sale_doc, future, needed in accepted:
+                failed = next((pid for pid in needed if pid not in applied), None)
+                if failed:
+                    reject(future, 400, f"Insufficient stock for: {products[failed]['name']}")
+                    for pid, qty in needed.items():
+                        if pid in applied:
+                            restore[pid] = restore.get(pid, 0) + qty
+                else:
+                    still_accepted.append((sale_doc, future, needed))
+            await self._restore_stock(db, restore)
+            accepted = still_accepted
+            if not accepted:
+                return
+
+        for sale_doc, _, _ in accepted:
+            sale_doc["_id"] = ObjectId()
+            sale_doc["items"] = [snapshot_item(item, products[item["product_id"]]) for item in sale_doc["items"]]
+
+        # Unordered, so one bad sale doesn't stop the rest of the batch;
+        # only the sales that did not insert give their stock back
+        try:
+            await sales_collection(db).insert_many(
+                [to_sale_document(sale_doc) for sale_doc, _, _ in accepted], ordered=False, **write_options()
+            )
+        except BulkWriteError as exc:
+            failed = {error["index"] for error in exc.details["writeErrors"]}
+            for index in failed:
+                reject(accepted[index][1], 500, "Could not record sale")
+            await self._restore_stock(db, _merge_quantities([accepted[index] for index in failed]))
+            accepted = [sale for index, sale in enumerate(accepted) if index not in failed]
+            if not accepted:
+                return
+        except Exception:
+            await self._restore_stock(db, _merge_quantities(accepted))
+            raise
+
+        category_deltas = {}
+        for pid, qty in _merge_quantities(accepted).items():
+            add_stock_change(category_deltas, products[pid]["category"], products[pid]["price"], -qty)
+        await apply_category_deltas(db, category_deltas)
+        bump_version_soon(db, STOCK)
+
+        created = [sale_doc for sale_doc, _, _ in accepted]
+        movements = []
+        for created_sale in created:
+            for item in created_sale["items"]:
+                add_movement(movements, products[item["product_id"]], -item["quantity"], "sale", created_sale["_id"])
+        await record_movements(db, movements)
+        await record_purchases(db, created)
+
+        session = write_options().get("session")
+        causal_times = session and (session.cluster_time, session.operation_time)
+        for (_, future, _), created_sale in zip(accepted, created):
+            if not future.done():
+                future.set_result((created_sale, causal_times))
+
+    async def _restore_stock(self, db, quantities: dict):
+        if quantities:
+            await db["products"].bulk_write([
+                UpdateOne({"_id": ObjectId(pid)}, {"$inc": {"stock_quantity": qty}})
+                for pid, qty in quantities.items()
+            ], ordered=False, **write_options())
+            bump_version_soon(db, STOCK)
+
+def _read_limit(budgets: list) -> dict:
+    """max_time_ms for the batch's product read: the longest budget left
+    among its requests, or none if any of them has no deadline"""
+    if not budgets or None in budgets:
+        return {}
+    return {"max_time_ms": max(budgets)}
+
+def _merge_quantities(accepted):
+    """Total quantity per product across accepted requests"""
+    merged = {}
+    for _, _, needed in accepted:
+        for pid, qty in needed.items():
+            merged[pid] = merged.get(pid, 0) + qty
+    return merged
+
+sale_batcher = SaleBatcher()
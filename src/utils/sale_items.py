@@ -0,0 +1,78 @@
+from bson import ObjectId
+from pymongo import UpdateMany
+from src.utils.sales_store import sales_collection
+from src.utils.sales_archive import ARCHIVE
+from src.utils.request_context import find_options
+
+# Sale line items carry a snapshot of the product as it was sold:
+# {"product_id", "quantity", "price_at_sale", "product_name", "category"}
+# so receipts and sale lists render without looking products up. Sales
+# written before snapshots existed are filled in by backfill_item_snapshots
+# (see backfill_sale_items.py).
+
+def snapshot_item(item: dict, product: dict) -> dict:
+    """Line item with the product's current name and category; overrides client values"""
+    return {**item, "product_name": product["name"], "category": product.get("category")}
+
+async def fill_missing_snapshots(db, sales: list) -> list:
+    """Complete items that predate snapshots with one products lookup.
+
+    Only needed until the backfill has run; afterwards it finds nothing to do.
+    Products deleted since the sale stay without a name.
+    """
+    missing = {
+        item["product_id"]
+        for sale in sales for item in sale["items"]
+        if item.get("product_name") is None and ObjectId.is_valid(item["product_id"])
+    }
+    if missing:
+        products = {
+            str(p["_id"]): p
+            for p in await db["products"].find(
+                {"_id": {"$in": [ObjectId(pid) for pid in missing]}}, {"name": 1, "category": 1}, **find_options()
+            ).to_list(None)
+        }
+        for sale in sales:
+            sale["items"] = [
+                snapshot_item(item, products[item["product_id"]])
+                if item.get("product_name") is None and item["product_id"] in products else item
+                for item in sale["items"]
+            ]
+    for sale in sales:
+        for item in sale["items"]:
+            item["line_total"] = item["quantity"] * item["price_at_sale"]
+    return sales
+
+async def backfill_item_snapshots(db, batch_size: int = 500) -> dict:
+    """Write snapshots into hot and archived sales whose items lack them.
+
+    One UpdateMany per product, matching only its unsnapshotted items
+    through an array filter, so each product is written once however many
+    sales it appears in. Returns the number of document updates per collection
+    (a sale holding several unsnapshotted products counts once per product).
+    """
+    # Matches a missing or null name
+    unsnapshotted = {"product_name": None}
+    modified = {}
+    for collection in (sales_collection(db), db[ARCHIVE]):
+        product_ids = await collection.distinct("items.product_id", {"items": {"$elemMatch": unsnapshotted}})
+        product_ids = [pid for pid in product_ids if ObjectId.is_valid(pid)]
+        count = 0
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            products = await db["products"].find(
+                {"_id": {"$in": [ObjectId(pid) for pid in chunk]}}, {"name": 1, "category": 1}
+            ).to_list(None)
+            operations = [
+                UpdateMany(
+                    {"items": {"$elemMatch": {"product_id": str(p["_id"]), **unsnapshotted}}},
+                    {"$set": {"items.$[item].product_name": p["name"], "items.$[item].category": p.get("category")}},
+                    array_filters=[{"item.product_id": str(p["_id"]), "item.product_name": None}]
+                )
+                for p in products
+            ]
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                count += result.modified_count
+        modified[collection.name] = count
+    return modified
@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from src.config.settings import settings
+from src.utils.sales_store import sales_collection, sales_query, sales_field, from_sale_document
+from src.utils.request_context import find_options, command_options
+
+# Completed sales are moved out of the hot collection once they are older
+# than SALES_ARCHIVE_HORIZON_DAYS (cancelled ones after
+# SALES_ARCHIVE_CANCELLED_AFTER_DAYS). The state document tracks two
+# boundaries that readers use to federate queries:
+#   archived_before   - every sale older than this has been copied to
+#                       sales_archive (its hot copy may not be deleted yet)
+#   rolled_up_before  - day boundary; every day before it has a complete
+#                       per-employee row in sales_rollups
+ARCHIVE = "sales_archive"
+ROLLUPS = "sales_rollups"
+STATE_ID = "sales_archive"
+
+def to_naive_utc(dt: datetime) -> datetime:
+    """Sales store naive UTC datetimes; normalize aware query bounds to match"""
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def _day_floor(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _day_ceil(dt: datetime) -> datetime:
+    floor = _day_floor(dt)
+    return floor if floor == dt else floor + timedelta(days=1)
+
+async def get_archive_state(db):
+    return await db["archive_state"].find_one({"_id": STATE_ID}, **find_options())
+
+PAGE_ORDER = [("created_at", 1), ("_id", 1)]
+
+def _page(query: dict, after: dict) -> dict:
+    """`query` restricted to sales past `after` in (created_at, _id) order"""
+    if after is None:
+        return query
+    return {"$and": [query, {"$or": [
+        {"created_at": {"$gt": after["created_at"]}},
+        {"created_at": after["created_at"], "_id": {"$gt": after["_id"]}}
+    ]}]}
+
+async def _copy(db, sales: list):
+    # Replays after an interrupted run may find some of these already archived
+    await db[ARCHIVE].delete_many({"_id": {"$in": [s["_id"] for s in sales]}})
+    await db[ARCHIVE].insert_many(sales, ordered=False)
+
+async def _delete_archived(db, hot, sales: list):
+    """Delete the hot copies of archived sales whose status still matches the archive"""
+    created = {"$gte": sales[0]["created_at"], "$lte": sales[-1]["created_at"]}
+    archived = {
+        sale["_id"]: sale["status"]
+        async for sale in db[ARCHIVE].find({"_id": {"$in": [s["_id"] for s in sales]}}, {"status": 1})
+    }
+    changed = [s["_id"] for s in sales if s["_id"] in archived and archived[s["_id"]] != s["status"]]
+    if changed:
+        # Cancelled after being copied: copy the current version again
+        fresh = [
+            from_sale_document(s)
+            for s in await hot.find(sales_query({"_id": {"$in": changed}, "created_at": created})).to_list(None)
+        ]
+        if fresh:
+            await _copy(db, fresh)
+        archived.update({s["_id"]: s["status"] for s in fresh})
+    # The status condition leaves any sale changed since in the hot
+    # collection; the next run copies it again
+    for status in set(archived.values()):
+        await hot.delete_many(sales_query({
+            "_id": {"$in": [sale_id for sale_id, archived_status in archived.items() if archived_status == status]},
+            "status": status,
+            "created_at": created
+        }))
+
+async def archive_sales(db, now: datetime = None):
+    """Move old sales to the archive in batches and refresh daily rollups"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.SALES_ARCHIVE_HORIZON_DAYS)
+    cancelled_cutoff = now - timedelta(days=settings.SALES_ARCHIVE_CANCELLED_AFTER_DAYS)
+
+    hot = sales_collection(db)
+    query = sales_query({"$or": [
+        {"created_at": {"$lt": cutoff}},
+        {"status": "cancelled", "created_at": {"$lt": cancelled_cutoff}}
+    ]})
+
+    # Reports count the hot collection from archived_before on and the
+    # archive below it. Copying everything before publishing the boundary,
+    # and deleting only after, keeps every sale counted exactly once while
+    # the move is in progress.
+    moved = 0
+    oldest = None
+    after = None
+    while True:
+        batch = await hot.find(_page(query, after)).sort(PAGE_ORDER).to_list(settings.SALES_ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        sales = [from_sale_document(s) for s in batch]
+        await _copy(db, sales)
+        after = sales[-1]
+        oldest = oldest or sales[0]["created_at"]
+        moved += len(sales)
+
+    previous = await db["archive_state"].find_one_and_update(
+        {"_id": STATE_ID},
+        {"$max": {"archived_before": cutoff}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    ) or {}
+
+    # Walk every due hot sale again; ones that arrived after the copy are
+    # passed over and stay for the next run
+    after = None
+    while True:
+        batch = await hot.find(
+            _page(query, after), {"_id": 1, "created_at": 1, sales_field("status"): 1}
+        ).sort(PAGE_ORDER).to_list(settings.SALES_ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        sales = [from_sale_document(s) for s in batch]
+        await _delete_archived(db, hot, sales)
+        after = sales[-1]
+
+    # Rebuild rollups for every day that is now fully archived
+    rolled_up_before = _day_floor(max(cutoff, previous.get("archived_before", cutoff)))
+    rebuild_from = previous.get("rolled_up_before")
+    if oldest and (rebuild_from is None or oldest < rebuild_from):
+        rebuild_from = _day_floor(oldest)
+    if rebuild_from is not None and rebuild_from < rolled_up_before:
+        await rebuild_rollups(db, rebuild_from, rolled_up_before)
+    await db["archive_state"].update_one(
+        {"_id": STATE_ID},
+        {"$max": {"rolled_up_before": rolled_up_before}, "$set": {"last_run_at": now}}
+    )
+    return {"moved": moved, "archived_before": cutoff, "rolled_up_before": rolled_up_before}
+
+async def rebuild_rollups(db, start: datetime, end: datetime):
+    """Recompute daily per-store, per-employee totals of completed archived sales in [start, end)"""
+    pipeline = [
+        {"$match": {"status": "completed", "created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateTrunc": {"date": "$created_at", "unit": "day"}},
+                "store_id": "$store_id",
+                "employee_id": "$employee_id"
+            },
+            "total_sales": {"$sum": "$total_amount"},
+            "count": {"$sum": 1}
+        }},
+        {"$set": {"day": "$_id.day", "store_id": "$_id.store_id", "employee_id": "$_id.employee_id"}},
+        {"$merge": {"into": ROLLUPS, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    await db[ARCHIVE].aggregate(pipeline).to_list(None)
+
+async def archived_sales_totals(db, match_query: dict, start: datetime, end: datetime, state: dict):
+    """Completed-sale totals for the archived part of [start, end].
+
+    Whole days before rolled_up_before are read from the rollups; partial
+    days at the edges and the not-yet-rolled-up tail come from the archive.
+    `match_query` holds the non-date filters (status, store_id, employee_id).
+    """
+    archived_before = state["archived_before"]
+    rolled_up_before = state.get("rolled_up_before")
+    total, count = 0, 0
+
+    # Whole days covered by rollups
+    use_rollups = False
+    if rolled_up_before is not None:
+        first_day = _day_ceil(start) if start else None
+        last_day = _day_floor(min(end, rolled_up_before)) if end else rolled_up_before
+        use_rollups = first_day is None or first_day < last_day
+    if use_rollups:
+        rollup_match = {"day": {"$lt": last_day}}
+        if first_day:
+            rollup_match["day"]["$gte"] = first_day
+        for field in ("store_id", "employee_id"):
+            if field in match_query:
+                rollup_match[field] = match_query[field]
+        result = await db[ROLLUPS].aggregate([
+            {"$match": rollup_match},
+            {"$group": {"_id": None, "total_sales": {"$sum": "$total_sales"}, "count": {"$sum": "$count"}}}
+        ], **command_options()).to_list(1)
+        if result:
+            total, count = result[0]["total_sales"], result[0]["count"]
+
+    # Everything else in range that lives in the archive
+    upper = {"$lte": end} if end and end < archived_before else {"$lt": archived_before}
+    if use_rollups:
+        ranges = [{"created_at": {"$gte": last_day, **upper}}]
+        if first_day:
+            ranges.append({"created_at": {"$gte": start, "$lt": first_day}})
+    elif start:
+        ranges = [{"created_at": {"$gte": start, **upper}}]
+    else:
+        ranges = [{"created_at": upper}]
+    result = await db[ARCHIVE].aggregate([
+        {"$match": {**match_query, "$or": ranges}},
+        {"$group": {"_id": None, "total_sales": {"$sum": "$total_amount"}, "count": {"$sum": 1}}}
+    ], **command_options()).to_list(1)
+    if result:
+        total += result[0]["total_sales"]
+        count += result[0]["count"]
+    return total, count
@@ -0,0 +1,283 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+from src.config.settings import settings
+from src.utils.sales_store import sales_collection, sales_query, from_sale_document
+from src.utils.sales_archive import ARCHIVE
+
+# Columnar, memory-mapped copy of the sales history for offline reports.
+# Line items and sales are stored as flat arrays, one raw file per column:
+#   items:  sale (row in the sale columns), product (code into the product
+#           dictionary), quantity, price (price_at_sale)
+#   sales:  sale_id (ObjectId bytes), sale_ts (epoch seconds),
+#           sale_status (1 completed, 0 cancelled)
+# manifest.json holds the row counts, the product dictionary and the
+# created_at/cancelled_at watermarks. Rows past the manifest counts are
+# leftovers from an interrupted refresh and are truncated on next append.
+ITEM_COLUMNS = {"sale": np.int64, "product": np.int32, "quantity": np.int32, "price": np.float64}
+SALE_COLUMNS = {"sale_id": np.dtype("S12"), "sale_ts": np.int64, "sale_status": np.int8}
+CHUNK_ITEMS = 500_000
+EPOCH = datetime(1970, 1, 1)
+
+class SalesSnapshot:
+    def __init__(self, path: str = None):
+        self.path = path or settings.ANALYTICS_SNAPSHOT_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.path, "manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 1, "items": 0, "sales": 0, "products": [], "watermark": None, "cancel_watermark": None}
+
+    def save_manifest(self):
+        target = os.path.join(self.path, "manifest.json")
+        with open(target + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(target + ".tmp", target)
+
+    def column(self, name: str, writable: bool = False):
+        dtype = ITEM_COLUMNS.get(name, SALE_COLUMNS.get(name))
+        rows = self.manifest["items"] if name in ITEM_COLUMNS else self.manifest["sales"]
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode="r+" if writable else "r", shape=(rows,))
+
+    def append(self, columns: dict, committed_items: int, committed_sales: int):
+        """Append arrays after the given committed row counts"""
+        for name, values in columns.items():
+            dtype = np.dtype(ITEM_COLUMNS.get(name, SALE_COLUMNS.get(name)))
+            rows = committed_items if name in ITEM_COLUMNS else committed_sales
+            path = os.path.join(self.path, f"{name}.bin")
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.truncate(rows * dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+@contextmanager
+def snapshot_lock(path: str):
+    """Serialize refreshes across worker processes sharing the directory.
+
+    Yields False instead of waiting when another process holds the lock.
+    """
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+class _ChunkBuilder:
+    def __init__(self, codes: dict, products: list, first_sale: int):
+        self.codes = codes
+        self.products = products
+        self.next_sale = first_sale
+        self.reset()
+
+    def reset(self):
+        self.items = {name: [] for name in ITEM_COLUMNS}
+        self.sales = {name: [] for name in SALE_COLUMNS}
+
+    def add(self, sale: dict):
+        row = self.next_sale
+        self.next_sale += 1
+        self.sales["sale_id"].append(sale["_id"].binary)
+        self.sales["sale_ts"].append(int((sale["created_at"] - EPOCH).total_seconds()))
+        self.sales["sale_status"].append(1 if sale["status"] == "completed" else 0)
+        for item in sale["items"]:
+            code = self.codes.get(item["product_id"])
+            if code is None:
+                code = self.codes[item["product_id"]] = len(self.products)
+                self.products.append(item["product_id"])
+            self.items["sale"].append(row)
+            self.items["product"].append(code)
+            self.items["quantity"].append(item["quantity"])
+            self.items["price"].append(item["price_at_sale"])
+
+    def columns(self):
+        return {**self.items, **self.sales}
+
+async def refresh_snapshot(db, path: str = None):
+    """Append sales created since the watermark and apply new cancellations"""
+    path = path or settings.ANALYTICS_SNAPSHOT_DIR
+    with snapshot_lock(path) as locked:
+        if not locked:
+            return {"skipped": "refresh already running"}
+        snapshot = SalesSnapshot(path)
+        manifest = snapshot.manifest
+        now = datetime.utcnow()
+        # Stay a little behind real time so sales stamped by slightly slower
+        # workers still land after the watermark
+        upper = now - timedelta(seconds=settings.ANALYTICS_SNAPSHOT_LAG_SECONDS)
+        watermark = datetime.fromisoformat(manifest["watermark"]) if manifest["watermark"] else None
+        window = {"created_at": {"$lte": upper}}
+        if watermark:
+            window["created_at"]["$gt"] = watermark
+
+        products = list(manifest["products"])
+        builder = _ChunkBuilder({pid: i for i, pid in enumerate(products)}, products, manifest["sales"])
+        committed_items, committed_sales = manifest["items"], manifest["sales"]
+
+        # The archive job may move a sale between the two passes; remember
+        # hot sales old enough to be archival candidates to skip duplicates
+        archive_candidate_before = now - timedelta(days=min(
+            settings.SALES_ARCHIVE_HORIZON_DAYS, settings.SALES_ARCHIVE_CANCELLED_AFTER_DAYS
+        ))
+        seen = set()
+        projection = {"items": 1, "created_at": 1, "status": 1, "meta": 1}
+        sources = [(sales_collection(db), sales_query(window)), (db[ARCHIVE], window)]
+        for collection, query in sources:
+            async for document in collection.find(query, projection).sort("created_at", 1).batch_size(5000):
+                sale = from_sale_document(document)
+                if sale["_id"] in seen:
+                    continue
+                if collection is sources[0][0] and sale["created_at"] < archive_candidate_before:
+                    seen.add(sale["_id"])
+                builder.add(sale)
+                if len(builder.items["sale"]) >= CHUNK_ITEMS:
+                    snapshot.append(builder.columns(), committed_items, committed_sales)
+                    committed_items += len(builder.items["sale"])
+                    committed_sales += len(builder.sales["sale_id"])
+                    builder.reset()
+        snapshot.append(builder.columns(), committed_items, committed_sales)
+        committed_items += len(builder.items["sale"])
+        committed_sales += len(builder.sales["sale_id"])
+
+        manifest.update({
+            "items": committed_items,
+            "sales": committed_sales,
+            "products": products,
+            "watermark": upper.isoformat()
+        })
+
+        # Flip the status of already-ingested sales that were cancelled since
+        cancel_window = {"status": "cancelled", "cancelled_at": {"$lte": now}}
+        if manifest["cancel_watermark"]:
+            cancel_window["cancelled_at"]["$gt"] = datetime.fromisoformat(manifest["cancel_watermark"])
+        cancelled = []
+        for collection, query in [(sales_collection(db), sales_query(cancel_window)), (db[ARCHIVE], cancel_window)]:
+            cancelled += [s["_id"].binary async for s in collection.find(query, {"_id": 1})]
+        if cancelled and committed_sales:
+            status = snapshot.column("sale_status", writable=True)
+            status[np.isin(snapshot.column("sale_id"), np.array(cancelled, dtype="S12"))] = 0
+            status.flush()
+        manifest["cancel_watermark"] = now.isoformat()
+
+        snapshot.save_manifest()
+        return {"items": committed_items, "sales": committed_sales, "watermark": manifest["watermark"]}
+
+# ---------------------------------------------------------------------------
+# Report engine: every report is a handful of vectorized passes over the
+# memory-mapped columns, restricted to completed sales in [start, end).
+
+def _to_epoch(dt: datetime):
+    return None if dt is None else int((dt - EPOCH).total_seconds())
+
+def completed_sale_mask(snapshot: SalesSnapshot, start: datetime = None, end: datetime = None):
+    sale_ts = snapshot.column("sale_ts")
+    mask = snapshot.column("sale_status") == 1
+    if start:
+        mask &= sale_ts >= _to_epoch(start)
+    if end:
+        mask &= sale_ts < _to_epoch(end)
+    return mask
+
+def moving_average_revenue(snapshot: SalesSnapshot, window: int = 7, start: datetime = None, end: datetime = None):
+    """Daily revenue with a trailing moving average over `window` days"""
+    sale = snapshot.column("sale")
+    sale_mask = completed_sale_mask(snapshot, start, end)
+    item_mask = sale_mask[sale]
+    if not item_mask.any():
+        return []
+    item_day = snapshot.column("sale_ts")[sale[item_mask]] // 86400
+    first_day = item_day.min()
+    revenue = np.bincount(
+        item_day - first_day,
+        weights=snapshot.column("quantity")[item_mask] * snapshot.column("price")[item_mask]
+    )
+    cumulative = np.concatenate(([0.0], np.cumsum(revenue)))
+    days = np.arange(len(revenue))
+    lower = np.maximum(days + 1 - window, 0)
+    average = (cumulative[days + 1] - cumulative[lower]) / (days + 1 - lower)
+    return [
+        {
+            "date": (EPOCH + timedelta(days=int(first_day + d))).strftime("%Y-%m-%d"),
+            "revenue": float(revenue[d]),
+            "moving_average": float(average[d])
+        }
+        for d in days
+    ]
+
+def hour_of_week_heatmap(snapshot: SalesSnapshot, start: datetime = None, end: datetime = None):
+    """7x24 grid (Monday first, UTC) of completed sale counts and revenue"""
+    sale_mask = completed_sale_mask(snapshot, start, end)
+    sale_ts = snapshot.column("sale_ts")
+    # 1970-01-01 was a Thursday, so shift by 3 days to start weeks on Monday
+    hour_of_week = ((sale_ts // 3600) + 72) % 168
+    counts = np.bincount(hour_of_week[sale_mask], minlength=168)
+
+    sale = snapshot.column("sale")
+    item_mask = sale_mask[sale]
+    revenue = np.bincount(
+        hour_of_week[sale[item_mask]],
+        weights=snapshot.column("quantity")[item_mask] * snapshot.column("price")[item_mask],
+        minlength=168
+    )
+    return {"sales": counts.reshape(7, 24).tolist(), "revenue": revenue.reshape(7, 24).round(2).tolist()}
+
+def basket_size_distribution(snapshot: SalesSnapshot, max_size: int = 50, start: datetime = None, end: datetime = None):
+    """Number of completed sales by units per basket (last bucket is `max_size`+)"""
+    sale_mask = completed_sale_mask(snapshot, start, end)
+    units = np.bincount(snapshot.column("sale"), weights=snapshot.column("quantity"), minlength=len(sale_mask))
+    sizes = np.minimum(units[sale_mask].astype(np.int64), max_size)
+    distribution = np.bincount(sizes, minlength=max_size + 1)
+    return [{"units": size, "sales": int(count)} for size, count in enumerate(distribution) if count]
+
+def co_purchase_counts(snapshot: SalesSnapshot, top_products: int = 50, limit: int = 20,
+                       start: datetime = None, end: datetime = None, chunk_sales: int = 200_000):
+    """Most frequent product pairs bought together, among the top-selling products"""
+    sale = snapshot.column("sale")
+    product = snapshot.column("product")
+    sale_mask = completed_sale_mask(snapshot, start, end)
+    item_mask = sale_mask[sale]
+    # Sized to the whole dictionary: products past the window's highest
+    # code still index `rank` below
+    totals = np.bincount(
+        product[item_mask], weights=snapshot.column("quantity")[item_mask], minlength=len(snapshot.manifest["products"])
+    )
+    top = np.argsort(totals)[::-1][:top_products]
+    top = top[totals[top] > 0]
+    rank = np.full(len(totals), -1, dtype=np.int64)
+    rank[top] = np.arange(len(top))
+
+    # Build a sales x products incidence matrix per chunk of sales and
+    # accumulate B^T B; `sale` is sorted, so chunks are contiguous slices.
+    # float32 keeps the product on BLAS and is exact for per-chunk counts.
+    pairs = np.zeros((len(top), len(top)), dtype=np.int64)
+    for chunk_start in range(0, len(sale_mask), chunk_sales):
+        lo, hi = np.searchsorted(sale, [chunk_start, chunk_start + chunk_sales])
+        rows = sale[lo:hi] - chunk_start
+        cols = rank[product[lo:hi]]
+        keep = item_mask[lo:hi] & (cols >= 0)
+        incidence = np.zeros((chunk_sales, len(top)), dtype=np.float32)
+        incidence[rows[keep], cols[keep]] = 1
+        pairs += np.rint(incidence.T @ incidence).astype(np.int64)
+
+    upper = np.triu(pairs, k=1)
+    flat = np.argsort(upper, axis=None)[::-1][:limit]
+    first, second = np.unravel_index(flat, upper.shape)
+    products = snapshot.manifest["products"]
+    return [
+        {"product_a": products[top[a]], "product_b": products[top[b]], "count": int(upper[a, b])}
+        for a, b in zip(first, second) if upper[a, b] > 0
+    ]
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from src.config.settings import settings
+
+# Sales can live in a plain collection ("standard") or in a MongoDB
+# time-series collection ("timeseries") keyed on created_at, where the
+# low-cardinality fields are grouped under a "meta" subdocument so buckets
+# are per store/employee/status. Readers and writers go through these
+# helpers so the rest of the code only ever sees the logical (flat) sale
+# shape.
+STANDARD = "standard"
+TIMESERIES = "timeseries"
+META_FIELDS = ("store_id", "employee_id", "status")
+TIMESERIES_OPTIONS = {"timeField": "created_at", "metaField": "meta", "granularity": "hours"}
+# How far created_at may sit from a sale's ObjectId timestamp for id
+# lookups to find it by the timestamp alone
+ID_WINDOW = timedelta(minutes=5)
+# created_at of time-series sales outside that window (migrated or
+# backdated ones): {"_id": sale_id, "created_at": datetime}
+SALE_TIMES = "sale_times"
+
+def is_timeseries() -> bool:
+    return settings.SALES_STORAGE_MODE == TIMESERIES
+
+def bson_now() -> datetime:
+    """Now, at the millisecond precision BSON stores, so a document handed
+    back to the caller matches the stored one"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def sales_collection(db):
+    if is_timeseries():
+        return db[settings.SALES_TIMESERIES_COLLECTION]
+    return db["sales"]
+
+def sales_field(name: str) -> str:
+    """Storage path of a logical sale field"""
+    if is_timeseries() and name in META_FIELDS:
+        return f"meta.{name}"
+    return name
+
+def sales_query(query: dict) -> dict:
+    """Translate a filter on logical sale fields into the storage layout"""
+    if not is_timeseries():
+        return query
+    translated = {}
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            translated[key] = [sales_query(clause) for clause in value]
+        else:
+            translated[sales_field(key)] = value
+    return translated
+
+def sales_update(update: dict) -> dict:
+    """Translate an update document ($set etc.) into the storage layout"""
+    if not is_timeseries():
+        return update
+    return {op: sales_query(fields) for op, fields in update.items()}
+
+def off_window(sale: dict) -> bool:
+    """Whether id lookups need the sale's created_at recorded in SALE_TIMES"""
+    return abs(sale["created_at"] - sale["_id"].generation_time.replace(tzinfo=None)) > ID_WINDOW
+
+async def sale_times(db, sale_ids: list) -> list:
+    """Recorded created_at of those sales that sit outside their id window"""
+    if not is_timeseries() or not sale_ids:
+        return []
+    return [
+        sale["created_at"]
+        async for sale in db[SALE_TIMES].find({"_id": {"$in": sale_ids}}, {"created_at": 1})
+    ]
+
+def sale_id_query(sale_id: ObjectId, created: list = ()) -> dict:
+    """Filter for a single sale by id, bounded like sale_ids_query"""
+    return sale_ids_query([sale_id], created) if is_timeseries() else {"_id": sale_id}
+
+def sale_ids_query(sale_ids: list, created: list = (), timeseries: bool = None) -> dict:
+    """Filter for a set of sales by id.
+
+    Time-series collections have no _id index, so the created_at window
+    implied by the ObjectId timestamps is added to let the server prune
+    buckets instead of scanning the whole collection. `created` widens it
+    to sales known to lie outside (sale_times, or documents already read).
+    """
+    if timeseries is None:
+        timeseries = is_timeseries()
+    if not timeseries or not sale_ids:
+        return {"_id": {"$in": sale_ids}}
+    generated = [sale_id.generation_time.replace(tzinfo=None) for sale_id in sale_ids]
+    return {
+        "_id": {"$in": sale_ids},
+        "created_at": {
+            "$gte": min([min(generated) - ID_WINDOW, *created]),
+            "$lte": max([max(generated) + ID_WINDOW, *created])
+        }
+    }
+
+def to_sale_document(sale: dict, timeseries: bool = None) -> dict:
+    """Logical sale -> stored document (in the configured layout unless given)"""
+    if timeseries is None:
+        timeseries = is_timeseries()
+    if not timeseries:
+        return sale
+    document = {k: v for k, v in sale.items() if k not in META_FIELDS}
+    document["meta"] = {field: sale.get(field) for field in META_FIELDS}
+    return document
+
+def from_sale_document(document: dict) -> dict:
+    """Stored document -> logical sale (accepts either layout)"""
+    if "meta" not in document:
+        return document
+    sale = {k: v for k, v in document.items() if k != "meta"}
+    sale.update(document["meta"])
+    return sale
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+LEASES = "scheduler_leases"
+LEASE_ID = "scheduler"
+
+class Job:
+    def __init__(self, name, func, interval_seconds, jitter, leader_only, run_on_start):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.run_on_start = run_on_start
+        self.metrics = {
+            "runs": 0,
+            "failures": 0,
+            "skipped_not_leader": 0,
+            "last_started_at": None,
+            "last_duration_ms": None,
+            "avg_duration_ms": None,
+            "max_duration_ms": None,
+            "last_error": None
+        }
+
+class Scheduler:
+    """In-process asyncio scheduler for periodic background jobs.
+
+    Every worker runs the scheduler, but jobs registered as leader_only only
+    execute on the worker currently holding the lease document in Mongo, so
+    a deployment with N workers still runs each job once per interval.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._tasks = []
+
+    def register(self, name: str, func, interval_seconds: float = None, jitter: float = 0.1,
+                 leader_only: bool = True, run_on_start: bool = False):
+        """Register `func(db)`; interval_seconds=None makes it a one-shot startup job"""
+        self.jobs[name] = Job(name, func, interval_seconds, jitter, leader_only, run_on_start)
+
+    async def start(self, db):
+        self._tasks.append(asyncio.create_task(self._lease_loop(db)))
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job, db)))
+        logger.info("Scheduler started as %s with %d jobs", self.instance_id, len(self.jobs))
+
+    async def stop(self, db=None):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if db is not None and self.is_leader:
+            # Hand the lease over right away instead of waiting for it to expire
+            await db[LEASES].update_one(
+                {"_id": LEASE_ID, "holder": self.instance_id},
+                {"$set": {"expires_at": datetime.utcnow()}}
+            )
+        self.is_leader = False
+
+    async def _acquire_lease(self, db):
+        now = datetime.utcnow()
+        try:
+            await db[LEASES].find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"holder": self.instance_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "holder": self.instance_id,
+                    "expires_at": now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS)
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return True
+        except DuplicateKeyError:
+            # Someone else holds a live lease, so the upsert collided with it
+            return False
+
+    async def _lease_loop(self, db):
+        while True:
+            try:
+                was_leader = self.is_leader
+                self.is_leader = await self._acquire_lease(db)
+                if self.is_leader != was_leader:
+                    logger.info("Scheduler %s leadership: %s", self.instance_id, self.is_leader)
+            except PyMongoError:
+                logger.exception("Scheduler lease renewal failed")
+                self.is_leader = False
+            await asyncio.sleep(settings.SCHEDULER_LEASE_SECONDS / 3)
+
+    def _delay(self, job: Job):
+        spread = job.interval_seconds * job.jitter
+        return max(job.interval_seconds + random.uniform(-spread, spread), 0)
+
+    async def _job_loop(self, job: Job, db):
+        if job.run_on_start:
+            await self._run(job, db)
+        elif job.interval_seconds:
+            # Random initial offset so workers started together don't align
+            await asyncio.sleep(random.uniform(0, job.interval_seconds * job.jitter))
+        while job.interval_seconds:
+            await asyncio.sleep(self._delay(job))
+            await self._run(job, db)
+
+    async def _run(self, job: Job, db):
+        if job.leader_only and not self.is_leader:
+            job.metrics["skipped_not_leader"] += 1
+            return
+        metrics = job.metrics
+        metrics["last_started_at"] = datetime.utcnow()
+        began = time.perf_counter()
+        try:
+            await job.func(db)
+            metrics["last_error"] = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            metrics["failures"] += 1
+            metrics["last_error"] = repr(exc)
+            logger.exception("Scheduled job %s failed", job.name)
+        duration = (time.perf_counter() - began) * 1000
+        metrics["runs"] += 1
+        metrics["last_duration_ms"] = round(duration, 2)
+        previous = metrics["avg_duration_ms"] or 0
+        metrics["avg_duration_ms"] = round(previous + (duration - previous) / metrics["runs"], 2)
+        metrics["max_duration_ms"] = round(max(metrics["max_duration_ms"] or 0, duration), 2)
+
+    def status(self):
+        return {
+            "instance_id": self.instance_id,
+            "is_leader": self.is_leader,
+            "jobs": {
+                name: {
+                    "interval_seconds": job.interval_seconds,
+                    "leader_only": job.leader_only,
+                    **job.metrics
+                }
+                for name, job in self.jobs.items()
+            }
+        }
+
+scheduler = Scheduler()
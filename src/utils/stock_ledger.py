@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from src.config.settings import settings
+from src.utils.stores import store_filter
+from src.utils.request_context import find_options, command_options
+
+# Append-only record of every stock change:
+# {"product_id": ObjectId, "store_id", "delta": int, "price": float, "reason", "ref", "at"}
+# reason is one of MOVEMENT_REASONS; ref is the sale id for sale movements.
+# Price changes are recorded as zero-delta "repriced" movements so
+# valuations use the price that applied at the time.
+STOCK_MOVEMENTS = "stock_movements"
+# Periodic per-product state derived from the ledger, all rows of one run
+# sharing the same "at": {"product_id", "store_id", "at", "stock", "price"}.
+# Products at zero stock are left out of a run.
+STOCK_SNAPSHOTS = "stock_snapshots"
+MOVEMENT_REASONS = ("received", "sale", "sale_cancelled", "adjustment", "repriced", "product_deleted", "reconciliation")
+
+def add_movement(movements: list, product: dict, delta: int, reason: str, ref=None):
+    """Record a stock change of `delta` units of `product` (needs _id, price, store_id)"""
+    movements.append({
+        "product_id": product["_id"],
+        "store_id": product.get("store_id"),
+        "delta": delta,
+        "price": product["price"],
+        "reason": reason,
+        "ref": ref,
+        "at": datetime.utcnow()
+    })
+
+async def record_movements(db, movements: list):
+    """Append accumulated movements with a single insert"""
+    if movements:
+        await db[STOCK_MOVEMENTS].insert_many(movements, ordered=False)
+
+async def _latest_snapshot_time(db, at: datetime) -> Optional[datetime]:
+    latest = await db[STOCK_SNAPSHOTS].find_one({"at": {"$lte": at}}, {"at": 1}, sort=[("at", -1)], **find_options())
+    return latest["at"] if latest else None
+
+async def _state_at(db, at: datetime, match: dict) -> dict:
+    """product_id -> {"store_id", "stock", "price"}: last snapshot run plus the movements since"""
+    since = await _latest_snapshot_time(db, at)
+    state = {}
+    if since is not None:
+        async for row in db[STOCK_SNAPSHOTS].find({"at": since, "product_id": {"$ne": None}, **match}, **find_options()):
+            state[row["product_id"]] = {"store_id": row.get("store_id"), "stock": row["stock"], "price": row["price"]}
+
+    window = {"$lte": at} if since is None else {"$gt": since, "$lte": at}
+    tail = await db[STOCK_MOVEMENTS].aggregate([
+        {"$match": {**match, "at": window}},
+        {"$sort": {"at": 1}},
+        {"$group": {
+            "_id": "$product_id",
+            "store_id": {"$last": "$store_id"},
+            "delta": {"$sum": "$delta"},
+            "price": {"$last": "$price"}
+        }}
+    ], **command_options()).to_list(None)
+    for row in tail:
+        entry = state.setdefault(row["_id"], {"store_id": row["store_id"], "stock": 0, "price": row["price"]})
+        entry["stock"] += row["delta"]
+        entry["price"] = row["price"]
+    return state
+
+async def get_stock_at(db, product_id: ObjectId, at: datetime, store_id: str = None) -> dict:
+    """Stock and value of one product at a point in time"""
+    entry = (await _state_at(db, at, {**store_filter(store_id), "product_id": product_id})).get(product_id)
+    stock = entry["stock"] if entry else 0
+    price = entry["price"] if entry else None
+    return {"product_id": str(product_id), "at": at, "stock": stock, "value": stock * price if price else 0.0}
+
+async def get_valuation_at(db, at: datetime, store_id: str = None) -> dict:
+    """Units and value of all inventory (optionally one store) at a point in time"""
+    state = await _state_at(db, at, store_filter(store_id))
+    held = [entry for entry in state.values() if entry["stock"]]
+    return {
+        "at": at,
+        "products": len(held),
+        "total_stock": sum(entry["stock"] for entry in held),
+        "total_value": sum(entry["stock"] * entry["price"] for entry in held)
+    }
+
+async def get_movements(db, product_id: ObjectId, limit: int = 100, before: datetime = None, store_id: str = None):
+    """Movements of one product, newest first"""
+    query = {**store_filter(store_id), "product_id": product_id}
+    if before:
+        query["at"] = {"$lt": before}
+    movements = await db[STOCK_MOVEMENTS].find(query, {"product_id": 0}, **find_options()).sort("at", -1).limit(limit).to_list(limit)
+    for movement in movements:
+        movement["_id"] = str(movement["_id"])
+    return movements
+
+async def take_stock_snapshot(db, now: datetime = None) -> dict:
+    """Fold the movements since the last run into a new snapshot run.
+
+    The run is taken LEDGER_SNAPSHOT_LAG_SECONDS in the past so movements
+    still being written by in-flight requests land after it, not inside a
+    window that has already been folded.
+    """
+    at = (now or datetime.utcnow()) - timedelta(seconds=settings.LEDGER_SNAPSHOT_LAG_SECONDS)
+    latest = await _latest_snapshot_time(db, datetime.max)
+    if latest is not None and latest >= at:
+        return {"at": latest, "products": 0}
+    state = await _state_at(db, at, {})
+    rows = [
+        {"product_id": product_id, "store_id": entry["store_id"], "at": at, "stock": entry["stock"], "price": entry["price"]}
+        for product_id, entry in state.items() if entry["stock"]
+    ]
+    if rows:
+        await db[STOCK_SNAPSHOTS].insert_many(rows, ordered=False)
+    else:
+        # Marks the run so the next one doesn't re-read the whole ledger
+        await db[STOCK_SNAPSHOTS].insert_one({"product_id": None, "at": at, "stock": 0, "price": 0.0})
+    return {"at": at, "products": len(rows)}
+
+async def reconcile_stock_ledger(db, repair: bool = False) -> dict:
+    """Compare the ledger's current stock with products.stock_quantity.
+
+    With repair, each difference is appended as a "reconciliation"
+    movement; the ledger itself is never rewritten. The first repair on a
+    database that predates the ledger records every product's opening
+    stock this way. Requests in flight while this runs can show up as
+    transient differences.
+    """
+    ledger = await _state_at(db, datetime.utcnow(), {})
+    products = await db["products"].find({}, {"stock_quantity": 1, "price": 1, "store_id": 1}).to_list(None)
+
+    movements = []
+    mismatched = []
+    for product in products:
+        entry = ledger.pop(product["_id"], None)
+        recorded = entry["stock"] if entry else 0
+        difference = product.get("stock_quantity", 0) - recorded
+        if difference:
+            mismatched.append({"product_id": str(product["_id"]), "ledger": recorded, "products": product.get("stock_quantity", 0)})
+            add_movement(movements, product, difference, "reconciliation")
+    # Deleted products must have been written off to zero
+    for product_id, entry in ledger.items():
+        if entry["stock"]:
+            mismatched.append({"product_id": str(product_id), "ledger": entry["stock"], "products": None})
+            add_movement(movements, {"_id": product_id, **entry}, -entry["stock"], "reconciliation")
+
+    if repair:
+        await record_movements(db, movements)
+    return {
+        "checked": len(products),
+        "mismatched": mismatched,
+        "repaired": repair and bool(movements)
+    }
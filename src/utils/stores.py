@@ -0,0 +1,27 @@
+from typing import Optional
+from fastapi import HTTPException
+from src.config.settings import settings
+
+# Products, sales and customers each belong to one store. Store-scoped
+# queries put store_id first so they use the store-prefixed indexes in
+# config/indexes.py and, with the collections sharded on store_id, are
+# routed to a single shard.
+
+def store_filter(store_id: Optional[str]) -> dict:
+    """Query prefix for a store scope; None spans every store"""
+    return {"store_id": store_id} if store_id else {}
+
+def home_store(user) -> str:
+    return user.store_id or settings.DEFAULT_STORE_ID
+
+def scope_for(user, requested: Optional[str] = None) -> Optional[str]:
+    """Employees are pinned to their home store; admins see one store or the whole chain"""
+    if user.role == "admin":
+        return requested
+    if requested and requested != home_store(user):
+        raise HTTPException(status_code=403, detail="Not authorized for this store")
+    return home_store(user)
+
+def store_for_write(user, requested: Optional[str] = None) -> str:
+    """Store a new record is created in"""
+    return scope_for(user, requested) or settings.DEFAULT_STORE_ID
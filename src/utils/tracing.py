@@ -0,0 +1,282 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from pymongo import monitoring
+from src.config.settings import settings
+from src.utils.request_context import correlation_id, trace_id
+
+logger = logging.getLogger(__name__)
+
+# Sampled requests collect spans into a Trace; unsampled ones never create
+# one, so every helper below starts with a single contextvar lookup and
+# returns straight away. Finished traces are exported in OTLP/JSON
+# (ExportTraceServiceRequest) form, one request per line, to
+# TRACE_EXPORT_FILE and/or POSTed to TRACE_EXPORT_URL (an OTLP/HTTP
+# collector's /v1/traces).
+
+class Trace:
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.root_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.spans = []
+        # Set by TracedRoute when the endpoint returns
+        self.serialize_start_ns = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start_ns: int, end_ns: int, parent_id: str = None, attributes: dict = None):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "span_id": uuid.uuid4().hex[:16],
+                "parent_id": parent_id or self.root_id,
+                "start_ns": start_ns,
+                "end_ns": end_ns,
+                "attributes": attributes or {}
+            })
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("span_parent", default=None)
+# Sampled traces by id, for the command listener, which runs on driver
+# threads and can only match commands through their request tag comment
+_active = {}
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+def start_trace(name: str):
+    """Begin a trace for the current request (trace id from request_context);
+    pass both results to end_trace"""
+    trace = Trace(trace_id() or uuid.uuid4().hex, name)
+    _active[trace.trace_id] = trace
+    return trace, _trace.set(trace)
+
+def end_trace(trace: Trace, token, attributes: dict = None):
+    _trace.reset(token)
+    _active.pop(trace.trace_id, None)
+    trace.end_ns = time.time_ns()
+    trace.attributes = attributes or {}
+    exporter.submit(trace)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span; free when not sampled"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = uuid.uuid4().hex[:16]
+    parent = _parent.get()
+    token = _parent.set(span_id)
+    start_ns = time.time_ns()
+    try:
+        yield
+    finally:
+        _parent.reset(token)
+        with trace._lock:
+            trace.spans.append({
+                "name": name,
+                "span_id": span_id,
+                "parent_id": parent or trace.root_id,
+                "start_ns": start_ns,
+                "end_ns": time.time_ns(),
+                "attributes": attributes
+            })
+
+_traced = {}
+
+def traced(func, name: str = None):
+    """Async callable wrapped in a span; one wrapper per function so FastAPI's
+    per-request dependency cache still sees a single callable"""
+    if func in _traced:
+        return _traced[func]
+    if not asyncio.iscoroutinefunction(func):
+        return func
+    span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _trace.get() is None:
+            return await func(*args, **kwargs)
+        with span(span_name):
+            return await func(*args, **kwargs)
+
+    _traced[func] = _traced[wrapper] = wrapper
+    return wrapper
+
+class CommandTracer(monitoring.CommandListener):
+    """Adds a span per Mongo command of a sampled request.
+
+    Commands are matched to traces through the "req:<trace id>" comment
+    that request_context attaches, and parented on the request's root span.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+
+    def started(self, event):
+        if not _active:
+            return
+        tag = event.command.get("comment")
+        trace = _active.get(tag[4:]) if isinstance(tag, str) and tag.startswith("req:") else None
+        if trace is None:
+            return
+        collection = event.command.get(event.command_name)
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (
+                trace, time.time_ns(), event.command_name, collection if isinstance(collection, str) else None
+            )
+
+    def succeeded(self, event):
+        self._finish(event, ok=True)
+
+    def failed(self, event):
+        self._finish(event, ok=False)
+
+    def _finish(self, event, ok: bool):
+        if not self._started:
+            return
+        with self._lock:
+            entry = self._started.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        trace, start_ns, command_name, collection = entry
+        trace.add(f"mongo.{command_name}", start_ns, start_ns + event.duration_micros * 1000, attributes={
+            "db.system": "mongodb",
+            "db.operation": command_name,
+            "db.mongodb.collection": collection,
+            "ok": ok
+        })
+
+command_tracer = CommandTracer()
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_span(trace: Trace, entry: dict) -> dict:
+    return {
+        "traceId": trace.trace_id,
+        "spanId": entry["span_id"],
+        "parentSpanId": entry["parent_id"] or "",
+        "name": entry["name"],
+        # SERVER for the request, CLIENT for database calls, else INTERNAL
+        "kind": 2 if entry["parent_id"] is None else 3 if "db.system" in entry["attributes"] else 1,
+        "startTimeUnixNano": str(entry["start_ns"]),
+        "endTimeUnixNano": str(entry["end_ns"]),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in entry["attributes"].items() if value is not None
+        ]
+    }
+
+def to_otlp(trace: Trace) -> dict:
+    """ExportTraceServiceRequest (OTLP/JSON) for one finished trace"""
+    root = {
+        "name": trace.name,
+        "span_id": trace.root_id,
+        "parent_id": None,
+        "start_ns": trace.start_ns,
+        "end_ns": trace.end_ns,
+        "attributes": trace.attributes
+    }
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.TRACE_SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "src.utils.tracing"},
+                "spans": [_otlp_span(trace, entry) for entry in [root, *trace.spans]]
+            }]
+        }]
+    }
+
+class TraceExporter:
+    """Writes finished traces from a background task, off the request path"""
+
+    def __init__(self):
+        self._queue = None
+        self._task = None
+        self.stats = {"exported": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, trace: Trace):
+        if self._queue is None or self._queue.full():
+            self.stats["dropped"] += 1
+            return
+        self._queue.put_nowait(trace)
+
+    async def start(self):
+        if not (settings.TRACE_EXPORT_FILE or settings.TRACE_EXPORT_URL):
+            return
+        self._queue = asyncio.Queue(maxsize=1000)
+        self._task = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._queue = None
+
+    async def _drain(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty() and len(batch) < 100:
+                batch.append(self._queue.get_nowait())
+            payloads = [to_otlp(trace) for trace in batch]
+            try:
+                await asyncio.to_thread(self._write, payloads)
+                self.stats["exported"] += len(batch)
+            except (OSError, ValueError):
+                self.stats["failed"] += len(batch)
+                logger.warning("Could not export %d traces", len(batch), exc_info=True)
+
+    def _write(self, payloads: list):
+        if settings.TRACE_EXPORT_FILE:
+            directory = os.path.dirname(settings.TRACE_EXPORT_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(settings.TRACE_EXPORT_FILE, "a") as export_file:
+                for payload in payloads:
+                    export_file.write(json.dumps(payload) + "\n")
+        if settings.TRACE_EXPORT_URL:
+            for payload in payloads:
+                request = urllib.request.Request(
+                    settings.TRACE_EXPORT_URL, data=json.dumps(payload).encode(),
+                    headers={"Content-Type": "application/json"}, method="POST"
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+
+exporter = TraceExporter()
+
+class CorrelationIdFilter(logging.Filter):
+    """Adds %(correlation_id)s to every record ("-" outside a request)"""
+
+    def filter(self, record):
+        record.correlation_id = correlation_id() or "-"
+        return True
+
+def configure_logging():
+    handler = logging.StreamHandler()
+    handler.addFilter(CorrelationIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(correlation_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Stock Ledger Verification Script
+Compares the stock implied by the movement ledger (latest snapshot plus the
+movements since) with products.stock_quantity. With --repair, appends a
+"reconciliation" movement for each difference; run it once with --repair on
+a database that predates the ledger to record opening stock.
+
+Usage: python verify_stock_ledger.py [--repair] [--snapshot]
+"""
+import asyncio
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.config.settings import settings
+from src.config.database import get_database_url
+from src.utils.stock_ledger import reconcile_stock_ledger, take_stock_snapshot
+
+async def main():
+    client = AsyncIOMotorClient(get_database_url())
+    db = client[settings.DB_NAME]
+    result = await reconcile_stock_ledger(db, repair="--repair" in sys.argv)
+    for mismatch in result["mismatched"][:50]:
+        print(f"  {mismatch['product_id']}: ledger {mismatch['ledger']}, products {mismatch['products']}")
+    if len(result["mismatched"]) > 50:
+        print(f"  ... and {len(result['mismatched']) - 50} more")
+    status = "repaired" if result["repaired"] else "found"
+    print(f"[{'OK' if not result['mismatched'] else 'WARN'}] Checked {result['checked']} products, {status} {len(result['mismatched'])} differences")
+    if "--snapshot" in sys.argv:
+        snapshot = await take_stock_snapshot(db)
+        print(f"[OK] Snapshot at {snapshot['at']} covering {snapshot['products']} products")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())